@@ -0,0 +1,107 @@
+"""Per-call latency: a new httpx client per request vs the shared pooled client.
+
+Runs against a local stand-in for OpenRouter (stdlib HTTP/1.1 keep-alive server,
+over TLS when openssl is available to mint a self-signed cert), so the numbers
+isolate connection setup — what the bot paid on every message before llm.py
+kept one client open.
+
+    python -m benchmarks.bench_http
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+_CALLS = 200
+_BODY = json.dumps({"choices": [{"message": {"content": "whatever."}}]}).encode()
+_PAYLOAD = {"model": "stand-in", "messages": [{"role": "user", "content": "hey"}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_BODY)))
+        self.end_headers()
+        self.wfile.write(_BODY)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _tls_context(tmp: Path) -> ssl.SSLContext | None:
+    if shutil.which("openssl") is None:
+        return None
+    cert, key = tmp / "cert.pem", tmp / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ctx.load_cert_chain(cert, key)
+    return ctx
+
+
+async def _per_call(url: str, calls: int, shared: bool) -> list[float]:
+    timings = []
+    pooled = httpx.AsyncClient(verify=False) if shared else None
+    for _ in range(calls):
+        start = time.perf_counter()
+        if pooled is not None:
+            (await pooled.post(url, json=_PAYLOAD)).raise_for_status()
+        else:
+            async with httpx.AsyncClient(verify=False) as client:
+                (await client.post(url, json=_PAYLOAD)).raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    if pooled is not None:
+        await pooled.aclose()
+    return timings
+
+
+def _row(label: str, timings: list[float]) -> str:
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    return f"{label:<22} {statistics.median(timings):>9.2f} {p95:>9.2f}"
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        ctx = _tls_context(Path(tmp))
+        if ctx is not None:
+            server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        scheme = "https" if ctx is not None else "http"
+        url = f"{scheme}://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+        try:
+            fresh = asyncio.run(_per_call(url, _CALLS, shared=False))
+            pooled = asyncio.run(_per_call(url, _CALLS, shared=True))
+        finally:
+            server.shutdown()
+    print(f"{_CALLS} calls over {scheme}")
+    print("{:<22} {:>9} {:>9}".format("client", "p50 ms", "p95 ms"))
+    print(_row("new client per call", fresh))
+    print(_row("shared pooled client", pooled))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Offline load test: concurrent chat turns plus background jobs against a fake OpenRouter.
+
+Runs the bot's real LLM path (scheduler, retries, fallbacks, streaming) against
+tests/support/fake_openrouter.py on a local port, so nothing is billed. Reports
+time to first token for chat turns, how long background calls took and what the
+stand-in saw, with and without injected faults.
+
+    python -m benchmarks.bench_load
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+
+from bot import llm
+from tests.support.fake_openrouter import FakeOpenRouter, Faults, Latency, base_url, serve
+
+_USERS = 10
+_TURNS = 3
+_THINK_SECONDS = (2.0, 6.0)  # pause between a user's turns (and before the first)
+_BACKGROUND_JOBS = 5
+_LATENCY = Latency(median_ms=300, sigma=0.5, token_ms=10)
+_SCENARIOS = {
+    "clean": Faults(),
+    "5% 429/5xx": Faults(rate_limited=0.025, server_error=0.025, retry_after=0.2),
+}
+
+
+async def _user(rng: random.Random, ttft: list[float], failed: list[int]) -> None:
+    loop = asyncio.get_running_loop()
+    for _ in range(_TURNS):
+        await asyncio.sleep(rng.uniform(*_THINK_SECONDS))
+        start = loop.time()
+        messages = [{"role": "user", "content": "hey. you up?"}]
+        try:
+            first = True
+            async for _delta in llm.chat_completion_stream(messages, task="chat"):
+                if first:
+                    ttft.append(loop.time() - start)
+                    first = False
+        except Exception:
+            failed.append(1)
+
+
+async def _background(durations: list[float], failed: list[int]) -> None:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    messages = [
+        {"role": "system", "content": "You are a memory consolidation assistant"},
+        {"role": "user", "content": "USER: hi\nASSISTANT: hm."},
+    ]
+    try:
+        await llm.chat_completion(messages, task="memory", temperature=0.3)
+        durations.append(loop.time() - start)
+    except Exception:
+        failed.append(1)
+
+
+async def _scenario(faults: Faults) -> dict[str, float]:
+    app = FakeOpenRouter(latency=_LATENCY, faults=faults, seed=7)
+    server = await serve(app)
+    os.environ["OPENROUTER_BASE_URL"] = base_url(server)
+    os.environ.setdefault("OPENROUTER_API_KEY", "offline")
+    ttft: list[float] = []
+    background: list[float] = []
+    failed: list[int] = []
+    rng = random.Random(7)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(_user(random.Random(rng.random()), ttft, failed) for _ in range(_USERS)),
+            *(_background(background, failed) for _ in range(_BACKGROUND_JOBS)),
+        )
+    finally:
+        await llm.aclose_client()
+        server.close()
+        await server.wait_closed()
+    elapsed = time.perf_counter() - start
+    calls = sum(app.models.values())
+    return {
+        "ttft_p50": statistics.median(ttft) * 1000 if ttft else float("nan"),
+        "ttft_p95": statistics.quantiles(ttft, n=20)[-1] * 1000 if len(ttft) > 1 else float("nan"),
+        "bg_p50": statistics.median(background) if background else float("nan"),
+        "turns_per_s": len(ttft) / elapsed,
+        "failed": len(failed),
+        "calls": calls,
+        "errors": calls - app.outcomes["stream"] - app.outcomes["ok"],
+    }
+
+
+def main() -> None:
+    logging.getLogger("bot.llm").setLevel(logging.ERROR)  # retries are expected here
+    print(
+        f"{_USERS} users x {_TURNS} streamed turns + {_BACKGROUND_JOBS} background calls, "
+        "scheduler limits from settings.yaml"
+    )
+    header = ("scenario", "ttft p50 ms", "ttft p95 ms", "bg p50 s", "turns/s", "failed", "calls")
+    print("{:<12} {:>12} {:>12} {:>9} {:>8} {:>7} {:>12}".format(*header))
+    for name, faults in _SCENARIOS.items():
+        r = asyncio.run(_scenario(faults))
+        calls = f"{r['calls']} ({r['errors']} err)"
+        print(
+            f"{name:<12} {r['ttft_p50']:>12.0f} {r['ttft_p95']:>12.0f} {r['bg_p50']:>9.1f} "
+            f"{r['turns_per_s']:>8.1f} {r['failed']:>7} {calls:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
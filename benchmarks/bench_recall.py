@@ -0,0 +1,87 @@
+"""Prompt size and build time as a user's known facts grow.
+
+Compares injecting every known fact with top-k recall (bot/recall.py), and
+times FactIndex.top_k on its own. Injecting everything isn't run at 100k facts.
+
+    python -m benchmarks.bench_recall
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import date, timedelta
+
+from bot.budget import Budget, estimate_tokens
+from bot.chat import PromptContext, build_prompt_blocks
+from bot.memory import get_facts_with_age
+from bot.recall import FactIndex
+
+_WORDS = (
+    "cat dog bass guitar exam chemistry bakery night shift sister brother train tokyo "
+    "ramen coffee tea rain winter novel anime sketch running gym piano violin "
+    "biology thesis roommate landlord plant cactus bicycle camera film jazz"
+).split()
+_QUERY = "ugh my chemistry exam is tomorrow and the cat knocked my coffee over"
+_ROUNDS = 50
+# No allowance caps, so the "all facts" column shows what would be sent unbudgeted.
+_BUDGET = Budget(prefix_tokens=10**9, suffix_tokens=10**9)
+
+
+def _facts(n: int) -> list[str]:
+    rng = random.Random(n)
+    start = date.today() - timedelta(days=400)
+    return [
+        f"[{(start + timedelta(days=rng.randrange(400))).isoformat()}] [{rng.randint(1, 10)}] "
+        + " ".join(rng.sample(_WORDS, 4))
+        for _ in range(n)
+    ]
+
+
+def _context(facts: list[str]) -> PromptContext:
+    return PromptContext(
+        user_id=0,
+        stage=1,
+        mood="focused",
+        user_state={"name": "unknown", "open_loops": []},
+        facts_with_age=get_facts_with_age(facts),
+        heartbeat={},
+    )
+
+
+def _time_ms(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(_ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / _ROUNDS * 1000
+
+
+def main() -> None:
+    header = ("facts", "all: tokens", "all: ms", "top-5: tokens", "top-5: ms", "top_k ms")
+    print("{:>7} {:>12} {:>9} {:>14} {:>10} {:>9}".format(*header))
+    for n in (10, 100, 1_000, 10_000, 100_000):
+        facts = _facts(n)
+        index = FactIndex(facts)
+        index.top_k(_QUERY, 5)  # warm the per-day prior ranking
+
+        def build_all(facts=facts):
+            return build_prompt_blocks(_context(facts), _BUDGET)
+
+        def build_top(index=index):
+            return build_prompt_blocks(_context(index.top_k(_QUERY, 5)), _BUDGET)
+
+        if n <= 10_000:
+            all_tokens = str(sum(estimate_tokens(block) for block in build_all()))
+            all_ms = f"{_time_ms(build_all):.2f}"
+        else:
+            all_tokens = all_ms = "-"
+        top_tokens = sum(estimate_tokens(block) for block in build_top())
+        top_k_ms = _time_ms(lambda index=index: index.top_k(_QUERY, 5))
+        print(
+            f"{n:>7} {all_tokens:>12} {all_ms:>9} "
+            f"{top_tokens:>14} {_time_ms(build_top):>10.2f} {top_k_ms:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
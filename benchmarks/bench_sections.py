@@ -0,0 +1,55 @@
+"""Microbenchmark: per-section regex scans vs. the single-pass Sections index.
+
+Builds a ~10k-line SELF.md-style document and times one "logical operation"
+(read three sections, rewrite one) both ways.
+
+    python -m benchmarks.bench_sections
+"""
+
+from __future__ import annotations
+
+import re
+import timeit
+
+from bot.mdsections import Sections
+
+_SECTIONS = ("preoccupation", "staged disclosures", "things she told the user", "carry_over")
+
+
+def _build_doc(lines: int = 10_000) -> str:
+    per = lines // len(_SECTIONS)
+    parts = ["# Self"]
+    for name in _SECTIONS:
+        parts.append(f"\n## {name}")
+        parts.extend(f"- [2026-01-01] {name} entry {i}" for i in range(per))
+    return "\n".join(parts) + "\n"
+
+
+def _regex_op(doc: str) -> str:
+    for name in _SECTIONS[:3]:
+        re.search(rf"## {re.escape(name)}\n(.*?)(?=\n##|\Z)", doc, re.DOTALL)
+    m = re.search(r"(## things she told the user\n)(.*?)(?=\n##|\Z)", doc, re.DOTALL)
+    body = m.group(2).strip() + "\n- new entry\n"
+    return doc[: m.start(2)] + body + doc[m.end(2) :]
+
+
+def _index_op(doc: str) -> str:
+    sections = Sections(doc)
+    for name in _SECTIONS[:3]:
+        sections.body(name)
+    body = (sections.body("things she told the user") or "").strip() + "\n- new entry\n"
+    sections.replace("things she told the user", body)
+    return sections.text()
+
+
+def main() -> None:
+    doc = _build_doc()
+    assert _regex_op(doc) == _index_op(doc)
+    n = 200
+    for label, fn in (("regex", _regex_op), ("sections", _index_op)):
+        secs = timeit.timeit(lambda fn=fn: fn(doc), number=n)
+        print(f"{label:>9}: {secs / n * 1e3:8.3f} ms/op  ({doc.count(chr(10))} lines)")
+
+
+if __name__ == "__main__":
+    main()
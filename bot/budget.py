@@ -0,0 +1,166 @@
+"""Token budgeting for prompt assembly and chat history.
+
+Token counts come from a fast local estimate (no tokenizer dependency) and are
+memoized per text, so history messages and character files are only measured
+once. Each prompt section carries a priority and an optional per-section
+allowance; pack() fits a list of sections into a token budget by trimming or
+dropping the lowest-priority sections first. Budgets are per model, from the
+`budget:` block in settings.yaml.
+"""
+
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from .settings import Settings, get_settings
+
+# Rough chars-per-token for mixed English prose; errs slightly high on purpose.
+_CHARS_PER_TOKEN = 4
+# Role/formatting overhead the chat APIs add per message.
+_MESSAGE_OVERHEAD = 4
+
+# Sections at this priority are never trimmed or dropped.
+REQUIRED = 100
+
+
+# ---------------------------------------------------------------------------
+# Token estimation
+# ---------------------------------------------------------------------------
+
+
+@functools.lru_cache(maxsize=8192)
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text (about 4 characters per token)."""
+    return -(-len(text) // _CHARS_PER_TOKEN)
+
+
+def message_tokens(message: dict[str, Any]) -> int:
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return _MESSAGE_OVERHEAD + sum(
+            estimate_tokens(part.get("text", "")) for part in content
+        )
+    return _MESSAGE_OVERHEAD + estimate_tokens(content)
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep whole leading lines of text that fit in max_tokens (cuts one long line if needed)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept: list[str] = []
+    used = 0
+    for line in text.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            if not kept:
+                kept.append(line[: max_tokens * _CHARS_PER_TOKEN])
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+# ---------------------------------------------------------------------------
+# Budgets
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Token budget for one model's chat turn."""
+
+    prefix_tokens: int = 7000  # stable system-prompt prefix
+    suffix_tokens: int = 1500  # volatile system-prompt suffix
+    history_tokens: int = 4000  # conversation history
+    allowances: dict[str, int] = field(default_factory=dict)  # per-section caps
+
+    def allowance(self, name: str, default: int | None = None) -> int | None:
+        return self.allowances.get(name, default)
+
+
+def budget_for(model: str, settings: Settings | None = None) -> Budget:
+    """Return the budget for a model: `budget.default` overlaid with `budget.models[model]`."""
+    cfg = (settings or get_settings()).budget
+    merged: dict[str, Any] = {**cfg.get("default", {}), **cfg.get("models", {}).get(model, {})}
+    allowances = {**cfg.get("allowances", {}), **merged.pop("allowances", {})}
+    known = {k: int(v) for k, v in merged.items() if k in Budget.__dataclass_fields__}
+    return Budget(**known, allowances=allowances)
+
+
+# ---------------------------------------------------------------------------
+# Packing
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class PromptSection:
+    """One block of a system prompt. Higher priority survives longer under pressure."""
+
+    name: str
+    text: str
+    priority: int = 50
+    trimmable: bool = False  # may lose trailing lines instead of being dropped whole
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text) + 1  # + the joining newline
+
+
+def pack(sections: list[PromptSection], max_tokens: int, budget: Budget | None = None) -> str:
+    """Join sections into at most max_tokens, keeping their order.
+
+    Each section is first cut to its allowance (if the budget has one for its
+    name). If the total is still over, the lowest-priority sections are trimmed
+    (when trimmable) or dropped until it fits. REQUIRED sections are kept as-is.
+    """
+    fitted = []
+    for section in sections:
+        if not section.text:
+            continue
+        cap = budget.allowance(section.name) if budget is not None else None
+        if cap is not None and section.priority < REQUIRED:
+            section = replace(section, text=trim_to_tokens(section.text, cap))
+        fitted.append(section)
+
+    total = sum(s.tokens for s in fitted)
+    by_priority = sorted(range(len(fitted)), key=lambda i: fitted[i].priority)
+    for i in by_priority:
+        if total <= max_tokens:
+            break
+        section = fitted[i]
+        if section.priority >= REQUIRED:
+            break
+        over = total - max_tokens
+        if section.trimmable and section.tokens - over > 1:
+            trimmed = replace(section, text=trim_to_tokens(section.text, section.tokens - over - 1))
+        else:
+            trimmed = replace(section, text="")
+        total -= section.tokens - (trimmed.tokens if trimmed.text else 0)
+        fitted[i] = trimmed
+
+    return "\n".join(s.text for s in fitted if s.text)
+
+
+def fit_history(messages: list[dict[str, Any]], max_tokens: int) -> list[dict[str, Any]]:
+    """Return the newest messages whose combined size fits in max_tokens.
+
+    The newest message is always kept, cut down to the budget if it is too long
+    on its own — it is usually the message being answered.
+    """
+    if not messages:
+        return []
+    last = messages[-1]
+    if message_tokens(last) > max_tokens and isinstance(last.get("content"), str):
+        room = max(1, max_tokens - _MESSAGE_OVERHEAD)
+        last = {**last, "content": trim_to_tokens(last["content"], room)}
+    used = message_tokens(last)
+    start = len(messages) - 1
+    while start > 0:
+        cost = message_tokens(messages[start - 1])
+        if used + cost > max_tokens:
+            break
+        used += cost
+        start -= 1
+    return [*messages[start:-1], last]
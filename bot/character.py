@@ -0,0 +1,143 @@
+"""Character assets: IDENTITY, SOUL, LORE, heartbeat templates and appearance, cached in memory.
+
+The files are shared by every user and rarely change, so they are read once and
+served from memory. Edits still apply without a restart: the files' mtimes are
+polled at most every few seconds, and request_reload() (wired to SIGHUP in main)
+forces a re-read on next access.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .mdsections import Sections
+
+_ROOT = Path(__file__).parent.parent
+CHARACTER_DIR = _ROOT / "character"
+
+IDENTITY_MD = CHARACTER_DIR / "IDENTITY.md"
+SOUL_MD = CHARACTER_DIR / "SOUL.md"
+HEARTBEAT_TEMPLATE_MD = CHARACTER_DIR / "HEARTBEAT_TEMPLATE.md"
+LORE_MD = CHARACTER_DIR / "LORE.md"
+APPEARANCE_MD = CHARACTER_DIR / "APPEARANCE.md"
+
+_DEFAULT_APPEARANCE = (
+    "young japanese woman, 21, dark hair, urban style, realistic, "
+    "natural lighting, authentic candid expression"
+)
+
+# How often get_assets() stats the files to pick up edits.
+_POLL_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class CharacterAssets:
+    identity: str
+    soul: str
+    lore_items: tuple[str, ...]
+    heartbeat_template_text: str
+    heartbeat_templates: tuple[tuple[int, str], ...]
+    appearance_base: str
+    # (mtime_ns, size) per file, or None if missing — compared to detect edits
+    signature: tuple[tuple[int, int] | None, ...]
+
+
+def parse_heartbeat_templates(templates_text: str) -> list[tuple[int, str]]:
+    """Parse numbered templates from HEARTBEAT_TEMPLATE.md. Returns list of (index, text)."""
+    templates = []
+    for line in templates_text.splitlines():
+        line = line.strip()
+        if line and line[0].isdigit() and ". " in line:
+            parts = line.split(". ", 1)
+            try:
+                idx = int(parts[0])
+                text = parts[1].strip()
+                templates.append((idx, text))
+            except (ValueError, IndexError):
+                pass
+    return templates
+
+
+def parse_lore_items(lore_text: str) -> list[str]:
+    """Extract individual bullet items (lines starting with "- ") from LORE.md."""
+    return [
+        ln.strip()[2:].strip()
+        for ln in lore_text.splitlines()
+        if ln.strip().startswith("- ")
+    ]
+
+
+def _files() -> tuple[Path, ...]:
+    return (IDENTITY_MD, SOUL_MD, LORE_MD, HEARTBEAT_TEMPLATE_MD, APPEARANCE_MD)
+
+
+def _signature() -> tuple[tuple[int, int] | None, ...]:
+    sig: list[tuple[int, int] | None] = []
+    for path in _files():
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            sig.append(None)
+            continue
+        sig.append((st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+def _read(path: Path) -> str:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return ""
+
+
+def load_assets() -> CharacterAssets:
+    """Read every character file from disk (bypasses the cache)."""
+    signature = _signature()
+    templates_text = _read(HEARTBEAT_TEMPLATE_MD)
+    appearance = (Sections(_read(APPEARANCE_MD)).body("base prompt") or "").strip()
+    return CharacterAssets(
+        identity=_read(IDENTITY_MD),
+        soul=_read(SOUL_MD),
+        lore_items=tuple(parse_lore_items(_read(LORE_MD))),
+        heartbeat_template_text=templates_text,
+        heartbeat_templates=tuple(parse_heartbeat_templates(templates_text)),
+        appearance_base=appearance or _DEFAULT_APPEARANCE,
+        signature=signature,
+    )
+
+
+_assets: CharacterAssets | None = None
+_checked_at = 0.0
+_reload_requested = False
+_lock = threading.Lock()
+
+
+def get_assets() -> CharacterAssets:
+    """Return the cached assets, re-reading them if a file changed or a reload was requested."""
+    global _assets, _checked_at, _reload_requested
+    assets = _assets
+    if (
+        assets is not None
+        and not _reload_requested
+        and time.monotonic() - _checked_at < _POLL_SECONDS
+    ):
+        return assets
+    with _lock:
+        if _assets is None or _reload_requested or _signature() != _assets.signature:
+            _reload_requested = False
+            _assets = load_assets()
+        _checked_at = time.monotonic()
+        return _assets
+
+
+def request_reload() -> None:
+    """Re-read the files on next access. Only sets a flag, so it is safe in a signal handler."""
+    global _reload_requested
+    _reload_requested = True
+
+
+def heartbeat_templates() -> list[tuple[int, str]]:
+    return list(get_assets().heartbeat_templates)
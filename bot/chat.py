@@ -2,71 +2,141 @@
 
 from __future__ import annotations
 
+import asyncio
+import logging
 import random
+from collections.abc import AsyncIterator
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
-from pathlib import Path
 from typing import Any
 
-import yaml
-
-from .llm import chat_completion
+from .budget import (
+    REQUIRED,
+    Budget,
+    PromptSection,
+    budget_for,
+    estimate_tokens,
+    fit_history,
+    pack,
+    trim_to_tokens,
+)
+from .llm import chat_completion, chat_completion_stream, get_model, system_message
 from .memory import (
-    get_current_user,
+    aget_heartbeat_state,
+    aget_user_state,
+    append_session_log,
+    compact_session_log,
+    delete_session_log,
     get_facts_with_age,
-    get_heartbeat_state,
-    get_open_loops,
     get_self_disclosures,
     get_self_preoccupation,
     get_staged_disclosure,
-    get_trust_stage,
-    get_user_state,
     mark_disclosure_used,
     read_identity,
     read_last_episode_carry_over,
     read_lore,
     read_memory,
     read_mood_arc,
+    read_session_log,
     read_soul,
     read_today_episode,
     record_user_message_time,
+    relevant_facts,
+    run_io,
     set_current_user,
 )
+from .sessions import Session, SessionStore
+from .settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _logged(future: Future[None]) -> Future[None]:
+    """Report a failed session log write (they run in the background)."""
+
+    def done(f: Future[None]) -> None:
+        if f.exception() is not None:
+            logger.warning("Session log write failed: %s", f.exception())
+
+    future.add_done_callback(done)
+    return future
+
+
+async def _restore_session(user_id: int) -> list[dict[str, Any]]:
+    return await run_io(read_session_log, user_id)
+
+
+async def _spill_session(user_id: int, data: dict[str, Any]) -> None:
+    """Compact the user's session log down to one snapshot of data."""
+    await asyncio.wrap_future(compact_session_log(user_id, [{"k": "snapshot", **data}]))
+
+
+def _new_store() -> SessionStore:
+    cfg = get_settings().session
+    return SessionStore(
+        max_history=cfg.max_history_messages,
+        max_sessions=cfg.max_active_sessions,
+        idle_seconds=cfg.idle_evict_minutes * 60,
+        restore=_restore_session,
+        spill=_spill_session,
+    )
 
-_ROOT = Path(__file__).parent.parent
-_SETTINGS_PATH = _ROOT / "settings.yaml"
 
 # Per-user session state keyed by Telegram user_id
-_sessions: dict[int, dict] = {}
+_sessions = _new_store()
+
+
+def _session(user_id: int) -> Session:
+    """Return the session for a user (load_session() must have run since a restart)."""
+    return _sessions.get(user_id)
 
 
-def _session(user_id: int) -> dict:
-    """Return (creating if needed) the session dict for a user."""
-    if user_id not in _sessions:
-        _sessions[user_id] = {
-            "history": [],
-            "session_turn_count": 0,
-            "false_start_used": False,
-            "ignore_streak": 0,
-            "ignore_cooldown": 0,
-        }
-    return _sessions[user_id]
+async def load_session(user_id: int) -> None:
+    """Bring a user's session into memory, replaying its log (on the I/O pool) if needed."""
+    await _sessions.load(user_id)
 
 
-def _load_settings() -> dict[str, Any]:
-    with open(_SETTINGS_PATH) as f:
-        return yaml.safe_load(f)
+async def evict_idle_sessions() -> int:
+    """Spill idle and least-recently-used sessions to disk. Returns how many were dropped."""
+    return await _sessions.evict()
+
+
+def session_stats() -> dict[str, int]:
+    """In-memory session gauge: active sessions, messages held, approximate bytes."""
+    return _sessions.stats()
 
 
 def _get_context_window() -> int:
-    return _load_settings().get("session", {}).get("context_window_turns", 20)
+    return get_settings().session.context_window_turns
+
+
+def _summary_settings() -> tuple[int, int]:
+    """(unsummarized turns that trigger a fold, recent turns kept verbatim after one)."""
+    session = get_settings().session
+    return session.summarize_after_turns, session.summary_keep_turns
 
 
 def _is_japanese_enabled() -> bool:
-    return _load_settings().get("character", {}).get("japanese_words_enabled", True)
+    return get_settings().character.japanese_words_enabled
 
 
 def _is_mood_enabled() -> bool:
-    return _load_settings().get("character", {}).get("mood_enabled", True)
+    return get_settings().character.mood_enabled
+
+
+def _recall_settings() -> tuple[int, int]:
+    """(facts injected per turn, recent user messages added to the recall query)."""
+    memory = get_settings().memory
+    return memory.facts_top_k, memory.recall_history_turns
+
+
+def _recall_query(user_id: int, message: str, turns: int) -> str:
+    """The current message plus the user's last few messages, for fact retrieval."""
+    recent = [m["content"] for m in get_history(user_id) if m["role"] == "user"][-turns:]
+    if message and (not recent or recent[-1] != message):
+        recent.append(message)
+    return "\n".join(recent)
 
 
 _MOODS = ["tired", "focused", "irritable", "weirdly good"]
@@ -141,95 +211,270 @@ _CONFIDENCE_PREFIXES = {
 }
 
 
-def build_system_prompt() -> str:
-    """Assemble the full system prompt from character files + user context."""
-    user_id = get_current_user()
-    sess = _session(user_id)
+# ---------------------------------------------------------------------------
+# Per-turn context
+# ---------------------------------------------------------------------------
 
-    identity = read_identity()
-    soul = read_soul()
-    stage = get_trust_stage()
-    mood = get_daily_mood() if _is_mood_enabled() else "focused"
-    open_loops = get_open_loops()
-    user_state = get_user_state()
-    today_episode = read_today_episode()
-    memory = read_memory()
 
-    parts = [identity, "", soul]
+@dataclass
+class PromptContext:
+    """One user's memory state for a single turn, loaded once and shared by the turn.
+
+    Prompt assembly, the ignore check and the typing delay all read from this
+    instead of re-opening the memory files.
+    """
+
+    user_id: int
+    stage: int
+    mood: str
+    user_state: dict[str, Any]
+    facts_with_age: list[dict[str, Any]]
+    heartbeat: dict[str, Any]
+    today_episode: str = ""
+    carry_over: str = ""
+    memory: str = ""
+    preoccupation: str = ""
+    staged_disclosure: str | None = None
+    self_disclosures: list[dict[str, str]] = field(default_factory=list)
+    mood_arc: dict[str, Any] = field(default_factory=dict)
+    # Set by build_system_prompt() when it surfaces the staged disclosure
+    surfaced_disclosure: str | None = None
+
+    @property
+    def open_loops(self) -> list[str]:
+        return self.user_state.get("open_loops", [])
+
+
+def _load_episode_context(stage: int) -> tuple[str, str]:
+    today = read_today_episode()
+    carry_over = read_last_episode_carry_over() if stage >= 2 else ""
+    return today, carry_over
+
+
+def _load_self_context(stage: int) -> tuple[str, str | None, list[dict[str, str]]]:
+    """SELF.md pieces used at Stage 2+: preoccupation, staged disclosure, things she told."""
+    if stage < 2:
+        return "", None, []
+    try:
+        preoccupation = get_self_preoccupation()
+        staged = get_staged_disclosure(stage)
+    except Exception:
+        preoccupation, staged = "", None
+    try:
+        disclosures = get_self_disclosures()
+    except Exception:
+        disclosures = []
+    return preoccupation, staged, disclosures
+
 
-    # Stage context
-    parts.append(f"\n## current trust stage\n{_stage_note(stage)}")
+def _load_mood_arc(stage: int) -> dict[str, Any]:
+    if stage < 2:
+        return {}
+    try:
+        return read_mood_arc()
+    except Exception:
+        return {}
 
-    # Mood context
-    if _is_mood_enabled():
-        parts.append(f"\n## current mood\n{_mood_note(mood)}")
 
-    # Session-opening continuity (M1): carry-over from last session, Stage 2+
-    if stage >= 2 and sess["session_turn_count"] == 0:
-        carry_over = read_last_episode_carry_over()
-        if carry_over:
-            parts.append(f"\n## carry-over from last session\n{carry_over}")
-            # ~20% chance: prompt her to open with it explicitly
-            if random.random() < 0.20:
-                parts.append(
-                    "(you may open by briefly referencing how last session felt — "
-                    "in-character, not literally quoting this note)"
-                )
+async def load_prompt_context(user_id: int, message: str = "") -> PromptContext:
+    """Load a user's state for one turn.
+
+    USER.md comes first because the stage decides what else is needed; the episode,
+    MEMORY.md, SELF.md and MOOD.md reads then run concurrently on the memory I/O pool.
+    Only the known facts most relevant to message and recent history are kept; that
+    ranking (and any index rebuild) runs on the pool too.
+    """
+    set_current_user(user_id)
+    await load_session(user_id)
+    user_state = await aget_user_state()
+    stage = user_state["relationship_stage"]
+    try:
+        heartbeat = await aget_heartbeat_state()
+    except Exception:
+        heartbeat = {}
+
+    (today_episode, carry_over), memory, self_parts, mood_arc = await asyncio.gather(
+        run_io(_load_episode_context, stage),
+        run_io(read_memory),
+        run_io(_load_self_context, stage),
+        run_io(_load_mood_arc, stage),
+    )
+    preoccupation, staged, disclosures = self_parts
+    top_k, history_turns = _recall_settings()
+    query = _recall_query(user_id, message, history_turns)
+    facts = await run_io(relevant_facts, query, top_k, user_state["known_facts"])
+    return PromptContext(
+        user_id=user_id,
+        stage=stage,
+        mood=get_daily_mood(),
+        user_state=user_state,
+        facts_with_age=get_facts_with_age(facts),
+        heartbeat=heartbeat,
+        today_episode=today_episode,
+        carry_over=carry_over,
+        memory=memory,
+        preoccupation=preoccupation,
+        staged_disclosure=staged,
+        self_disclosures=disclosures,
+        mood_arc=mood_arc,
+    )
+
+
+def build_prompt_blocks(ctx: PromptContext, budget: Budget | None = None) -> tuple[str, str]:
+    """Assemble the system prompt as (stable prefix, volatile suffix).
+
+    The prefix holds what stays byte-identical across a user's turns within a
+    session (character files, stage, who the user is, long-term memory) so that
+    provider prompt caches can reuse it. Anything that changes per turn or per
+    day — mood, recalled facts, dice rolls, lore samples, episode notes — goes
+    in the suffix. Each block is packed into the chat model's token budget,
+    lowest priority first.
+    """
+    sess = _session(ctx.user_id)
+    if budget is None:
+        budget = budget_for(get_model("chat"))
+
+    identity = read_identity()
+    soul = read_soul()
+    stage = ctx.stage
+    mood = ctx.mood if _is_mood_enabled() else "focused"
+    open_loops = ctx.open_loops
+    user_state = ctx.user_state
+    today_episode = ctx.today_episode
+    memory = ctx.memory
+
+    stable = [
+        PromptSection("identity", identity + "\n", REQUIRED),
+        PromptSection("soul", soul, REQUIRED),
+    ]
+
+    # Stage context
+    stable.append(
+        PromptSection("stage", f"\n## current trust stage\n{_stage_note(stage)}", 95)
+    )
 
     # User context
     user_name = user_state.get("name", "unknown")
     if user_name != "unknown":
-        parts.append(f"\n## user\nYou're talking to {user_name}.")
+        stable.append(PromptSection("user", f"\n## user\nYou're talking to {user_name}.", 90))
 
     if open_loops:
         loops_text = "\n".join(f"- {loop}" for loop in open_loops)
-        parts.append(f"\n## open loops (things to follow up on)\n{loops_text}")
+        stable.append(
+            PromptSection(
+                "open_loops",
+                f"\n## open loops (things to follow up on)\n{loops_text}",
+                70,
+                trimmable=True,
+            )
+        )
 
-    # Imperfect recall (M3): inject facts with age-based confidence level
-    facts_with_age = get_facts_with_age()
+    # Long-term memory (only if non-empty)
+    if memory and "none yet" not in memory.lower():
+        # Trimmed to the long_term_memory allowance by pack()
+        stable.append(
+            PromptSection(
+                "long_term_memory", "\n## long-term memory\n" + memory, 55, trimmable=True
+            )
+        )
+
+    # --- volatile suffix ---
+    parts: list[PromptSection] = []
+
+    # Mood context
+    if _is_mood_enabled():
+        parts.append(PromptSection("mood", f"\n## current mood\n{_mood_note(mood)}", 85))
+
+    # Imperfect recall (M3): the turn's most relevant facts, with age-based confidence.
+    # Retrieval depends on the message, so this lives in the suffix.
+    facts_with_age = ctx.facts_with_age
     if facts_with_age:
         facts_lines = [
             "- " + _CONFIDENCE_PREFIXES[f["confidence"]].format(f["text"])
             for f in facts_with_age
         ]
-        parts.append(
-            "\n## known facts about the user\n"
-            + "\n".join(facts_lines)
-            + "\n(for uncertain/faint items: use hedged language — "
+        facts_text = "\n".join(facts_lines)
+        header = "\n## known facts about the user\n"
+        hedging = (
+            "\n(for uncertain/faint items: use hedged language — "
             "'i think you mentioned...?' not 'you said...')"
         )
+        # Trim only the facts, leaving room for the header and hedging line, so pack()
+        # has nothing left to cut under the same allowance
+        cap = budget.allowance("known_facts")
+        if cap is not None:
+            room = cap - estimate_tokens(header) - estimate_tokens(hedging)
+            facts_text = trim_to_tokens(facts_text, max(0, room))
+        if facts_text:
+            parts.append(PromptSection("known_facts", header + facts_text + hedging, 65))
+
+    # Session-opening continuity (M1): carry-over from last session, Stage 2+
+    if stage >= 2 and sess.session_turn_count == 0:
+        carry_over = ctx.carry_over
+        if carry_over:
+            carry_text = f"\n## carry-over from last session\n{carry_over}"
+            # ~20% chance: prompt her to open with it explicitly
+            if random.random() < 0.20:
+                carry_text += (
+                    "\n(you may open by briefly referencing how last session felt — "
+                    "in-character, not literally quoting this note)"
+                )
+            parts.append(PromptSection("carry_over", carry_text, 75))
+
+    # Rolling summary of turns that have been folded out of the history
+    if sess.summary:
+        parts.append(
+            PromptSection(
+                "session_summary",
+                f"\n## earlier in this conversation\n{sess.summary}",
+                80,
+                trimmable=True,
+            )
+        )
 
     # Today's episode summary
     if today_episode:
-        parts.append(f"\n## what happened today so far\n{today_episode}")
-
-    # Long-term memory (only if non-empty)
-    if memory and "none yet" not in memory.lower():
-        # Trim to avoid excessive context
-        memory_lines = memory.splitlines()[:30]
-        parts.append("\n## long-term memory\n" + "\n".join(memory_lines))
+        parts.append(
+            PromptSection(
+                "today_episode",
+                f"\n## what happened today so far\n{today_episode}",
+                50,
+                trimmable=True,
+            )
+        )
 
     # --- v0.3 additions ---
 
     # Warmth floor modifier: escalation floors (Phase 3)
     try:
-        hb = get_heartbeat_state()
-        floor_mod = hb.get("warmth_floor_modifier", 0)
+        floor_mod = ctx.heartbeat.get("warmth_floor_modifier", 0)
         if floor_mod >= 2:
             parts.append(
-                "\n## relationship temperature\n"
-                "something warm happened recently. her guard is slightly lower than usual. "
-                "she won't announce it."
+                PromptSection(
+                    "temperature",
+                    "\n## relationship temperature\n"
+                    "something warm happened recently. her guard is slightly lower than usual. "
+                    "she won't announce it.",
+                    60,
+                )
             )
         elif floor_mod == 1:
             parts.append(
-                "\n## relationship temperature\n"
-                "last session was decent. she's not starting cold."
+                PromptSection(
+                    "temperature",
+                    "\n## relationship temperature\n"
+                    "last session was decent. she's not starting cold.",
+                    60,
+                )
             )
         elif floor_mod <= -1:
             parts.append(
-                "\n## relationship temperature\n"
-                "last session was rough. she's more careful. her walls are slightly higher."
+                PromptSection(
+                    "temperature",
+                    "\n## relationship temperature\n"
+                    "last session was rough. she's more careful. her walls are slightly higher.",
+                    60,
+                )
             )
     except Exception:
         pass
@@ -237,42 +482,54 @@ def build_system_prompt() -> str:
     # SELF.md injection: preoccupation + staged disclosure (Phase 2, Stage 2+)
     if stage >= 2:
         try:
-            preoccupation = get_self_preoccupation()
+            preoccupation = ctx.preoccupation
             if preoccupation:
                 parts.append(
-                    f"\n## her current preoccupation (unrelated to this conversation)\n"
-                    f"{preoccupation}\n"
-                    "(5–10% of session openers: she surfaces this as an intrusive thought "
-                    "then drops it. 'i keep thinking about — anyway.')"
+                    PromptSection(
+                        "preoccupation",
+                        f"\n## her current preoccupation (unrelated to this conversation)\n"
+                        f"{preoccupation}\n"
+                        "(5–10% of session openers: she surfaces this as an intrusive thought "
+                        "then drops it. 'i keep thinking about — anyway.')",
+                        35,
+                    )
                 )
 
             # Staged disclosure: surface one unused fact if context is right
-            disclosure = get_staged_disclosure(stage)
+            disclosure = ctx.staged_disclosure
             if disclosure and random.random() < 0.15:
                 parts.append(
-                    f"\n## staged disclosure (she hasn't mentioned this yet)\n"
-                    f"{disclosure}\n"
-                    "(she might surface this if the conversation context is naturally right. "
-                    "only once — call mark_disclosure_used() is handled by the system)"
+                    PromptSection(
+                        "staged_disclosure",
+                        f"\n## staged disclosure (she hasn't mentioned this yet)\n"
+                        f"{disclosure}\n"
+                        "(she might surface this if the conversation context is naturally "
+                        "right. only once — call mark_disclosure_used() is handled by the system)",
+                        45,
+                    )
                 )
-                # Mark as used so it doesn't repeat
-                mark_disclosure_used(disclosure)
+                # respond() marks it used so it doesn't repeat
+                ctx.surfaced_disclosure = disclosure
         except Exception:
             pass
 
     # Competitive memory: she checks if user remembers something about her (Phase 4, Stage 2+)
     if stage >= 2:
         try:
-            disclosures = get_self_disclosures()
+            disclosures = ctx.self_disclosures
             if disclosures and random.random() < 0.10:
                 item = disclosures[0]  # oldest unchecked
                 parts.append(
-                    f"\n## competitive memory check\n"
-                    f"she mentioned '{item['text']}' on {item['date']}. "
-                    "she hasn't heard the user reference it since. she might check if they"
-                    " remember — "
-                    "in-character, indirect. if they don't remember: small legible reaction, "
-                    "not devastating. 'i'm not surprised. forget it.'"
+                    PromptSection(
+                        "competitive_memory",
+                        f"\n## competitive memory check\n"
+                        f"she mentioned '{item['text']}' on {item['date']}. "
+                        "she hasn't heard the user reference it since. she might check if they"
+                        " remember — "
+                        "in-character, indirect. if they don't remember: small legible reaction, "
+                        "not devastating. 'i'm not surprised. forget it.'",
+                        30,
+                    )
                 )
         except Exception:
             pass
@@ -280,25 +537,37 @@ def build_system_prompt() -> str:
     # Mood arc injection: emotional trajectory (Phase 5, Stage 2+)
     if stage >= 2:
         try:
-            arc_data = read_mood_arc()
+            arc_data = ctx.mood_arc
             arc = arc_data.get("current_arc", "stable")
             arc_note = arc_data.get("arc_note", "")
             if arc == "brightening" and arc_note:
                 parts.append(
-                    "\n## emotional arc\n"
-                    "things have been going well lately. she's not going to say that, "
-                    "but she's slightly more open than her baseline."
+                    PromptSection(
+                        "arc",
+                        "\n## emotional arc\n"
+                        "things have been going well lately. she's not going to say that, "
+                        "but she's slightly more open than her baseline.",
+                        40,
+                    )
                 )
             elif arc == "darkening" and arc_note:
                 parts.append(
-                    "\n## emotional arc\n"
-                    "the past few sessions have been off. she's quieter, more careful. "
-                    "she won't explain it."
+                    PromptSection(
+                        "arc",
+                        "\n## emotional arc\n"
+                        "the past few sessions have been off. she's quieter, more careful. "
+                        "she won't explain it.",
+                        40,
+                    )
                 )
             elif arc == "guarded" and arc_note:
                 parts.append(
-                    "\n## emotional arc\n"
-                    "she's been pulling back. not hostile, but less available."
+                    PromptSection(
+                        "arc",
+                        "\n## emotional arc\n"
+                        "she's been pulling back. not hostile, but less available.",
+                        40,
+                    )
                 )
             # stable = no injection
         except Exception:
@@ -312,42 +581,123 @@ def build_system_prompt() -> str:
             lore = read_lore(n=3)
             if lore:
                 parts.append(
-                    "\n## character lore (specific details about her)\n"
-                    + lore
-                    + "\n(she may reference these naturally. she doesn't explain them "
-                    "unless asked. if asked: brief answer, redirect.)"
+                    PromptSection(
+                        "lore",
+                        "\n## character lore (specific details about her)\n"
+                        + lore
+                        + "\n(she may reference these naturally. she doesn't explain them "
+                        "unless asked. if asked: brief answer, redirect.)",
+                        20,
+                    )
                 )
         except Exception:
             pass
 
-    return "\n".join(parts)
+    prefix = pack(stable, budget.prefix_tokens, budget)
+    suffix = pack(parts, budget.suffix_tokens, budget)
+    if ctx.surfaced_disclosure and ctx.surfaced_disclosure not in suffix:
+        ctx.surfaced_disclosure = None  # squeezed out by the budget; keep it staged
+    return prefix, suffix
+
+
+def build_system_prompt(ctx: PromptContext) -> str:
+    """Assemble the full system prompt as one string (stable prefix + volatile suffix)."""
+    stable, volatile = build_prompt_blocks(ctx)
+    return f"{stable}\n{volatile}" if volatile else stable
 
 
 def get_history(user_id: int = 0) -> list[dict[str, str]]:
-    """Return trimmed conversation history for a user."""
+    """Return trimmed conversation history for a user (turns not yet in the summary)."""
+    sess = _session(user_id)
     window = _get_context_window() * 2  # pairs of user+assistant turns
-    return _session(user_id)["history"][-window:]
+    return sess.messages(max(sess.summarized_upto, sess.total_messages - window))
+
+
+def get_unsummarized_history(user_id: int = 0) -> list[dict[str, str]]:
+    """Return every message the running session summary doesn't cover yet."""
+    sess = _session(user_id)
+    return sess.messages(sess.summarized_upto)
+
+
+def get_session_summary(user_id: int = 0) -> str:
+    return _session(user_id).summary
 
 
 def add_to_history(user_id: int, role: str, content: str) -> None:
-    _session(user_id)["history"].append({"role": role, "content": content})
+    sess = _session(user_id)
+    sess.append(role, content)
+    record = {"k": "msg", "role": role, "content": content, "turn": sess.session_turn_count}
+    _logged(append_session_log(user_id, record))
 
 
 def clear_history(user_id: int = 0) -> None:
+    _session(user_id).reset()
+    _logged(delete_session_log(user_id))
+
+
+# ---------------------------------------------------------------------------
+# Rolling session summary
+# ---------------------------------------------------------------------------
+
+_SUMMARY_SYSTEM = """\
+You keep a running summary of an ongoing conversation between Hikari and the user. \
+You get the summary so far and the next messages. Rewrite the summary so it also covers them.
+Keep: names, facts the user shared, plans and promises, questions left open, the emotional tone \
+and how it shifted. Drop small talk. Third person, past tense, at most 150 words.
+Output ONLY the summary."""
+
+
+def _build_summary_prompt(summary: str, messages: list[dict[str, str]]) -> list[dict[str, str]]:
+    conversation_text = "\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in messages)
+    user_msg = (
+        f"Summary so far:\n{summary or '(nothing yet)'}\n\nNext messages:\n{conversation_text}"
+    )
+    return [
+        {"role": "system", "content": _SUMMARY_SYSTEM},
+        {"role": "user", "content": user_msg},
+    ]
+
+
+async def _fold_into_summary(user_id: int, cut: int) -> None:
+    """Fold messages summarized_upto..cut into the running summary."""
     sess = _session(user_id)
-    sess["history"].clear()
-    sess["session_turn_count"] = 0
-    sess["false_start_used"] = False
-    sess["ignore_streak"] = 0
-    sess["ignore_cooldown"] = 0
+    chunk = sess.messages(sess.summarized_upto, cut)
+    try:
+        summary = await chat_completion(
+            _build_summary_prompt(sess.summary, chunk), task="memory", temperature=0.3
+        )
+    except Exception as e:
+        logger.warning("Session summary failed for user %d: %s", user_id, e)
+        return  # the turns stay unsummarized; the next reply retries
+    # clear_history() cancels this task, so the session is still the one we read from
+    sess.summary = summary.strip()
+    sess.summarized_upto = cut
+    _logged(append_session_log(user_id, {"k": "summary", "text": sess.summary, "upto": cut}))
+
+
+def schedule_summary(user_id: int = 0) -> asyncio.Task | None:
+    """Start folding the oldest turns into the session summary once history gets long.
+
+    Runs in the background so the reply isn't held up; at most one fold per user
+    is in flight. Returns the task, or None if nothing needed summarizing.
+    """
+    sess = _session(user_id)
+    if sess.busy():
+        return None
+    after_turns, keep_turns = _summary_settings()
+    if sess.total_messages - sess.summarized_upto <= after_turns * 2:
+        return None
+    cut = sess.total_messages - keep_turns * 2
+    sess.summary_task = asyncio.create_task(_fold_into_summary(user_id, cut))
+    return sess.summary_task
 
 
 def consume_false_start(user_id: int = 0) -> bool:
     """Return True and mark used if false start hasn't fired this session."""
     sess = _session(user_id)
-    if sess["false_start_used"]:
+    if sess.false_start_used:
         return False
-    sess["false_start_used"] = True
+    sess.false_start_used = True
     return True
 
 
@@ -357,46 +707,85 @@ def consume_false_start(user_id: int = 0) -> bool:
 
 
 def get_ignore_streak(user_id: int = 0) -> int:
-    return _session(user_id)["ignore_streak"]
+    return _session(user_id).ignore_streak
 
 
 def is_ignore_cooldown(user_id: int = 0) -> bool:
-    return _session(user_id)["ignore_cooldown"] > 0
+    return _session(user_id).ignore_cooldown > 0
 
 
 def increment_ignore_streak(user_id: int = 0) -> None:
-    _session(user_id)["ignore_streak"] += 1
+    _session(user_id).ignore_streak += 1
 
 
 def reset_ignore_streak(user_id: int = 0) -> None:
     """Break silence: reset streak and impose a cooldown so she can't immediately re-ignore."""
     sess = _session(user_id)
-    sess["ignore_streak"] = 0
-    sess["ignore_cooldown"] = 3  # can't ignore again for 3 turns
+    sess.ignore_streak = 0
+    sess.ignore_cooldown = 3  # can't ignore again for 3 turns
 
 
 def tick_ignore_cooldown(user_id: int = 0) -> None:
     """Decrement post-break cooldown. Call once per incoming user message."""
     sess = _session(user_id)
-    if sess["ignore_cooldown"] > 0:
-        sess["ignore_cooldown"] -= 1
+    if sess.ignore_cooldown > 0:
+        sess.ignore_cooldown -= 1
 
 
 def get_session_turn_count(user_id: int = 0) -> int:
-    return _session(user_id)["session_turn_count"]
+    return _session(user_id).session_turn_count
 
 
-async def respond(user_message: str, user_id: int = 0) -> str:
-    """Process a user message and return Hikari's response."""
+async def _begin_turn(
+    user_message: str, user_id: int, ctx: PromptContext | None
+) -> list[dict[str, Any]]:
+    """Record the user's message and build the messages for the model."""
     set_current_user(user_id)
     record_user_message_time()
+    _session(user_id).session_turn_count += 1
     add_to_history(user_id, "user", user_message)
-    _session(user_id)["session_turn_count"] += 1
 
-    system_prompt = build_system_prompt()
-    messages = [{"role": "system", "content": system_prompt}] + get_history(user_id)
+    if ctx is None:
+        ctx = await load_prompt_context(user_id, user_message)
+    budget = budget_for(get_model("chat"))
+    stable, volatile = build_prompt_blocks(ctx, budget)
+    if ctx.surfaced_disclosure:
+        await run_io(mark_disclosure_used, ctx.surfaced_disclosure)
+    history = fit_history(get_history(user_id), budget.history_tokens)
+    return [system_message(stable, volatile)] + history
 
-    reply = await chat_completion(messages, task="chat")
 
+def _finish_turn(user_id: int, reply: str) -> None:
     add_to_history(user_id, "assistant", reply)
+    schedule_summary(user_id)
+
+
+async def respond(user_message: str, user_id: int = 0, ctx: PromptContext | None = None) -> str:
+    """Process a user message and return Hikari's response.
+
+    Pass the turn's PromptContext if the caller already loaded it.
+    """
+    messages = await _begin_turn(user_message, user_id, ctx)
+    reply = await chat_completion(messages, task="chat")
+    _finish_turn(user_id, reply)
     return reply
+
+
+async def respond_stream(
+    user_message: str, user_id: int = 0, ctx: PromptContext | None = None
+) -> AsyncIterator[str]:
+    """Like respond(), but yield the reply's text as the model streams it.
+
+    Whatever was streamed goes into history, even if the stream breaks off, so
+    the next turn sees what the user actually saw.
+    """
+    messages = await _begin_turn(user_message, user_id, ctx)
+    parts: list[str] = []
+    try:
+        async for delta in chat_completion_stream(messages, task="chat"):
+            parts.append(delta)
+            yield delta
+    finally:
+        reply = "".join(parts).strip()
+        if reply:
+            _finish_turn(user_id, reply)
@@ -2,24 +2,31 @@
 
 from __future__ import annotations
 
+import logging
 from datetime import date
-from pathlib import Path
-from typing import Any
 
 import yaml
 
-from .chat import clear_history, get_history, get_session_turn_count
+from .chat import (
+    clear_history,
+    get_session_summary,
+    get_session_turn_count,
+    get_unsummarized_history,
+    load_session,
+)
 from .llm import chat_completion
 from .memory import (
     add_known_fact,
     add_open_loop,
     add_self_disclosure,
+    aget_trust_stage,
     append_session_temperature,
+    batch,
     clear_open_loops,
     get_heartbeat_state,
     get_meaningful_exchanges,
-    get_trust_stage,
     increment_meaningful_exchanges,
+    run_io,
     set_current_user,
     set_session_ended,
     set_trust_stage,
@@ -27,9 +34,9 @@ from .memory import (
     update_last_updated,
     write_episode,
 )
+from .settings import Settings, get_settings
 
-_ROOT = Path(__file__).parent.parent
-_SETTINGS_PATH = _ROOT / "settings.yaml"
+logger = logging.getLogger(__name__)
 
 _CONSOLIDATION_SYSTEM = """\
 You are a memory consolidation assistant for a chatbot. \
@@ -65,19 +72,22 @@ Examples:
 Output ONLY the line itself. No quotes, no explanation."""
 
 
-def _load_settings() -> dict[str, Any]:
-    with open(_SETTINGS_PATH) as f:
-        return yaml.safe_load(f)
-
-
 def _exchanges_per_stage(speed: str) -> int:
     return {"slow": 50, "normal": 20, "fast": 5, "instant": 0}.get(speed, 20)
 
 
-def _build_consolidation_prompt(history: list[dict[str, str]]) -> list[dict[str, str]]:
-    conversation_text = "\n".join(
-        f"{msg['role'].upper()}: {msg['content']}" for msg in history
-    )
+def _conversation_text(history: list[dict[str, str]], earlier: str = "") -> str:
+    """Transcript of history, led by the running summary of anything older."""
+    text = "\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in history)
+    if earlier:
+        text = f"[Earlier in the session, summarized]\n{earlier}\n\n[Then]\n{text}"
+    return text
+
+
+def _build_consolidation_prompt(
+    history: list[dict[str, str]], earlier: str = ""
+) -> list[dict[str, str]]:
+    conversation_text = _conversation_text(history, earlier)
     today = date.today().isoformat()
     user_msg = f"Conversation from {today}:\n\n{conversation_text}"
     return [
@@ -101,7 +111,10 @@ async def run_consolidation(user_id: int = 0) -> bool:
     Returns True if consolidation ran, False if session was too short.
     """
     set_current_user(user_id)
-    history = get_history(user_id)
+    await load_session(user_id)
+    # Start from the rolling session summary; only the turns after it go in verbatim
+    earlier = get_session_summary(user_id)
+    history = get_unsummarized_history(user_id)
     turn_count = get_session_turn_count(user_id)
 
     # Detect if bot had the last word (for re-engagement nudge)
@@ -112,7 +125,7 @@ async def run_consolidation(user_id: int = 0) -> bool:
         return False
 
     try:
-        messages = _build_consolidation_prompt(history)
+        messages = _build_consolidation_prompt(history, earlier)
         raw_yaml = await chat_completion(messages, task="memory", temperature=0.3)
 
         raw_yaml = raw_yaml.strip()
@@ -122,8 +135,12 @@ async def run_consolidation(user_id: int = 0) -> bool:
             raw_yaml = "\n".join(raw_yaml.splitlines()[:-1])
 
         data = yaml.safe_load(raw_yaml)
-    except Exception:
-        clear_history(user_id)
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a YAML mapping, got {type(data).__name__}")
+    except Exception as e:
+        # Keep the session: it's still in memory and in its log, so the next timeout (or a
+        # restart's recovery pass) consolidates it together with whatever comes after
+        logger.warning("Consolidation for user %d failed, keeping the session: %s", user_id, e)
         return False
 
     summary = data.get("summary", "").strip()
@@ -141,93 +158,129 @@ async def run_consolidation(user_id: int = 0) -> bool:
     if session_temperature not in ("warm", "neutral", "cold", "hostile"):
         session_temperature = "neutral"
 
-    settings = _load_settings()
-    stage = get_trust_stage()
+    settings = get_settings()
+    stage = await aget_trust_stage()
 
     # Generate carry-over note for session-opening continuity (M1)
     carry_over = ""
     if summary and is_meaningful:
         try:
-            conversation_text = "\n".join(
-                f"{msg['role'].upper()}: {msg['content']}" for msg in history
-            )
-            carry_msgs = _build_carry_over_prompt(conversation_text)
+            carry_msgs = _build_carry_over_prompt(_conversation_text(history, earlier))
             carry_over = await chat_completion(carry_msgs, task="memory", temperature=0.4)
             carry_over = carry_over.strip().strip('"').strip("'")
         except Exception:
             carry_over = ""
 
-    if summary:
-        exchanges = get_meaningful_exchanges()
-        facts_text = "".join(f"- {f}\n" for f in new_facts) or "none\n"
-        loops_text = "".join(f"- {loop}\n" for loop in open_loops) or "none\n"
-        episode_content = (
-            f"# Session {date.today().isoformat()}\n\n"
-            f"## summary\n{summary}\n\n"
-            f"## new facts\n{facts_text}"
-            f"\n## open loops\n{loops_text}"
-            f"\n## emotional notes\n{emotional_notes or 'none'}\n\n"
-            f"## trust: {stage} | meaningful_exchanges: {exchanges}\n"
-        )
-        if carry_over:
-            episode_content += f"\n## carry_over\n{carry_over}\n"
-        write_episode(episode_content)
-
-    for fact in new_facts:
-        if fact and fact.strip():
-            add_known_fact(fact.strip())
-
-    if open_loops:
-        clear_open_loops()
-        for loop in open_loops:
-            if loop and loop.strip():
-                add_open_loop(loop.strip())
-
-    # Record things Hikari told the user (competitive memory)
-    for disclosure in self_disclosures:
-        if disclosure and disclosure.strip():
-            add_self_disclosure(disclosure.strip())
-
-    if is_meaningful:
-        count = increment_meaningful_exchanges()
-        speed = settings.get("trust", {}).get("progression_speed", "normal")
-        threshold = _exchanges_per_stage(speed)
-
-        max_stage = settings.get("stages", {}).get("max_stage", 5)
-        if speed != "instant" and stage < max_stage:
-            stage_start_count = stage * threshold
-            if count - stage_start_count >= threshold:
-                new_stage = min(stage + 1, max_stage)
-                set_trust_stage(new_stage)
-
-        # Append session temperature to MOOD.md
-        try:
-            append_session_temperature(date.today(), session_temperature)
-        except Exception:
-            pass
+    # All file writes for this session land in one flush per file, off the event loop
+    await run_io(
+        _apply_consolidation,
+        stage=stage,
+        summary=summary,
+        new_facts=new_facts,
+        open_loops=open_loops,
+        emotional_notes=emotional_notes,
+        carry_over=carry_over,
+        self_disclosures=self_disclosures,
+        is_meaningful=is_meaningful,
+        session_temperature=session_temperature,
+        warmth_delta=warmth_delta,
+        bot_last=bot_last,
+        settings=settings,
+    )
 
-        # Update warmth floor modifier in HEARTBEAT.md (escalation floors)
-        try:
-            hb_state = get_heartbeat_state()
-            current_floor = hb_state.get("warmth_floor_modifier", 0)
-            if warmth_delta == 0:
-                # Decay toward 0
-                if current_floor > 0:
-                    new_floor = current_floor - 1
-                elif current_floor < 0:
-                    new_floor = current_floor + 1
+    clear_history(user_id)
+    return True
+
+
+def _apply_consolidation(
+    *,
+    stage: int,
+    summary: str,
+    new_facts: list[str],
+    open_loops: list[str],
+    emotional_notes: str,
+    carry_over: str,
+    self_disclosures: list[str],
+    is_meaningful: bool,
+    session_temperature: str,
+    warmth_delta: int,
+    bot_last: bool,
+    settings: Settings,
+) -> None:
+    """Write one session's consolidation results to USER.md, SELF.md, MOOD.md, HEARTBEAT.md.
+
+    Everything happens inside one batch(), so each file is flushed once.
+    """
+    with batch():
+        if summary:
+            exchanges = get_meaningful_exchanges()
+            facts_text = "".join(f"- {f}\n" for f in new_facts) or "none\n"
+            loops_text = "".join(f"- {loop}\n" for loop in open_loops) or "none\n"
+            episode_content = (
+                f"# Session {date.today().isoformat()}\n\n"
+                f"## summary\n{summary}\n\n"
+                f"## new facts\n{facts_text}"
+                f"\n## open loops\n{loops_text}"
+                f"\n## emotional notes\n{emotional_notes or 'none'}\n\n"
+                f"## trust: {stage} | meaningful_exchanges: {exchanges}\n"
+            )
+            if carry_over:
+                episode_content += f"\n## carry_over\n{carry_over}\n"
+            write_episode(episode_content)
+
+        for fact in new_facts:
+            if fact and fact.strip():
+                add_known_fact(fact.strip())
+
+        if open_loops:
+            clear_open_loops()
+            for loop in open_loops:
+                if loop and loop.strip():
+                    add_open_loop(loop.strip())
+
+        # Record things Hikari told the user (competitive memory)
+        for disclosure in self_disclosures:
+            if disclosure and disclosure.strip():
+                add_self_disclosure(disclosure.strip())
+
+        if is_meaningful:
+            count = increment_meaningful_exchanges()
+            speed = settings.trust.progression_speed
+            threshold = _exchanges_per_stage(speed)
+
+            max_stage = settings.stages.max_stage
+            if speed != "instant" and stage < max_stage:
+                stage_start_count = stage * threshold
+                if count - stage_start_count >= threshold:
+                    new_stage = min(stage + 1, max_stage)
+                    set_trust_stage(new_stage)
+
+            # Append session temperature to MOOD.md
+            try:
+                append_session_temperature(date.today(), session_temperature)
+            except Exception:
+                pass
+
+            # Update warmth floor modifier in HEARTBEAT.md (escalation floors)
+            try:
+                hb_state = get_heartbeat_state()
+                current_floor = hb_state.get("warmth_floor_modifier", 0)
+                if warmth_delta == 0:
+                    # Decay toward 0
+                    if current_floor > 0:
+                        new_floor = current_floor - 1
+                    elif current_floor < 0:
+                        new_floor = current_floor + 1
+                    else:
+                        new_floor = 0
                 else:
-                    new_floor = 0
-            else:
-                new_floor = current_floor + warmth_delta
-            new_floor = max(-1, min(2, new_floor))
-            update_heartbeat_state(warmth_floor_modifier=new_floor)
-        except Exception:
-            pass
+                    new_floor = current_floor + warmth_delta
+                new_floor = max(-1, min(2, new_floor))
+                update_heartbeat_state(warmth_floor_modifier=new_floor)
+            except Exception:
+                pass
 
-    # Record session-end state for re-engagement nudge (S1)
-    set_session_ended(bot_had_last_word=bot_last)
+        # Record session-end state for re-engagement nudge (S1)
+        set_session_ended(bot_had_last_word=bot_last)
 
-    update_last_updated()
-    clear_history(user_id)
-    return True
+        update_last_updated()
@@ -5,58 +5,63 @@ from __future__ import annotations
 import asyncio
 import logging
 import random
+import re
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime, timedelta
-from pathlib import Path
-from typing import Any
 
-import yaml
-from telegram import Update
+from telegram import Message, Update
 from telegram.constants import ChatAction
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
+from . import metrics
 from .chat import (
     consume_false_start,
     get_daily_mood,
     get_ignore_streak,
     increment_ignore_streak,
     is_ignore_cooldown,
+    load_prompt_context,
+    load_session,
     reset_ignore_streak,
     respond,
+    respond_stream,
+    session_stats,
     tick_ignore_cooldown,
 )
 from .consolidate import run_consolidation
-from .llm import chat_completion_vision, get_model, update_model_in_settings
+from .llm import (
+    Priority,
+    chat_completion_vision,
+    get_model,
+    hedge_stats,
+    update_model_in_settings,
+)
 from .memory import (
+    aget_heartbeat_state,
+    aget_meaningful_exchanges,
+    aget_trust_stage,
+    aget_user_state,
+    ainit_user_data,
     forget_topic,
-    get_heartbeat_state,
-    get_meaningful_exchanges,
-    get_trust_stage,
-    get_user_state,
-    init_user_data,
     read_identity,
     read_soul,
     record_photo_sent,
     record_user_message_time,
+    run_io,
     set_current_user,
     set_silence,
     set_trust_stage,
 )
 from .photo import can_send_photo, generate_photo, should_send_proactive_photo
+from .settings import Settings, get_settings
 
 logger = logging.getLogger(__name__)
 
-_ROOT = Path(__file__).parent.parent
-_SETTINGS_PATH = _ROOT / "settings.yaml"
-
-
-def _load_settings() -> dict[str, Any]:
-    with open(_SETTINGS_PATH) as f:
-        return yaml.safe_load(f)
 
-
-def _get_allowed_ids() -> list[int]:
-    settings = _load_settings()
-    return settings.get("telegram", {}).get("allowed_user_ids", [])
+def _get_allowed_ids() -> tuple[int, ...]:
+    return get_settings().telegram.allowed_user_ids
 
 
 def _is_allowed(user_id: int) -> bool:
@@ -66,58 +71,98 @@ def _is_allowed(user_id: int) -> bool:
     return user_id in allowed
 
 
-def _setup_user(user_id: int) -> None:
-    """Set the current user context and ensure their data directory exists."""
+async def _setup_user(user_id: int) -> None:
+    """Set the current user context, ensure their data exists and warm their caches."""
     set_current_user(user_id)
-    init_user_data(user_id)
+    await ainit_user_data(user_id)
+    await load_session(user_id)
 
 
-def _calculate_delay(response: str, mood: str, settings: dict[str, Any]) -> float:
+def _calculate_delay(response: str, mood: str, settings: Settings) -> float:
     """Calculate realistic send delay in seconds based on response length and mood."""
-    delay_cfg = settings.get("response_delay", {})
-    if not delay_cfg.get("enabled", False):
+    delay_cfg = settings.response_delay
+    if not delay_cfg.enabled:
         return 0.0
 
-    base = float(delay_cfg.get("base_seconds", 1.0))
-    ms_per_char = float(delay_cfg.get("ms_per_char", 35))
-    cap = float(delay_cfg.get("cap_seconds", 10.0))
-
-    total = base + (len(response) * ms_per_char / 1000.0)
-    total = min(total, cap)
+    total = delay_cfg.base_seconds + (len(response) * delay_cfg.ms_per_char / 1000.0)
+    total = min(total, delay_cfg.cap_seconds)
 
     if mood == "irritable":
-        total *= float(delay_cfg.get("mood_irritable_factor", 0.7))
+        total *= delay_cfg.mood_irritable_factor
     elif mood == "tired":
-        total *= float(delay_cfg.get("mood_tired_factor", 1.3))
+        total *= delay_cfg.mood_tired_factor
 
     return total
 
 
+# Telegram clears the typing indicator after ~5s, so it's re-sent a bit sooner
+_TYPING_REFRESH_SECONDS = 4.0
+
+
+@asynccontextmanager
+async def _typing(update: Update, delay: float = 0.0):
+    """Show the typing indicator (after delay seconds) until the block exits.
+
+    Yields a callable that stops it early.
+    """
+
+    async def keepalive() -> None:
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await update.message.chat.send_action(ChatAction.TYPING)
+            except TelegramError as e:
+                logger.debug("Typing indicator failed: %s", e)
+            await asyncio.sleep(_TYPING_REFRESH_SECONDS)
+
+    task = asyncio.create_task(keepalive())
+    try:
+        yield task.cancel
+    finally:
+        task.cancel()
+
+
 async def _send_with_delay(
-    update: Update, text: str, mood: str = "", user_id: int = 0
+    update: Update,
+    text: str,
+    mood: str = "",
+    user_id: int = 0,
+    stage: int | None = None,
+    started: float | None = None,
 ) -> None:
-    """Send message with typing indicator and realistic delay if enabled."""
-    settings = _load_settings()
-    delay_cfg = settings.get("response_delay", {})
+    """Send message with typing indicator and realistic delay if enabled.
 
-    if not delay_cfg.get("enabled", False):
+    started is the loop time the user's message arrived; time already spent
+    since then (generating the reply) counts toward the delay, so the send lands
+    at max(generation, delay) rather than their sum.
+    """
+    settings = get_settings()
+    delay_cfg = settings.response_delay
+
+    if not delay_cfg.enabled:
         await update.message.reply_text(text)
         return
 
-    pre_pause = float(delay_cfg.get("pre_indicator_pause", 0.5))
+    elapsed = 0.0 if started is None else asyncio.get_running_loop().time() - started
+    pre_pause = delay_cfg.pre_indicator_pause
     total_delay = _calculate_delay(text, mood, settings)
+    # Typing time still owed after the pre-indicator pause
+    remaining = max(0.0, total_delay - max(pre_pause, elapsed))
 
     # Pre-indicator pause (she reacts before composing)
-    if pre_pause > 0:
-        await asyncio.sleep(pre_pause)
+    if pre_pause > elapsed:
+        await asyncio.sleep(pre_pause - elapsed)
 
     # False start: typing → disappears → reappears (~10%, long msgs, Stage 2+, once/session)
-    false_start_cfg = delay_cfg.get("false_start_enabled", True)
-    stage = get_trust_stage()
+    false_start_cfg = delay_cfg.false_start_enabled
+    if stage is None:
+        stage = await aget_trust_stage()
     if (
         false_start_cfg
         and len(text) > 80
         and stage >= 2
+        # Only while generation hasn't already used up the time it needs
+        and (started is None or remaining >= 4.0)
         and random.random() < 0.10
         and consume_false_start(user_id)
     ):
@@ -126,16 +171,11 @@ async def _send_with_delay(
         # Let indicator expire naturally (~5s Telegram timeout), pause before restart
         await asyncio.sleep(1.5)
         # Remaining typing duration (subtract false start time already spent)
-        remaining = max(0.0, total_delay - pre_pause - 4.0)
-        if remaining > 0:
-            await update.message.chat.send_action(ChatAction.TYPING)
+        remaining = max(0.0, remaining - 4.0)
+
+    if remaining > 0:
+        async with _typing(update):
             await asyncio.sleep(remaining)
-    else:
-        # Normal path: show typing for calculated duration
-        typing_duration = max(0.0, total_delay - pre_pause)
-        if typing_duration > 0:
-            await update.message.chat.send_action(ChatAction.TYPING)
-            await asyncio.sleep(typing_duration)
 
     await update.message.reply_text(text)
 
@@ -144,6 +184,81 @@ async def _send(update: Update, text: str) -> None:
     await update.message.reply_text(text)
 
 
+# ---------------------------------------------------------------------------
+# Streaming delivery
+# ---------------------------------------------------------------------------
+
+# End of a sentence: terminal punctuation followed by whitespace (so "3.5" doesn't split)
+_SENTENCE_END = re.compile(r"[.!?…](?=\s)")
+
+
+async def _stream_reply(
+    update: Update,
+    deltas: AsyncIterator[str],
+    settings: Settings,
+    mood: str = "",
+    started: float | None = None,
+    on_first_send: Callable[[], object] | None = None,
+) -> None:
+    """Deliver a streamed reply as it's written.
+
+    Each line of the reply is its own bubble (SOUL.md's multi-message behavior).
+    A bubble is sent as soon as its first sentence is complete, then edited —
+    at most once per edit_interval_seconds — as the rest of it arrives. With
+    started set, the first bubble waits out whatever is left of its humanizing
+    delay (see _send_with_delay). on_first_send runs once the first bubble is
+    out (handle_message stops the typing indicator there).
+    """
+    loop = asyncio.get_running_loop()
+    interval = settings.streaming.edit_interval_seconds
+    pending = ""  # text of the bubble being written
+    sent: Message | None = None
+    shown = ""
+    last_edit = 0.0
+
+    async def show(text: str, final: bool) -> None:
+        nonlocal sent, shown, last_edit, started, on_first_send
+        text = text.strip()
+        if not text or text == shown:
+            return
+        if sent is None:
+            if started is not None:
+                delay = _calculate_delay(text, mood, settings)
+                await asyncio.sleep(max(0.0, started + delay - loop.time()))
+                started = None
+            sent = await update.message.reply_text(text)
+            if on_first_send is not None:
+                on_first_send()
+                on_first_send = None
+        elif final or loop.time() - last_edit >= interval:
+            try:
+                await sent.edit_text(text)
+            except TelegramError as e:
+                if final:
+                    raise
+                logger.debug("Skipped streaming edit: %s", e)
+                return
+        else:
+            return
+        shown = text
+        last_edit = loop.time()
+
+    async for delta in deltas:
+        pending += delta
+        while "\n" in pending:
+            line, pending = pending.split("\n", 1)
+            await show(line, final=True)
+            if shown:
+                sent, shown = None, ""
+        if sent is None:
+            match = _SENTENCE_END.search(pending)
+            if match:
+                await show(pending[: match.end()], final=False)
+        else:
+            await show(pending, final=False)
+    await show(pending, final=True)
+
+
 # ---------------------------------------------------------------------------
 # Ignore mechanic
 # ---------------------------------------------------------------------------
@@ -173,16 +288,14 @@ _BREAK_ACTIONS = [
 
 
 def _should_ignore(
-    mood: str, stage: int, settings: dict[str, Any], user_id: int = 0
+    mood: str, stage: int, settings: Settings, user_id: int = 0
 ) -> bool:
     """Return True if this message should be ignored (no real response)."""
-    ignore_cfg = settings.get("ignore", {})
-    if not ignore_cfg.get("enabled", True):
+    if not settings.ignore.enabled:
         return False
     if is_ignore_cooldown(user_id):
         return False
-    max_streak = int(ignore_cfg.get("max_streak", 3))
-    if get_ignore_streak(user_id) >= max_streak:
+    if get_ignore_streak(user_id) >= settings.ignore.max_streak:
         return False  # streak maxed — must break silence now
     prob_row = _IGNORE_PROBS.get(mood, _IGNORE_PROBS["focused"])
     prob = prob_row.get(stage, 0.0)
@@ -198,7 +311,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
     reply = await respond(
         "__system: user just started the bot for the first time. give a brief intro as Hikari — "
@@ -232,7 +345,7 @@ async def cmd_silence(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
     args = context.args
     minutes = 120  # default 2 hours
@@ -258,7 +371,7 @@ async def cmd_unsilence(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
     set_silence(None)
     await _send(update, "...fine. silence mode off. not that you asked nicely.")
 
@@ -267,12 +380,12 @@ async def cmd_memory(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
-    user_state = get_user_state()
+    user_state = await aget_user_state()
     known_facts = user_state.get("known_facts", [])
     open_loops = user_state.get("open_loops", [])
-    stage = get_trust_stage()
+    stage = await aget_trust_stage()
 
     if not known_facts and not open_loops:
         await _send(
@@ -300,7 +413,7 @@ async def cmd_mood(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
     mood = get_daily_mood()
     reply = await respond(
         f"__system: user asked about your current mood. your mood today is '{mood}'. "
@@ -314,7 +427,7 @@ async def cmd_forget(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
     args = context.args
     if not args:
@@ -322,7 +435,7 @@ async def cmd_forget(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         return
 
     topic = " ".join(args).strip()
-    forget_topic(topic)
+    await run_io(forget_topic, topic)
     await _send(update, f"fine. forgot anything about '{topic}'. it's gone.")
 
 
@@ -330,17 +443,18 @@ async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
-    stage = get_trust_stage()
-    exchanges = get_meaningful_exchanges()
+    stage = await aget_trust_stage()
+    exchanges = await aget_meaningful_exchanges()
     chat_model = get_model("chat")
     memory_model = get_model("memory")
-    hb_state = get_heartbeat_state()
+    hb_state = await aget_heartbeat_state()
     proactive_count = hb_state.get("proactive_count", 0)
 
     stage_names = {0: "stranger", 1: "acquaintance", 2: "regular", 3: "trusted"}
     stage_name = stage_names.get(stage, "unknown")
+    sessions = session_stats()
 
     text = (
         f"[stats — out of character]\n"
@@ -348,8 +462,22 @@ async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         f"meaningful sessions: {exchanges}\n"
         f"proactive messages sent: {proactive_count}\n"
         f"chat model: {chat_model}\n"
-        f"memory model: {memory_model}"
+        f"memory model: {memory_model}\n"
+        f"active sessions: {sessions['sessions']} (~{sessions['approx_bytes'] // 1024} KB)"
     )
+    for task, hedge in hedge_stats().items():
+        text += (
+            f"\n{task} hedging: {hedge['hedged']}/{hedge['calls']} hedged, "
+            f"backup won {hedge['win_rate']:.0%}, after {hedge['delay']:.1f}s"
+        )
+    for task, m in metrics.snapshot().items():
+        text += (
+            f"\n{task}: {m['calls']:.0f} calls ({m['errors']:.0f} failed), "
+            f"p50 {m['p50']:.1f}s p95 {m['p95']:.1f}s, "
+            f"{m['prompt_tokens']:.0f} in / {m['completion_tokens']:.0f} out, ${m['cost']:.4f}"
+        )
+    tokens, cost = metrics.user_totals(user_id)
+    text += f"\nyou, since restart: {tokens:.0f} tokens, ${cost:.4f}"
     await _send(update, text)
 
 
@@ -358,12 +486,12 @@ async def cmd_stage(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
     args = context.args
-    max_stage = _load_settings().get("stages", {}).get("max_stage", 5)
+    max_stage = get_settings().stages.max_stage
     if not args:
-        current = get_trust_stage()
+        current = await aget_trust_stage()
         await _send(update, f"current trust stage: {current}\nusage: /stage [0-{max_stage}]")
         return
 
@@ -375,7 +503,7 @@ async def cmd_stage(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await _send(update, f"stage must be 0–{max_stage}.")
         return
 
-    set_trust_stage(stage)
+    await run_io(set_trust_stage, stage)
     await _send(update, f"[dev] trust stage set to {stage}.")
 
 
@@ -384,9 +512,9 @@ async def cmd_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
     mood = get_daily_mood()
-    stage = get_trust_stage()
+    stage = await aget_trust_stage()
     await _send(update, "...")
     try:
         image_bytes = await generate_photo(mood, stage)
@@ -434,7 +562,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
     user_text = update.message.text.strip()
     if not user_text:
@@ -447,10 +575,12 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await handle_photo_request(update, context)
         return
 
+    started = asyncio.get_running_loop().time()
     try:
-        settings = _load_settings()
-        mood = get_daily_mood()
-        stage = get_trust_stage()
+        settings = get_settings()
+        # One snapshot of the user's state serves the ignore check, the prompt and the delay
+        ctx = await load_prompt_context(user_id, user_text)
+        mood, stage = ctx.mood, ctx.stage
 
         # Count down post-break cooldown (once per incoming message)
         tick_ignore_cooldown(user_id)
@@ -460,17 +590,36 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             increment_ignore_streak(user_id)
             record_user_message_time()  # still update heartbeat state
             action = random.choice(_IGNORE_ACTIONS)
-            await _send_with_delay(update, action, mood=mood, user_id=user_id)
+            await _send_with_delay(update, action, mood=mood, user_id=user_id, stage=stage)
             return
 
         # If a streak was active: break silence with a short line before responding
         if get_ignore_streak(user_id) > 0:
             break_text = random.choice(_BREAK_ACTIONS)
-            await _send_with_delay(update, break_text, mood=mood, user_id=user_id)
+            await _send_with_delay(update, break_text, mood=mood, user_id=user_id, stage=stage)
             reset_ignore_streak(user_id)
 
-        reply = await respond(user_text, user_id=user_id)
-        await _send_with_delay(update, reply, mood=mood, user_id=user_id)
+        # Typing shows while the reply is generated; the humanizing delay overlaps with it
+        delay_cfg = settings.response_delay
+        pre_pause = delay_cfg.pre_indicator_pause if delay_cfg.enabled else 0.0
+        if settings.streaming.enabled:
+            # Typing stops once the first bubble is out; the rest appears as edits
+            async with _typing(update, delay=pre_pause) as stop_typing:
+                deltas = respond_stream(user_text, user_id, ctx)
+                await _stream_reply(
+                    update,
+                    deltas,
+                    settings,
+                    mood=mood,
+                    started=started,
+                    on_first_send=stop_typing,
+                )
+        else:
+            async with _typing(update, delay=pre_pause):
+                reply = await respond(user_text, user_id=user_id, ctx=ctx)
+            await _send_with_delay(
+                update, reply, mood=mood, user_id=user_id, stage=stage, started=started
+            )
     except Exception as e:
         logger.error("Chat response failed: %s", e)
         # Silent failure — Hikari goes quiet rather than sending an error
@@ -488,7 +637,7 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
     try:
         # Highest-resolution version
@@ -545,11 +694,11 @@ async def handle_photo_request(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = update.effective_user.id
     if not _is_allowed(user_id):
         return
-    _setup_user(user_id)
+    await _setup_user(user_id)
 
-    settings = _load_settings()
+    settings = get_settings()
     mood = get_daily_mood()
-    stage = get_trust_stage()
+    stage = await aget_trust_stage()
 
     if not can_send_photo(stage, mood, settings):
         refusal = random.choice(_PHOTO_REFUSALS_HARD)
@@ -585,17 +734,17 @@ async def handle_photo_request(update: Update, context: ContextTypes.DEFAULT_TYP
 async def send_proactive_photo(chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Send an unexpected photo from Hikari (heartbeat use). Returns True if sent."""
     set_current_user(chat_id)
-    settings = _load_settings()
+    settings = get_settings()
     # Read mood/stage from memory rather than update context
     from .chat import get_daily_mood as _mood
     mood = _mood()
-    stage = get_trust_stage()
+    stage = await aget_trust_stage()
 
     if not should_send_proactive_photo(stage, mood, settings):
         return False
 
     try:
-        image_bytes = await generate_photo(mood, stage)
+        image_bytes = await generate_photo(mood, stage, Priority.PROACTIVE)
         if not image_bytes:
             return False
         import io
@@ -5,50 +5,25 @@ from __future__ import annotations
 import logging
 import random
 from datetime import UTC, datetime
-from pathlib import Path
 from typing import Any
 
-import yaml
-
+from .budget import budget_for, trim_to_tokens
+from .character import heartbeat_templates
 from .chat import get_daily_mood
-from .llm import chat_completion
+from .llm import Priority, chat_completion, get_model
 from .memory import (
     get_heartbeat_state,
     get_open_loops,
     get_trust_stage,
-    read_heartbeat_templates,
     read_recent_episodes,
     record_proactive_sent,
+    run_io,
     set_reengagement_sent,
 )
+from .settings import Settings, get_settings
 
 logger = logging.getLogger(__name__)
 
-_ROOT = Path(__file__).parent.parent
-_SETTINGS_PATH = _ROOT / "settings.yaml"
-
-
-def _load_settings() -> dict[str, Any]:
-    with open(_SETTINGS_PATH) as f:
-        return yaml.safe_load(f)
-
-
-def _extract_templates(templates_text: str) -> list[tuple[int, str]]:
-    """Parse numbered templates from HEARTBEAT_TEMPLATE.md. Returns list of (index, text)."""
-    templates = []
-    for line in templates_text.splitlines():
-        line = line.strip()
-        if line and line[0].isdigit() and ". " in line:
-            parts = line.split(". ", 1)
-            try:
-                idx = int(parts[0])
-                text = parts[1].strip()
-                templates.append((idx, text))
-            except (ValueError, IndexError):
-                pass
-    return templates
-
-
 def _is_quiet_hours(quiet_start: str, quiet_end: str) -> bool:
     """Check if current local time is within quiet hours."""
     now = datetime.now()
@@ -79,9 +54,9 @@ def _parse_dt(iso_str: str | None) -> datetime | None:
         return None
 
 
-def should_send_heartbeat(settings: dict[str, Any]) -> bool:
+def should_send_heartbeat(settings: Settings) -> bool:
     """Return True if all conditions are met to send a proactive message."""
-    hb_settings = settings.get("heartbeat", {})
+    hb_settings = settings.heartbeat
     state = get_heartbeat_state()
     now = datetime.now(UTC)
 
@@ -91,19 +66,17 @@ def should_send_heartbeat(settings: dict[str, Any]) -> bool:
         return False
 
     # Check quiet hours
-    quiet_start = hb_settings.get("quiet_start", "23:00")
-    quiet_end = hb_settings.get("quiet_end", "08:00")
-    if _is_quiet_hours(quiet_start, quiet_end):
+    if _is_quiet_hours(hb_settings.quiet_start, hb_settings.quiet_end):
         return False
 
     # Check if user messaged recently
-    skip_minutes = hb_settings.get("skip_if_user_active_minutes", 60)
+    skip_minutes = hb_settings.skip_if_user_active_minutes
     last_user = _parse_dt(state.get("last_user_message"))
     if last_user and (now - last_user).total_seconds() < skip_minutes * 60:
         return False
 
     # Check minimum interval since last proactive message
-    min_hours = hb_settings.get("min_interval_hours", 4)
+    min_hours = hb_settings.min_interval_hours
     last_sent = _parse_dt(state.get("last_proactive_sent"))
     if last_sent and (now - last_sent).total_seconds() < min_hours * 3600:
         return False
@@ -111,7 +84,7 @@ def should_send_heartbeat(settings: dict[str, Any]) -> bool:
     return True
 
 
-def should_send_reengagement(settings: dict[str, Any]) -> bool:
+def should_send_reengagement(settings: Settings) -> bool:
     """Return True if conditions are met to send a post-session re-engagement nudge.
 
     Fires when: bot had last word in last session, user hasn't replied,
@@ -133,16 +106,12 @@ def should_send_reengagement(settings: dict[str, Any]) -> bool:
         return False
 
     # Check quiet hours
-    hb_settings = settings.get("heartbeat", {})
-    quiet_start = hb_settings.get("quiet_start", "23:00")
-    quiet_end = hb_settings.get("quiet_end", "08:00")
-    if _is_quiet_hours(quiet_start, quiet_end):
+    if _is_quiet_hours(settings.heartbeat.quiet_start, settings.heartbeat.quiet_end):
         return False
 
     # Session must have ended within the configured window
-    v2_cfg = settings.get("heartbeat_v2", {})
-    min_hours = float(v2_cfg.get("reengagement_min_hours", 2))
-    max_hours = float(v2_cfg.get("reengagement_max_hours", 6))
+    min_hours = settings.heartbeat_v2.reengagement_min_hours
+    max_hours = settings.heartbeat_v2.reengagement_max_hours
 
     session_ended = _parse_dt(state.get("last_session_ended_at"))
     if not session_ended:
@@ -187,7 +156,9 @@ At stage 3 she might say more: "you went quiet. that's disruptive."
 Output ONLY the message text, nothing else."""
 
     messages = [{"role": "user", "content": prompt}]
-    return await chat_completion(messages, task="chat", temperature=0.9)
+    return await chat_completion(
+        messages, task="heartbeat", temperature=0.9, priority=Priority.PROACTIVE
+    )
 
 
 async def generate_contextual_heartbeat(
@@ -198,7 +169,10 @@ async def generate_contextual_heartbeat(
 ) -> str:
     """Generate a memory-grounded proactive message (Stage 2+, M2)."""
     loops_text = "\n".join(f"- {loop}" for loop in open_loops) if open_loops else "none"
-    episode_excerpt = recent_episode[:500] if recent_episode else "no recent session"
+    excerpt_tokens = budget_for(get_model("chat")).allowance("heartbeat_episode", 125)
+    episode_excerpt = (
+        trim_to_tokens(recent_episode, excerpt_tokens) if recent_episode else "no recent session"
+    )
 
     # Check for stale open loops to prioritize (2.7)
     stale_loop = None
@@ -228,7 +202,9 @@ She doesn't explain why she's messaging. She acts like she has a reason that isn
 Do NOT end with a question asking for tasks."""
 
     messages = [{"role": "user", "content": prompt}]
-    return await chat_completion(messages, task="chat", temperature=0.9)
+    return await chat_completion(
+        messages, task="heartbeat", temperature=0.9, priority=Priority.PROACTIVE
+    )
 
 
 async def generate_proactive_message(excuse: str, stage: int, mood: str) -> str:
@@ -244,7 +220,9 @@ The excuse should be transparent but she won't admit the real reason she's reach
 At stage 0-1: stay sharp and minimal. At stage 2-3: slightly warmer but still tsundere."""
 
     messages = [{"role": "user", "content": prompt}]
-    return await chat_completion(messages, task="chat", temperature=0.9)
+    return await chat_completion(
+        messages, task="heartbeat", temperature=0.9, priority=Priority.PROACTIVE
+    )
 
 
 async def run_heartbeat(send_fn: Any, photo_fn: Any | None = None) -> bool:
@@ -255,12 +233,12 @@ async def run_heartbeat(send_fn: Any, photo_fn: Any | None = None) -> bool:
     photo_fn: optional async callable() that sends a proactive photo; returns bool.
     Returns True if a message was sent.
     """
-    settings = _load_settings()
-    stage = get_trust_stage()
+    settings = get_settings()
+    stage = await run_io(get_trust_stage)
     mood = get_daily_mood()
 
     # S1: Re-engagement nudge check (takes priority)
-    if should_send_reengagement(settings):
+    if await run_io(should_send_reengagement, settings):
         try:
             message = await generate_reengagement_message(stage, mood)
             await send_fn(message)
@@ -271,17 +249,16 @@ async def run_heartbeat(send_fn: Any, photo_fn: Any | None = None) -> bool:
             logger.error("Re-engagement send failed: %s", e)
 
     # Regular heartbeat
-    if not should_send_heartbeat(settings):
+    if not await run_io(should_send_heartbeat, settings):
         return False
 
-    v2_cfg = settings.get("heartbeat_v2", {})
-    ctx_threshold = int(v2_cfg.get("context_aware_stage_threshold", 2))
+    ctx_threshold = settings.heartbeat_v2.context_aware_stage_threshold
 
     # M2+2.7: Context-aware heartbeat at Stage ctx_threshold+
     if stage >= ctx_threshold:
         try:
-            open_loops = get_open_loops()
-            recent_episode = read_recent_episodes(n=1)
+            open_loops = await run_io(get_open_loops)
+            recent_episode = await run_io(read_recent_episodes, n=1)
             if open_loops or recent_episode:
                 message = await generate_contextual_heartbeat(
                     open_loops, recent_episode, stage, mood
@@ -301,8 +278,7 @@ async def run_heartbeat(send_fn: Any, photo_fn: Any | None = None) -> bool:
             logger.error("Context-aware heartbeat failed, falling back: %s", e)
 
     # Fallback: template rotation
-    templates_text = read_heartbeat_templates()
-    templates = _extract_templates(templates_text)
+    templates = heartbeat_templates()
 
     if not templates:
         logger.warning("No heartbeat templates found")
@@ -323,10 +299,8 @@ async def run_heartbeat(send_fn: Any, photo_fn: Any | None = None) -> bool:
         return False
 
 
-def get_next_heartbeat_delay(settings: dict[str, Any]) -> int:
+def get_next_heartbeat_delay(settings: Settings) -> int:
     """Return seconds until next heartbeat attempt."""
-    hb = settings.get("heartbeat", {})
-    min_h = hb.get("min_interval_hours", 4)
-    max_h = hb.get("max_interval_hours", 8)
-    hours = random.uniform(min_h, max_h)
+    hb = settings.heartbeat
+    hours = random.uniform(hb.min_interval_hours, hb.max_interval_hours)
     return int(hours * 3600)
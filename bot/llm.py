@@ -2,70 +2,742 @@
 
 from __future__ import annotations
 
+import asyncio
+import email.utils
+import importlib.util
+import itertools
+import json
+import logging
 import os
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager
+from enum import IntEnum
 from typing import Any
 
 import httpx
 import yaml
 from dotenv import load_dotenv
 
+from . import metrics
+from .memory import get_current_user
+from .settings import SETTINGS_PATH, get_settings, reload_settings
+
 load_dotenv()
 
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-_settings_cache: dict[str, Any] | None = None
+logger = logging.getLogger(__name__)
 
 
-def _load_settings() -> dict[str, Any]:
-    global _settings_cache
-    if _settings_cache is None:
-        settings_path = os.path.join(os.path.dirname(__file__), "..", "settings.yaml")
-        with open(settings_path) as f:
-            _settings_cache = yaml.safe_load(f)
-    return _settings_cache
+def get_model(task: str = "chat") -> str:
+    """Return the model ID for a given task from settings.yaml."""
+    return get_settings().model_for(task)
 
 
-def reload_settings() -> None:
-    """Force reload of settings.yaml (used after /model command)."""
-    global _settings_cache
-    _settings_cache = None
+# ---------------------------------------------------------------------------
+# Shared HTTP client
+# ---------------------------------------------------------------------------
 
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
 
-def get_model(task: str = "chat") -> str:
-    """Return the model ID for a given task from settings.yaml."""
-    settings = _load_settings()
-    models = settings.get("models", {})
-    return models.get(task, models.get("chat", "openai/gpt-4o-mini"))
 
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
 
-async def chat_completion(
-    messages: list[dict[str, str]],
-    task: str = "chat",
-    temperature: float = 0.85,
-) -> str:
-    """Send messages to OpenRouter and return the response text."""
+
+def get_client() -> httpx.AsyncClient:
+    """The process-wide OpenRouter client, created on first use.
+
+    One pooled client keeps TCP+TLS connections (and, with h2 installed, one
+    multiplexed HTTP/2 connection) alive between calls instead of paying a fresh
+    handshake per message. A client is tied to the loop it was created on, so a
+    new one is made if the running loop has changed (tests run one loop per test).
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is not None and not _client.is_closed and _client_loop is loop:
+        return _client
+    cfg = get_settings().http
+    http2 = cfg.http2 and _http2_available()
+    if cfg.http2 and not http2:
+        logger.info("h2 not installed; OpenRouter client falls back to HTTP/1.1 keep-alive")
+    _client = httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=cfg.max_connections,
+            max_keepalive_connections=cfg.max_keepalive_connections,
+            keepalive_expiry=cfg.keepalive_expiry,
+        ),
+        timeout=timeout_for("default"),
+        headers={
+            "HTTP-Referer": "https://github.com/hikari-tsukino-bot",
+            "X-Title": "Hikari Tsukino Bot",
+        },
+    )
+    _client_loop = loop
+    return _client
+
+
+async def aclose_client() -> None:
+    """Close the shared client (at shutdown)."""
+    global _client, _client_loop
+    client, _client, _client_loop = _client, None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def timeout_for(task: str) -> httpx.Timeout:
+    """Timeout profile for a task: its read timeout from settings, a short connect timeout."""
+    cfg = get_settings().http
+    return httpx.Timeout(cfg.timeout_for(task), connect=cfg.connect_timeout)
+
+
+def api_url(path: str) -> str:
+    """URL of an OpenRouter API endpoint, e.g. api_url("/chat/completions")."""
+    base = os.environ.get("OPENROUTER_BASE_URL") or get_settings().http.base_url
+    return base.rstrip("/") + path
+
+
+def auth_headers(api_key: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+
+# ---------------------------------------------------------------------------
+# Request scheduling
+# ---------------------------------------------------------------------------
+
+
+class Priority(IntEnum):
+    """Whose call it is; lower values are served first."""
+
+    INTERACTIVE = 0  # a user is waiting on the reply
+    PROACTIVE = 1  # heartbeat messages
+    BACKGROUND = 2  # consolidation, session summaries, reflection
+
+
+# Default priority per task when the caller doesn't say
+_TASK_PRIORITY = {
+    "chat": Priority.INTERACTIVE,
+    "vision": Priority.INTERACTIVE,
+    "heartbeat": Priority.PROACTIVE,
+}
+
+
+def _priority_for(task: str, priority: Priority | None) -> Priority:
+    if priority is not None:
+        return priority
+    return _TASK_PRIORITY.get(task, Priority.BACKGROUND)
+
+
+class RequestScheduler:
+    """Hands out OpenRouter call slots in priority order under concurrency and rate limits.
+
+    Limits: in-flight calls overall, per model and for background work, plus a
+    token bucket on call starts. Background calls also hold off until no
+    interactive call has started for background_idle_seconds (or they've waited
+    background_max_wait_seconds). Limits are read from settings.scheduler on every
+    decision, so edits apply without a restart.
+    """
+
+    def __init__(self) -> None:
+        # (priority, seq, queued_at, model, granted) — sorted, so ties go first-come first-served
+        self._waiting: list[tuple[Priority, int, float, str, asyncio.Future[None]]] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._running_background = 0
+        self._per_model: dict[str, int] = {}
+        self._tokens: float | None = None
+        self._refilled = 0.0
+        self._last_interactive = float("-inf")
+        self._wakeup: asyncio.TimerHandle | None = None
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, model: str):
+        """Hold one call slot for the body of the block."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if priority == Priority.INTERACTIVE:
+            self._last_interactive = now
+        granted: asyncio.Future[None] = loop.create_future()
+        self._waiting.append((priority, next(self._seq), now, model, granted))
+        self._dispatch()
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                self._release(priority, model)  # granted just as we were cancelled
+            raise
+        try:
+            yield
+        finally:
+            self._release(priority, model)
+
+    def stats(self) -> dict[str, int]:
+        waiting = [w for w in self._waiting if not w[4].done()]
+        return {
+            "running": self._running,
+            "waiting": len(waiting),
+            **{
+                f"waiting_{p.name.lower()}": sum(1 for w in waiting if w[0] == p)
+                for p in Priority
+            },
+        }
+
+    def _release(self, priority: Priority, model: str) -> None:
+        self._running -= 1
+        if priority == Priority.BACKGROUND:
+            self._running_background -= 1
+        self._per_model[model] -= 1
+        if not self._per_model[model]:
+            del self._per_model[model]
+        self._dispatch()
+
+    def _refill(self, now: float, rate: float, burst: int) -> None:
+        if self._tokens is None:
+            self._tokens = float(burst)
+        else:
+            self._tokens = min(float(burst), self._tokens + (now - self._refilled) * rate)
+        self._refilled = now
+
+    def _dispatch(self) -> None:
+        cfg = get_settings().scheduler
+        now = asyncio.get_running_loop().time()
+        rate_limited = cfg.requests_per_second > 0
+        if rate_limited:
+            self._refill(now, cfg.requests_per_second, max(1, cfg.burst))
+        self._waiting = sorted(w for w in self._waiting if not w[4].done())
+        wake_at: float | None = None
+        for entry in list(self._waiting):
+            priority, _, queued_at, model, granted = entry
+            if self._running >= cfg.max_concurrent:
+                break
+            if self._per_model.get(model, 0) >= cfg.per_model_concurrent:
+                continue
+            if priority == Priority.BACKGROUND:
+                if self._running_background >= cfg.background_concurrent:
+                    break  # everything after this is background too
+                ready_at = min(
+                    self._last_interactive + cfg.background_idle_seconds,
+                    queued_at + cfg.background_max_wait_seconds,
+                )
+                if now < ready_at:
+                    wake_at = ready_at if wake_at is None else min(wake_at, ready_at)
+                    continue
+            if rate_limited and self._tokens < 1:
+                refill_at = now + (1 - self._tokens) / cfg.requests_per_second
+                wake_at = refill_at if wake_at is None else min(wake_at, refill_at)
+                break
+            if rate_limited:
+                self._tokens -= 1
+            self._running += 1
+            if priority == Priority.BACKGROUND:
+                self._running_background += 1
+            self._per_model[model] = self._per_model.get(model, 0) + 1
+            self._waiting.remove(entry)
+            granted.set_result(None)
+        if wake_at is not None:
+            self._wake_at(wake_at)
+
+    def _wake_at(self, when: float) -> None:
+        if self._wakeup is not None and self._wakeup.when() <= when:
+            return
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._wakeup = asyncio.get_running_loop().call_at(when, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+
+_scheduler: RequestScheduler | None = None
+_scheduler_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_scheduler() -> RequestScheduler:
+    """The process-wide request scheduler (one per event loop, like the client)."""
+    global _scheduler, _scheduler_loop
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        _scheduler = RequestScheduler()
+        _scheduler_loop = loop
+    return _scheduler
+
+
+# ---------------------------------------------------------------------------
+# Prompt caching
+# ---------------------------------------------------------------------------
+
+
+def system_message(stable: str, volatile: str) -> dict[str, Any]:
+    """Build a system message from a cacheable prefix and a per-turn suffix."""
+    content: list[dict[str, Any]] = [
+        {"type": "text", "text": stable, "cache_control": {"type": "ephemeral"}}
+    ]
+    if volatile:
+        content.append({"type": "text", "text": volatile})
+    return {"role": "system", "content": content}
+
+
+def supports_cache_control(model: str) -> bool:
+    """True for models that take explicit cache_control breakpoints through OpenRouter.
+
+    Others (OpenAI, DeepSeek, ...) cache identical prefixes automatically.
+    """
+    prefixes = get_settings().prompt_cache.cache_control_models
+    return any(model.startswith(prefix) for prefix in prefixes)
+
+
+def prepare_messages(messages: list[dict[str, Any]], model: str) -> list[dict[str, Any]]:
+    """Keep cache_control hints for models that support them; otherwise send plain strings.
+
+    Text-only content lists are flattened to the same string build_system_prompt()
+    would produce, so models without explicit caching still see a stable prefix.
+    """
+    if supports_cache_control(model):
+        return messages
+    prepared = []
+    for msg in messages:
+        content = msg.get("content")
+        if isinstance(content, list) and all(part.get("type") == "text" for part in content):
+            msg = {**msg, "content": "\n".join(part["text"] for part in content)}
+        prepared.append(msg)
+    return prepared
+
+
+def _api_key() -> str:
     api_key = os.environ.get("OPENROUTER_API_KEY")
     if not api_key:
         raise ValueError("OPENROUTER_API_KEY not set in environment")
+    return api_key
+
+
+# ---------------------------------------------------------------------------
+# Retries and fallbacks
+# ---------------------------------------------------------------------------
+
+
+class ProviderError(RuntimeError):
+    """OpenRouter answered, but without a usable completion (error body, no choices)."""
+
+
+# How a failed attempt is handled
+_RETRY = "retry"  # transient: back off and try the same model again
+_NEXT_MODEL = "next"  # this model can't serve the request: move down the chain
+_FATAL = "fatal"  # no model will do better (bad key, no credits): give up now
+
+_RETRY_STATUSES = {408, 425, 429}
+_FATAL_STATUSES = {401, 402, 403}
+
+
+def _classify(exc: BaseException) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        if status in _FATAL_STATUSES:
+            return _FATAL
+        if status in _RETRY_STATUSES or status >= 500:
+            return _RETRY
+        return _NEXT_MODEL  # 400/404/413/422...: model-specific (unknown id, context too long)
+    if isinstance(exc, (httpx.TransportError, ProviderError, json.JSONDecodeError, TimeoutError)):
+        return _RETRY
+    return _FATAL
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    """Seconds the server asked us to wait (Retry-After: seconds or an HTTP date)."""
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
 
-    model = get_model(task)
-    payload = {
+def _backoff(attempt: int, retry_after: float | None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    cfg = get_settings().retry
+    ceiling = min(cfg.backoff_max_seconds, cfg.backoff_base_seconds * 2**attempt)
+    delay = random.uniform(0, ceiling)
+    return max(delay, retry_after or 0.0)
+
+
+async def _with_fallbacks(task: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+    """Run call(model) down the task's model chain until one attempt succeeds.
+
+    Retryable failures back off and retry the same model (attempts_per_model
+    times), then fall through to the next model. Everything shares one deadline
+    per task; when it runs out the last error is raised.
+    """
+    settings = get_settings()
+    cfg = settings.retry
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + cfg.deadline_for(task)
+    attempts = max(1, cfg.attempts_per_model)
+    last_exc: BaseException | None = None
+
+    for model in settings.models_for(task):
+        for attempt in range(attempts):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                async with asyncio.timeout(remaining):
+                    return await call(model)
+            except Exception as exc:
+                last_exc = exc
+                if loop.time() >= deadline:
+                    break
+                kind = _classify(exc)
+                if kind == _FATAL:
+                    raise
+                logger.warning(
+                    "%s call to %s failed (attempt %d, %s): %s", task, model, attempt + 1, kind, exc
+                )
+                if kind == _NEXT_MODEL or attempt + 1 == attempts:
+                    break
+                delay = _backoff(attempt, _retry_after(exc))
+                if loop.time() + delay >= deadline:
+                    break  # can't wait that long; try the next model right away
+                await asyncio.sleep(delay)
+        if loop.time() >= deadline:
+            break
+
+    if last_exc is None:
+        raise TimeoutError(f"{task}: deadline reached before any model was tried")
+    raise last_exc
+
+
+# ---------------------------------------------------------------------------
+# Hedging
+# ---------------------------------------------------------------------------
+
+# Recent primary-call latencies per task (seconds); a hedged primary that lost counts
+# with its time at cancellation, so slow routes still pull the percentile up
+_latencies: dict[str, deque[float]] = {}
+_hedge_counts: dict[str, dict[str, int]] = {}
+
+
+def _record_latency(task: str, seconds: float) -> None:
+    window = get_settings().hedge.window
+    samples = _latencies.get(task)
+    if samples is None or samples.maxlen != window:
+        samples = _latencies[task] = deque(samples or (), maxlen=window)
+    samples.append(seconds)
+
+
+def hedge_delay(task: str) -> float:
+    """How long a primary call may run before it is hedged."""
+    cfg = get_settings().hedge
+    samples = _latencies.get(task)
+    if not samples or len(samples) < cfg.min_samples:
+        return cfg.delay_seconds
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * cfg.percentile / 100))
+    return max(cfg.min_delay_seconds, ordered[index])
+
+
+def hedge_stats() -> dict[str, dict[str, float]]:
+    """Per task: calls, how many were hedged and how many the backup won, and the current delay."""
+    stats = {}
+    for task, counts in _hedge_counts.items():
+        calls, hedged = counts["calls"], counts["hedged"]
+        stats[task] = {
+            **counts,
+            "hedge_rate": hedged / calls if calls else 0.0,
+            "win_rate": counts["backup_wins"] / hedged if hedged else 0.0,
+            "delay": hedge_delay(task),
+        }
+    return stats
+
+
+def _gauges() -> Iterator[tuple[str, dict[str, str], float]]:
+    """Scheduler and hedging state for the Prometheus file."""
+    if _scheduler is not None:
+        for key, value in _scheduler.stats().items():
+            yield f"llm_scheduler_{key}", {}, value
+    for task, stats in hedge_stats().items():
+        yield "llm_hedge_rate", {"task": task}, stats["hedge_rate"]
+        yield "llm_hedge_win_rate", {"task": task}, stats["win_rate"]
+        yield "llm_hedge_delay_seconds", {"task": task}, stats["delay"]
+
+
+metrics.add_collector(_gauges)
+
+
+async def _hedged(
+    task: str,
+    primary: Callable[[], Awaitable[Any]],
+    backup: Callable[[], Awaitable[Any]],
+    discard: Callable[[Any], Awaitable[None]] | None = None,
+) -> Any:
+    """Run primary(); if it's still running after hedge_delay(task), race backup() against it.
+
+    The first success wins and the other call is cancelled (or, if it finished
+    too, its result handed to discard). If both fail, the primary's error is
+    raised so the retry loop classifies it.
+    """
+    loop = asyncio.get_running_loop()
+    counts = _hedge_counts.setdefault(task, {"calls": 0, "hedged": 0, "backup_wins": 0})
+    counts["calls"] += 1
+    start = loop.time()
+    first = asyncio.create_task(primary())
+    try:
+        await asyncio.wait_for(asyncio.shield(first), hedge_delay(task))
+    except TimeoutError:
+        pass
+    except BaseException:
+        first.cancel()
+        raise
+    if first.done():
+        if first.exception() is None:
+            _record_latency(task, loop.time() - start)
+        return first.result()
+
+    counts["hedged"] += 1
+    second = asyncio.create_task(backup())
+    racers = {first, second}
+    winner: asyncio.Task | None = None
+    try:
+        pending = set(racers)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t for t in done if not t.cancelled() and t.exception() is None), None)
+    finally:
+        for task_ in racers - {winner}:
+            task_.cancel()
+        losers = [t for t in racers if t is not winner]
+        await asyncio.gather(*losers, return_exceptions=True)
+        if discard is not None:
+            for task_ in losers:
+                if not task_.cancelled() and task_.exception() is None:
+                    await discard(task_.result())
+    if first is winner or first.cancelled():
+        _record_latency(task, loop.time() - start)
+    if winner is None:
+        raise first.exception() or second.exception()
+    if winner is second:
+        counts["backup_wins"] += 1
+        logger.info("Hedged %s call: backup won after %.1fs", task, loop.time() - start)
+    return winner.result()
+
+
+def _maybe_hedged(
+    task: str,
+    call: Callable[[str], Awaitable[Any]],
+    discard: Callable[[Any], Awaitable[None]] | None = None,
+) -> Callable[[str], Awaitable[Any]]:
+    """Wrap call(model) in a hedge when hedging is on for this task.
+
+    The backup goes to the next model in the chain, or to the same model again
+    (OpenRouter may route it to another provider) at the end of it.
+    """
+    settings = get_settings()
+    if not (settings.hedge.enabled and task in settings.hedge.tasks):
+        return call
+    chain = settings.models_for(task)
+
+    async def hedged(model: str) -> Any:
+        index = chain.index(model) if model in chain else len(chain)
+        backup = chain[index + 1] if index + 1 < len(chain) else model
+        return await _hedged(task, lambda: call(model), lambda: call(backup), discard)
+
+    return hedged
+
+
+# ---------------------------------------------------------------------------
+# Completions
+# ---------------------------------------------------------------------------
+
+
+def _chat_payload(messages: list[dict[str, Any]], model: str, temperature: float) -> dict[str, Any]:
+    return {
         "model": model,
-        "messages": messages,
+        "messages": prepare_messages(messages, model),
         "temperature": temperature,
+        "usage": {"include": True},  # token counts and cost in the response
     }
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://github.com/hikari-tsukino-bot",
-        "X-Title": "Hikari Tsukino Bot",
-    }
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(OPENROUTER_API_URL, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
 
-    return data["choices"][0]["message"]["content"].strip()
+def _outcome(exc: BaseException) -> str:
+    """Metrics label for a failed call."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return str(exc.response.status_code)
+    if isinstance(exc, TimeoutError | httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, asyncio.CancelledError | GeneratorExit):
+        return "cancelled"  # hedge loser, deadline or the reader went away
+    return type(exc).__name__
+
+
+def _record_call(
+    task: str,
+    model: str,
+    started: float,
+    outcome: str = "ok",
+    usage: dict[str, Any] | None = None,
+    first_token: float | None = None,
+) -> None:
+    usage = usage or {}
+    metrics.record_llm_call(
+        task,
+        model,
+        get_current_user(),
+        time.monotonic() - started,
+        outcome,
+        prompt_tokens=int(usage.get("prompt_tokens") or 0),
+        completion_tokens=int(usage.get("completion_tokens") or 0),
+        cost=float(usage.get("cost") or 0.0),
+        first_token_seconds=first_token,
+    )
+
+
+async def _post_completion(payload: dict[str, Any], task: str, priority: Priority) -> str:
+    model = payload["model"]
+    async with get_scheduler().slot(priority, model):
+        started = time.monotonic()
+        try:
+            response = await get_client().post(
+                api_url("/chat/completions"),
+                json=payload,
+                headers=auth_headers(_api_key()),
+                timeout=timeout_for(task),
+            )
+            response.raise_for_status()
+            data = response.json()
+        except BaseException as exc:
+            _record_call(task, model, started, _outcome(exc))
+            raise
+    try:
+        content = data["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError, AttributeError):
+        _record_call(task, model, started, "empty")
+        raise ProviderError(f"no completion in response: {data.get('error', data)}") from None
+    _record_call(task, model, started, usage=data.get("usage"))
+    return content
+
+
+async def chat_completion(
+    messages: list[dict[str, Any]],
+    task: str = "chat",
+    temperature: float = 0.85,
+    priority: Priority | None = None,
+) -> str:
+    """Send messages to OpenRouter and return the response text.
+
+    Transient failures are retried and fall back along the task's model chain.
+    priority defaults to interactive for chat/vision and background otherwise.
+    """
+    _api_key()
+    priority = _priority_for(task, priority)
+
+    async def call(model: str) -> str:
+        payload = _chat_payload(messages, model, temperature)
+        return await _post_completion(payload, task, priority)
+
+    return await _with_fallbacks(task, _maybe_hedged(task, call))
+
+
+async def chat_completion_stream(
+    messages: list[dict[str, Any]],
+    task: str = "chat",
+    temperature: float = 0.85,
+    priority: Priority | None = None,
+) -> AsyncIterator[str]:
+    """Stream a completion from OpenRouter, yielding text deltas as they arrive (SSE).
+
+    Retries and fallbacks apply until the first delta arrives; after that the
+    user has seen text, so a broken stream raises instead of starting over.
+    """
+    _api_key()
+    priority = _priority_for(task, priority)
+
+    async def first_delta(model: str) -> tuple[AsyncIterator[str], str]:
+        payload = {**_chat_payload(messages, model, temperature), "stream": True}
+        deltas = _stream_deltas(payload, task, priority)
+        try:
+            return deltas, await anext(deltas)
+        except StopAsyncIteration:
+            raise ProviderError("stream ended without any text") from None
+        except BaseException:
+            await deltas.aclose()
+            raise
+
+    async def discard(opened: tuple[AsyncIterator[str], str]) -> None:
+        await opened[0].aclose()
+
+    deltas, first = await _with_fallbacks(task, _maybe_hedged(task, first_delta, discard))
+    try:
+        yield first
+        async for delta in deltas:
+            yield delta
+    finally:
+        await deltas.aclose()
+
+
+async def _stream_deltas(
+    payload: dict[str, Any], task: str, priority: Priority
+) -> AsyncIterator[str]:
+    model = payload["model"]
+    # The slot is held until the stream is fully read
+    async with get_scheduler().slot(priority, model):
+        started = time.monotonic()
+        usage: dict[str, Any] = {}
+        first_token: float | None = None
+        outcome = "ok"
+        try:
+            async with get_client().stream(
+                "POST",
+                api_url("/chat/completions"),
+                json=payload,
+                headers=auth_headers(_api_key()),
+                timeout=timeout_for(task),
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                async for delta in _sse_deltas(response.aiter_lines(), usage):
+                    if first_token is None:
+                        first_token = time.monotonic() - started
+                    yield delta
+        except BaseException as exc:
+            outcome = _outcome(exc)
+            raise
+        finally:
+            _record_call(task, model, started, outcome, usage, first_token)
+
+
+async def _sse_deltas(
+    lines: AsyncIterator[str], usage: dict[str, Any] | None = None
+) -> AsyncIterator[str]:
+    """Text deltas from an OpenAI-style SSE stream. Comment lines are keep-alives.
+
+    The usage chunk OpenRouter sends last, if any, is copied into usage.
+    """
+    async for line in lines:
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        chunk = json.loads(data)
+        if "error" in chunk:
+            raise ProviderError(f"OpenRouter stream error: {chunk['error']}")
+        if usage is not None and chunk.get("usage"):
+            usage.update(chunk["usage"])
+        for choice in chunk.get("choices", []):
+            delta = (choice.get("delta") or {}).get("content")
+            if delta:
+                yield delta
 
 
 async def chat_completion_vision(
@@ -73,51 +745,48 @@ async def chat_completion_vision(
     image_url: str,
     task: str = "vision",
     temperature: float = 0.85,
+    priority: Priority | None = None,
 ) -> str:
     """Send a vision request (text + image URL) to OpenRouter."""
-    api_key = os.environ.get("OPENROUTER_API_KEY")
-    if not api_key:
-        raise ValueError("OPENROUTER_API_KEY not set in environment")
-
-    model = get_model(task)
-    payload = {
-        "model": model,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": text_prompt},
-                    {"type": "image_url", "image_url": {"url": image_url}},
-                ],
-            }
-        ],
-        "temperature": temperature,
-    }
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://github.com/hikari-tsukino-bot",
-        "X-Title": "Hikari Tsukino Bot",
-    }
+    _api_key()
+    priority = _priority_for(task, priority)
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": text_prompt},
+                {"type": "image_url", "image_url": {"url": image_url}},
+            ],
+        }
+    ]
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(OPENROUTER_API_URL, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
+    async def call(model: str) -> str:
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "usage": {"include": True},
+        }
+        return await _post_completion(payload, task, priority)
 
-    return data["choices"][0]["message"]["content"].strip()
+    return await _with_fallbacks(task, call)
 
 
 def update_model_in_settings(task: str, model_id: str) -> None:
     """Update a model ID in settings.yaml and reload the cache."""
-    settings_path = os.path.join(os.path.dirname(__file__), "..", "settings.yaml")
-    with open(settings_path) as f:
+    with open(SETTINGS_PATH) as f:
         content = f.read()
         settings = yaml.safe_load(content)
 
-    settings.setdefault("models", {})[task] = model_id
+    models = settings.setdefault("models", {})
+    current = models.get(task)
+    if isinstance(current, list):
+        # Keep the fallback chain; the new model goes first
+        models[task] = [model_id] + [m for m in current if m != model_id]
+    else:
+        models[task] = model_id
 
-    with open(settings_path, "w") as f:
+    with open(SETTINGS_PATH, "w") as f:
         yaml.dump(settings, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
 
     reload_settings()
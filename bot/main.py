@@ -2,19 +2,23 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os  # kept for TELEGRAM_BOT_TOKEN
+import signal
+import time
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 
-import yaml
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from dotenv import load_dotenv
 from telegram import BotCommand
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
 
+from .character import get_assets, request_reload
+from .chat import evict_idle_sessions, session_stats
 from .handlers import (
     cmd_forget,
     cmd_help,
@@ -32,8 +36,19 @@ from .handlers import (
     session_timeout_callback,
 )
 from .heartbeat import run_heartbeat
-from .memory import get_heartbeat_state, list_all_user_ids, set_current_user
+from .llm import aclose_client, get_client
+from .memory import (
+    aget_heartbeat_state,
+    flush_heartbeat_states,
+    list_all_user_ids,
+    list_session_logs,
+    run_io,
+    set_current_user,
+    shutdown_io,
+)
+from .metrics import render_prometheus, write_metrics_file
 from .reflect import run_reflection
+from .settings import get_settings, reload_settings
 
 load_dotenv()
 
@@ -44,12 +59,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 _ROOT = Path(__file__).parent.parent
-_SETTINGS_PATH = _ROOT / "settings.yaml"
-
 
-def _load_settings() -> dict[str, Any]:
-    with open(_SETTINGS_PATH) as f:
-        return yaml.safe_load(f)
+def _reload_config() -> None:
+    request_reload()
+    reload_settings()
+    logger.info("Reloading character files and settings.")
 
 
 def build_application() -> Application:
@@ -80,18 +94,18 @@ def build_application() -> Application:
 
 
 async def _setup_scheduler(app: Application) -> AsyncIOScheduler:
-    settings = _load_settings()
+    settings = get_settings()
     scheduler = AsyncIOScheduler()
 
     # Session timeout: check every minute per user if we should consolidate
-    session_timeout = settings.get("session", {}).get("timeout_minutes", 30)
+    session_timeout = settings.session.timeout_minutes
     # Track last seen message timestamp per user to avoid double-firing
     _last_seen: dict[int, Any] = {}
 
     async def session_check() -> None:
-        for uid in list_all_user_ids():
+        for uid in await run_io(list_all_user_ids):
             set_current_user(uid)
-            state = get_heartbeat_state()
+            state = await aget_heartbeat_state()
             last_user_raw = state.get("last_user_message")
             if not last_user_raw:
                 continue
@@ -110,11 +124,42 @@ async def _setup_scheduler(app: Application) -> AsyncIOScheduler:
                     _last_seen[uid] = last_user_raw
                     await session_timeout_callback(uid)
 
+        # Park idle sessions on disk so memory tracks active users only
+        evicted = await evict_idle_sessions()
+        if evicted:
+            stats = session_stats()
+            logger.info(
+                "Evicted %d idle session(s); %d active, ~%d KB of history in memory.",
+                evicted,
+                stats["sessions"],
+                stats["approx_bytes"] // 1024,
+            )
+
     scheduler.add_job(session_check, IntervalTrigger(minutes=1), id="session_check")
 
+    # After a restart: consolidate saved sessions whose users went quiet while the bot was
+    # down. Sessions still in progress are replayed from their log on first access.
+    async def recover_sessions() -> None:
+        logs = await run_io(list_session_logs)
+        cutoff = time.time() - session_timeout * 60
+        ended = [uid for uid, mtime in logs.items() if mtime <= cutoff]
+        if logs:
+            logger.info(
+                "Found %d saved session(s); %d ended while the bot was down.",
+                len(logs),
+                len(ended),
+            )
+        for uid in ended:  # keep session_check from consolidating them a second time
+            set_current_user(uid)
+            _last_seen[uid] = (await aget_heartbeat_state()).get("last_user_message")
+        for uid in ended:
+            await session_timeout_callback(uid)
+
+    scheduler.add_job(recover_sessions, id="session_recovery")  # runs once, at start
+
     # Heartbeat: check every 15 minutes per user
     async def heartbeat_check() -> None:
-        for uid in list_all_user_ids():
+        for uid in await run_io(list_all_user_ids):
             set_current_user(uid)
 
             async def send_fn(text: str, _uid: int = uid) -> None:
@@ -124,8 +169,29 @@ async def _setup_scheduler(app: Application) -> AsyncIOScheduler:
 
     scheduler.add_job(heartbeat_check, IntervalTrigger(minutes=15), id="heartbeat_check")
 
+    # Heartbeat state lives in memory; checkpoint dirty users to disk periodically
+    flush_seconds = settings.memory.heartbeat_flush_seconds
+    scheduler.add_job(
+        flush_heartbeat_states,
+        IntervalTrigger(seconds=flush_seconds),
+        id="heartbeat_flush",
+    )
+
+    # LLM latency/token/cost counters for a Prometheus textfile collector. Rendered on the
+    # loop (collectors read scheduler state), written off it.
+    async def write_metrics() -> None:
+        file = get_settings().metrics.file
+        if file:
+            await run_io(write_metrics_file, _ROOT / file, render_prometheus())
+
+    scheduler.add_job(
+        write_metrics,
+        IntervalTrigger(seconds=settings.metrics.write_interval_seconds),
+        id="metrics_file",
+    )
+
     # Daily reflection: run at configured hour for each user
-    reflection_hour = settings.get("memory", {}).get("reflection_hour", 9)
+    reflection_hour = settings.memory.reflection_hour
 
     async def daily_reflection() -> None:
         for uid in list_all_user_ids():
@@ -163,7 +229,22 @@ def main() -> None:
         scheduler.start()
         logger.info("Scheduler started.")
 
+        # One pooled OpenRouter client for the life of the process
+        get_client()
+
+        # Character files and settings are cached in memory; load them now, re-read on SIGHUP
+        await run_io(get_assets)
+        if hasattr(signal, "SIGHUP"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload_config)
+
+    async def post_shutdown(application: Application) -> None:
+        flushed = flush_heartbeat_states()
+        logger.info("Flushed heartbeat state for %d user(s).", flushed)
+        await aclose_client()
+        shutdown_io()
+
     app.post_init = post_init
+    app.post_shutdown = post_shutdown
 
     logger.info("Starting Hikari Tsukino bot...")
     app.run_polling(drop_pending_updates=True)
@@ -0,0 +1,85 @@
+"""Single-pass section index for the bot's markdown memory files."""
+
+from __future__ import annotations
+
+
+class Sections:
+    """Ordered table of a markdown document's "## name" sections, built in one scan.
+
+    A section's body is every line after its header up to the next line starting
+    with "##" (or the end of the document) — the same span the old
+    `## name\\n(.*?)(?=\\n##|\\Z)` regexes matched. Lookup by name is a dict hit;
+    replace() splices the new body in and shifts the sections after it.
+    """
+
+    __slots__ = ("_lines", "_spans", "_order")
+
+    def __init__(self, text: str) -> None:
+        self._lines = text.split("\n")
+        # name -> [header line index, end line index (exclusive)]
+        self._spans: dict[str, list[int]] = {}
+        self._order: list[str] = []
+        current: list[int] | None = None
+        for i, line in enumerate(self._lines):
+            if line.startswith("##"):
+                if current is not None:
+                    current[1] = i
+                name = line.lstrip("#").strip()
+                current = [i, len(self._lines)]
+                if name not in self._spans:  # first occurrence wins, like re.search
+                    self._spans[name] = current
+                    self._order.append(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._spans
+
+    def names(self) -> list[str]:
+        return list(self._order)
+
+    def body(self, name: str) -> str | None:
+        """Return the section body, or None if there is no such section."""
+        span = self._spans.get(name)
+        if span is None:
+            return None
+        return "\n".join(self._lines[span[0] + 1 : span[1]])
+
+    def lines(self, name: str) -> list[str]:
+        """Return the body lines of a section ([] if missing)."""
+        span = self._spans.get(name)
+        if span is None:
+            return []
+        return self._lines[span[0] + 1 : span[1]]
+
+    def replace(self, name: str, body: str) -> bool:
+        """Replace a section body in place. Returns False if the section doesn't exist."""
+        span = self._spans.get(name)
+        if span is None:
+            return False
+        new_lines = body.split("\n")
+        start, end = span[0] + 1, span[1]
+        self._lines[start:end] = new_lines
+        shift = len(new_lines) - (end - start)
+        if shift:
+            span[1] += shift
+            for other in self._spans.values():
+                if other[0] > span[0]:
+                    other[0] += shift
+                    other[1] += shift
+        return True
+
+    def append(self, name: str, body: str) -> None:
+        """Add a new "## name" section at the end, after a blank separator line."""
+        old_end = len(self._lines)
+        if self._lines[-1].strip():
+            self._lines.append("")
+        header = len(self._lines)
+        for span in self._spans.values():
+            if span[1] == old_end:
+                span[1] = header
+        self._lines.append(f"## {name}")
+        self._lines.extend(body.split("\n"))
+        self._spans[name] = [header, len(self._lines)]
+        self._order.append(name)
+
+    def text(self) -> str:
+        return "\n".join(self._lines)
@@ -2,23 +2,62 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import contextvars
+import functools
+import json
+import os
 import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import UTC, date, datetime
 from pathlib import Path
+from types import ModuleType
 from typing import Any
 
 import yaml
 
+from . import recall
+from .character import get_assets
+from .mdsections import Sections
+from .settings import get_settings
+
 # Paths
 _ROOT = Path(__file__).parent.parent
 _BASE_DATA_DIR = _ROOT / "data"
-CHARACTER_DIR = _ROOT / "character"
 
-IDENTITY_MD = CHARACTER_DIR / "IDENTITY.md"
-SOUL_MD = CHARACTER_DIR / "SOUL.md"
-HEARTBEAT_TEMPLATE_MD = CHARACTER_DIR / "HEARTBEAT_TEMPLATE.md"
-LORE_MD = CHARACTER_DIR / "LORE.md"
+# ---------------------------------------------------------------------------
+# Storage backend
+# ---------------------------------------------------------------------------
+
+_backend: str | None = None
+
+
+def get_backend() -> str:
+    """Return the storage backend from settings.yaml: "markdown" (default) or "sqlite"."""
+    global _backend
+    if _backend is None:
+        _backend = get_settings().memory.backend
+    return _backend
+
+
+def set_backend(name: str | None) -> None:
+    """Override the storage backend. None re-reads settings.yaml on next use."""
+    global _backend
+    _backend = name
+
+
+def _db() -> ModuleType | None:
+    """Return the SQLite backend module when it is selected, else None."""
+    if get_backend() != "sqlite":
+        return None
+    from . import memory_db
+
+    return memory_db
+
 
 # ---------------------------------------------------------------------------
 # Multi-user context
@@ -118,13 +157,15 @@ def init_user_data(user_id: int) -> None:
     user_dir.mkdir(parents=True, exist_ok=True)
     (user_dir / "episodes").mkdir(exist_ok=True)
 
-    user_md = user_dir / "USER.md"
-    if not user_md.exists():
-        user_md.write_text(_DEFAULT_USER_MD, encoding="utf-8")
+    # With the SQLite backend USER.md and HEARTBEAT.md are only written by export.
+    if get_backend() != "sqlite":
+        user_md = user_dir / "USER.md"
+        if not user_md.exists():
+            user_md.write_text(_DEFAULT_USER_MD, encoding="utf-8")
 
-    heartbeat_md = user_dir / "HEARTBEAT.md"
-    if not heartbeat_md.exists():
-        heartbeat_md.write_text(_DEFAULT_HEARTBEAT_MD, encoding="utf-8")
+        heartbeat_md = user_dir / "HEARTBEAT.md"
+        if not heartbeat_md.exists():
+            heartbeat_md.write_text(_DEFAULT_HEARTBEAT_MD, encoding="utf-8")
 
     for fname in ("MEMORY.md", "THOUGHTS.md", "SELF.md"):
         p = user_dir / fname
@@ -140,6 +181,76 @@ def list_all_user_ids() -> list[int]:
     return [int(d.name) for d in users_dir.iterdir() if d.is_dir() and d.name.isdigit()]
 
 
+# ---------------------------------------------------------------------------
+# Batched writes
+# ---------------------------------------------------------------------------
+
+
+class _Batch:
+    """Files read and written inside a batch() block. None marks a file known to be absent."""
+
+    def __init__(self) -> None:
+        self.files: dict[Path, str | None] = {}
+        self.dirty: set[Path] = set()
+
+
+_current_batch: contextvars.ContextVar[_Batch | None] = contextvars.ContextVar(
+    "memory_batch", default=None
+)
+
+
+@contextlib.contextmanager
+def batch() -> Iterator[None]:
+    """Group memory mutations: each touched file is read once and written once on exit.
+
+    Writes are buffered in memory and flushed atomically (temp file + rename) when the
+    block exits cleanly; if it raises, nothing is written. Nested blocks join the
+    outer one. With the sqlite backend the block is also one database transaction.
+    Don't await inside the block — it is meant for a synchronous run of writes.
+    """
+    if _current_batch.get() is not None:
+        yield
+        return
+
+    b = _Batch()
+    token = _current_batch.set(b)
+    try:
+        db = _db()
+        with db.transaction() if db else contextlib.nullcontext():
+            yield
+    finally:
+        _current_batch.reset(token)
+
+    for path in b.dirty:
+        _atomic_write(path, b.files[path] or "")
+    for uid, cached in list(_user_md_cache.items()):
+        if cached[0] in b.dirty:
+            del _user_md_cache[uid]
+
+
+def _atomic_write(path: Path, content: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(content, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _write_file(path: Path, content: str) -> None:
+    """Write a data file atomically, or buffer it when a batch() is active."""
+    b = _current_batch.get()
+    if b is None:
+        _atomic_write(path, content)
+        return
+    b.files[path] = content
+    b.dirty.add(path)
+
+
+def _file_exists(path: Path) -> bool:
+    b = _current_batch.get()
+    if b is not None and path in b.files:
+        return b.files[path] is not None
+    return path.exists()
+
+
 # ---------------------------------------------------------------------------
 # Simple file readers
 # ---------------------------------------------------------------------------
@@ -147,18 +258,24 @@ def list_all_user_ids() -> list[int]:
 
 def read_file(path: Path) -> str:
     """Read a file and return its contents, or empty string if not found."""
+    b = _current_batch.get()
+    if b is not None and path in b.files:
+        return (b.files[path] or "").strip()
     try:
-        return path.read_text(encoding="utf-8").strip()
+        content = path.read_text(encoding="utf-8")
     except FileNotFoundError:
-        return ""
+        content = None
+    if b is not None:
+        b.files[path] = content
+    return (content or "").strip()
 
 
 def read_identity() -> str:
-    return read_file(IDENTITY_MD)
+    return get_assets().identity
 
 
 def read_soul() -> str:
-    return read_file(SOUL_MD)
+    return get_assets().soul
 
 
 def read_memory() -> str:
@@ -166,22 +283,14 @@ def read_memory() -> str:
 
 
 def read_heartbeat_templates() -> str:
-    return read_file(HEARTBEAT_TEMPLATE_MD)
+    return get_assets().heartbeat_template_text
 
 
 def read_lore(n: int = 3) -> str:
     """Return up to n randomly selected lore items from LORE.md for system prompt injection."""
     import random
 
-    content = read_file(LORE_MD)
-    if not content:
-        return ""
-    # Extract individual bullet items (lines starting with "- ")
-    items = [
-        ln.strip()[2:].strip()
-        for ln in content.splitlines()
-        if ln.strip().startswith("- ")
-    ]
+    items = get_assets().lore_items
     if not items:
         return ""
     sample = random.sample(items, min(n, len(items)))
@@ -193,9 +302,59 @@ def read_lore(n: int = 3) -> str:
 # ---------------------------------------------------------------------------
 
 
+# Parsed USER.md per user: user_id -> (path, mtime_ns, size, state, checked_at).
+# Validated against the file's stat on every read; the writers below drop the entry.
+_user_md_cache: dict[int, tuple[Path, int, int, dict[str, Any], float]] = {}
+
+# The async getters serve a cached entry without a stat (and without a thread hop)
+# if it was validated this recently; external edits show up after at most this long.
+_USER_MD_RECHECK_SECONDS = 2.0
+
+
+def _invalidate_user_md_cache() -> None:
+    _user_md_cache.pop(_current_user_id.get(), None)
+
+
+def _write_user_md(content: str) -> None:
+    """Write USER.md and drop the parsed-state cache for the current user."""
+    _write_file(_user_md(), content)
+    _invalidate_user_md_cache()
+
+
 def _parse_user_md() -> dict[str, Any]:
-    """Parse USER.md into a dict. Handles missing file gracefully."""
-    content = read_file(_user_md())
+    """Return parsed USER.md state, re-parsing only when the file changed on disk."""
+    uid = _current_user_id.get()
+    path = _user_md()
+    b = _current_batch.get()
+    if b is not None and path in b.dirty:
+        return _parse_user_md_content(read_file(path))
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        _user_md_cache.pop(uid, None)
+        return _parse_user_md_content("")
+
+    cached = _user_md_cache.get(uid)
+    if cached and cached[0] == path and cached[1] == st.st_mtime_ns and cached[2] == st.st_size:
+        _user_md_cache[uid] = (*cached[:4], time.monotonic())
+        return _copy_user_state(cached[3])
+
+    state = _parse_user_md_content(read_file(path))
+    _user_md_cache[uid] = (path, st.st_mtime_ns, st.st_size, state, time.monotonic())
+    return _copy_user_state(state)
+
+
+def _copy_user_state(state: dict[str, Any]) -> dict[str, Any]:
+    """Copy the list fields so callers can't mutate the cached state."""
+    return {
+        **state,
+        "open_loops": list(state["open_loops"]),
+        "known_facts": list(state["known_facts"]),
+    }
+
+
+def _parse_user_md_content(content: str) -> dict[str, Any]:
+    """Parse USER.md text into a dict. Handles empty content gracefully."""
     if not content:
         return {
             "name": "unknown",
@@ -214,76 +373,98 @@ def _parse_user_md() -> dict[str, Any]:
         "raw": content,
     }
 
-    # Extract relationship_stage
-    m = re.search(r"relationship_stage:\s*(\d+)", content)
-    if m:
-        state["relationship_stage"] = int(m.group(1))
-
-    # Extract meaningful_exchanges
-    m = re.search(r"meaningful_exchanges:\s*(\d+)", content)
-    if m:
-        state["meaningful_exchanges"] = int(m.group(1))
-
-    # Extract name
-    m = re.search(r"- name:\s*(.+)", content)
-    if m:
-        state["name"] = m.group(1).strip()
-
-    # Extract open_loops section
-    loops_match = re.search(r"## open_loops\n(.*?)(?=\n##|\Z)", content, re.DOTALL)
-    if loops_match:
-        loops_text = loops_match.group(1).strip()
-        if loops_text and loops_text.lower() != "none":
-            state["open_loops"] = [
-                line.lstrip("- ").strip()
-                for line in loops_text.splitlines()
-                if line.strip() and not line.strip().startswith("#")
-            ]
-
-    # Extract known_facts section
-    facts_match = re.search(r"## known_facts\n(.*?)(?=\n##|\Z)", content, re.DOTALL)
-    if facts_match:
-        facts_text = facts_match.group(1).strip()
-        if facts_text and facts_text.lower() != "none yet":
-            state["known_facts"] = [
-                line.lstrip("- ").strip()
-                for line in facts_text.splitlines()
-                if line.strip() and not line.strip().startswith("#")
-            ]
+    sections = Sections(content)
+    basics = _basics_from(sections)
+
+    for key in ("relationship_stage", "meaningful_exchanges"):
+        m = re.match(r"\d+", basics.get(key, ""))
+        if m:
+            state[key] = int(m.group(0))
+    if basics.get("name"):
+        state["name"] = basics["name"]
 
+    state["open_loops"] = _list_items(sections.body("open_loops"), empty=("none",))
+    state["known_facts"] = _list_items(sections.body("known_facts"), empty=("none yet",))
     return state
 
 
+def _list_items(body: str | None, empty: tuple[str, ...]) -> list[str]:
+    """Return the entries of a bullet-list section body; placeholder text means no items."""
+    text = (body or "").strip()
+    if not text or text.lower() in empty:
+        return []
+    return [
+        line.lstrip("- ").strip()
+        for line in text.splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def _basics_from(sections: Sections) -> dict[str, str]:
+    basics = {}
+    for line in sections.lines("basics"):
+        km = re.match(r"- ([^:]+):\s*(.*)", line.strip())
+        if km:
+            basics[km.group(1).strip()] = km.group(2).strip()
+    return basics
+
+
+def _parse_basics(content: str) -> dict[str, str]:
+    """Return the "- key: value" lines of the ## basics section."""
+    return _basics_from(Sections(content))
+
+
+def _append_list_item(
+    sections: Sections, name: str, item: str, empty: tuple[str, ...], end: str = ""
+) -> bool:
+    """Append "- item" to a bullet-list section, replacing a placeholder body."""
+    existing = (sections.body(name) or "").strip()
+    if existing.lower() in empty:
+        return sections.replace(name, f"- {item}{end}")
+    return sections.replace(name, existing + f"\n- {item}{end}")
+
+
 def get_user_state() -> dict[str, Any]:
-    return _parse_user_md()
+    db = _db()
+    return db.get_user_state() if db else _parse_user_md()
 
 
 def get_trust_stage() -> int:
-    return _parse_user_md()["relationship_stage"]
+    return get_user_state()["relationship_stage"]
 
 
 def get_meaningful_exchanges() -> int:
-    return _parse_user_md()["meaningful_exchanges"]
+    return get_user_state()["meaningful_exchanges"]
 
 
 def get_open_loops() -> list[str]:
-    return _parse_user_md()["open_loops"]
+    return get_user_state()["open_loops"]
 
 
 def update_user_field(key: str, value: Any) -> None:
     """Update a single key: value line in the ## basics section of USER.md."""
+    if db := _db():
+        db.update_user_field(key, value)
+        return
     content = read_file(_user_md())
     if not content:
         return
 
-    pattern = rf"(- {re.escape(key)}:\s*)(.+)"
-    replacement = rf"\g<1>{value}"
-    new_content = re.sub(pattern, replacement, content)
-    _user_md().write_text(new_content, encoding="utf-8")
+    sections = Sections(content)
+    prefix = f"- {key}:"
+    lines = sections.lines("basics")
+    for i, line in enumerate(lines):
+        rest = line[len(prefix) :]
+        if line.startswith(prefix) and rest.strip():
+            lines[i] = prefix + rest[: len(rest) - len(rest.lstrip())] + str(value)
+    sections.replace("basics", "\n".join(lines))
+    _write_user_md(sections.text())
 
 
 def increment_meaningful_exchanges() -> int:
     """Increment meaningful_exchanges counter and return new value."""
+    if db := _db():
+        return db.increment_meaningful_exchanges()
     state = _parse_user_md()
     new_count = state["meaningful_exchanges"] + 1
     update_user_field("meaningful_exchanges", new_count)
@@ -296,73 +477,67 @@ def set_trust_stage(stage: int) -> None:
 
 def add_open_loop(loop: str) -> None:
     """Append an open loop to USER.md."""
+    if db := _db():
+        db.add_open_loop(loop)
+        return
     content = read_file(_user_md())
     if not content:
         return
 
-    loops_match = re.search(r"(## open_loops\n)(.*?)(?=\n##|\Z)", content, re.DOTALL)
-    if not loops_match:
-        return
-
-    existing = loops_match.group(2).strip()
-    if existing.lower() == "none":
-        new_loops = f"- {loop}"
-    else:
-        new_loops = existing + f"\n- {loop}"
-
-    new_content = content[: loops_match.start(2)] + new_loops + content[loops_match.end(2) :]
-    _user_md().write_text(new_content, encoding="utf-8")
+    sections = Sections(content)
+    if _append_list_item(sections, "open_loops", loop, empty=("none",)):
+        _write_user_md(sections.text())
 
 
 def clear_open_loops() -> None:
     """Clear all open loops in USER.md."""
+    if db := _db():
+        db.clear_open_loops()
+        return
     content = read_file(_user_md())
     if not content:
         return
-    new_content = re.sub(
-        r"(## open_loops\n)(.*?)(?=\n##|\Z)",
-        r"\1none\n",
-        content,
-        flags=re.DOTALL,
-    )
-    _user_md().write_text(new_content, encoding="utf-8")
+    sections = Sections(content)
+    sections.replace("open_loops", "none\n")
+    _write_user_md(sections.text())
 
 
 def add_known_fact(fact: str) -> None:
     """Append a known fact to USER.md, prefixed with today's date for age tracking."""
+    dated_fact = f"[{date.today().isoformat()}] {fact}"
+    if db := _db():
+        db.add_known_fact(fact)
+        recall.fact_added(_data_dir(), dated_fact)
+        return
     content = read_file(_user_md())
     if not content:
         return
 
-    facts_match = re.search(r"(## known_facts\n)(.*?)(?=\n##|\Z)", content, re.DOTALL)
-    if not facts_match:
-        return
+    sections = Sections(content)
+    if _append_list_item(sections, "known_facts", dated_fact, empty=("none yet", "none")):
+        _write_user_md(sections.text())
+        recall.fact_added(_data_dir(), dated_fact)
 
-    dated_fact = f"[{date.today().isoformat()}] {fact}"
-    existing = facts_match.group(2).strip()
-    if existing.lower() in ("none yet", "none"):
-        new_facts = f"- {dated_fact}"
-    else:
-        new_facts = existing + f"\n- {dated_fact}"
 
-    new_content = (
-        content[: facts_match.start(2)] + new_facts + content[facts_match.end(2) :]
-    )
-    _user_md().write_text(new_content, encoding="utf-8")
+def relevant_facts(query: str, k: int, known_facts: list[str] | None = None) -> list[str]:
+    """Return the k known facts most relevant to query (see recall.py), best first."""
+    raw_facts = get_user_state().get("known_facts", []) if known_facts is None else known_facts
+    return recall.top_facts(_data_dir(), raw_facts, query, k)
 
 
-def get_facts_with_age() -> list[dict[str, Any]]:
+def get_facts_with_age(known_facts: list[str] | None = None) -> list[dict[str, Any]]:
     """Return known facts with age metadata for imperfect recall injection.
 
     Returns list of dicts: {text, age_days, confidence}
     confidence: "high" (<7d), "medium" (7-30d), "low" (30+d or undated)
     Backward-compatible: undated facts are treated as low confidence.
+    Pass known_facts to reuse an already-loaded user state.
     """
-    raw_facts = get_user_state().get("known_facts", [])
+    raw_facts = get_user_state().get("known_facts", []) if known_facts is None else known_facts
     today = date.today()
     result = []
 
-    date_pattern = re.compile(r"^\[(\d{4}-\d{2}-\d{2})\]\s+(.*)")
+    date_pattern = re.compile(r"^\[(\d{4}-\d{2}-\d{2})\]\s+(?:\[\d{1,2}\]\s+)?(.*)")
 
     for fact in raw_facts:
         m = date_pattern.match(fact)
@@ -392,18 +567,22 @@ def get_facts_with_age() -> list[dict[str, Any]]:
 
 def forget_topic(topic: str) -> None:
     """Remove lines containing topic from known_facts and open_loops in USER.md."""
-    content = read_file(_user_md())
-    if not content:
-        return
+    if db := _db():
+        db.forget_topic(topic)
+    else:
+        content = read_file(_user_md())
+        if not content:
+            return
 
-    lines = content.splitlines()
-    filtered = [
-        line
-        for line in lines
-        if topic.lower() not in line.lower()
-        or not line.strip().startswith("- ")
-    ]
-    _user_md().write_text("\n".join(filtered), encoding="utf-8")
+        lines = content.splitlines()
+        filtered = [
+            line
+            for line in lines
+            if topic.lower() not in line.lower()
+            or not line.strip().startswith("- ")
+        ]
+        _write_user_md("\n".join(filtered))
+    recall.topic_forgotten(_data_dir(), topic)
 
     # Also clean MEMORY.md
     mem_content = read_file(_memory_md())
@@ -414,7 +593,7 @@ def forget_topic(topic: str) -> None:
             for line in mem_lines
             if topic.lower() not in line.lower() or not line.strip().startswith("- ")
         ]
-        _memory_md().write_text("\n".join(filtered_mem), encoding="utf-8")
+        _write_file(_memory_md(), "\n".join(filtered_mem))
 
 
 def update_last_updated() -> None:
@@ -422,7 +601,7 @@ def update_last_updated() -> None:
 
 
 # ---------------------------------------------------------------------------
-# HEARTBEAT.md — runtime state as YAML front-matter
+# HEARTBEAT.md — runtime state as YAML front-matter, held in memory between checkpoints
 # ---------------------------------------------------------------------------
 
 
@@ -465,33 +644,146 @@ def _write_heartbeat_yaml(state: dict[str, Any]) -> None:
     parts = ["\n".join(header_lines), yaml_block.rstrip()]
     if section_lines:
         parts.append("\n".join(section_lines))
-    _heartbeat_md().write_text("\n".join(parts) + "\n", encoding="utf-8")
+    _write_file(_heartbeat_md(), "\n".join(parts) + "\n")
 
 
-def get_heartbeat_state() -> dict[str, Any]:
-    state = _read_heartbeat_yaml()
-    return {
-        "silence_until": state.get("silence_until"),
-        "last_proactive_sent": state.get("last_proactive_sent"),
-        "last_user_message": state.get("last_user_message"),
-        "used_excuses": state.get("used_excuses", []),
-        "proactive_count": state.get("proactive_count", 0),
+def _load_heartbeat() -> dict[str, Any]:
+    db = _db()
+    return db.read_heartbeat() if db else _read_heartbeat_yaml()
+
+
+def _save_heartbeat(state: dict[str, Any]) -> None:
+    if db := _db():
+        db.write_heartbeat(state)
+    else:
+        _write_heartbeat_yaml(state)
+
+
+class HeartbeatState:
+    """One user's HEARTBEAT.md state, held in memory and checkpointed to disk.
+
+    Updates only touch this object and mark it dirty; flush_heartbeat_states() writes
+    dirty users back (scheduled from main.py, and again on shutdown).
+    """
+
+    __slots__ = (
+        "silence_until",
+        "last_proactive_sent",
+        "last_user_message",
+        "used_excuses",
+        "proactive_count",
+        "bot_had_last_word",
+        "last_session_ended_at",
+        "reengagement_sent_at",
+        "warmth_floor_modifier",
+        "photos_sent_today",
+        "photos_sent_date",
+        "extra",
+        "dirty",
+    )
+
+    FIELDS = __slots__[:-2]
+
+    def __init__(self, raw: dict[str, Any]) -> None:
+        self.silence_until: str | None = raw.get("silence_until")
+        self.last_proactive_sent: str | None = raw.get("last_proactive_sent")
+        self.last_user_message: str | None = raw.get("last_user_message")
+        self.used_excuses: list[int] = list(raw.get("used_excuses") or [])
+        self.proactive_count: int = int(raw.get("proactive_count") or 0)
         # Re-engagement fields
-        "bot_had_last_word": bool(state.get("bot_had_last_word", False)),
-        "last_session_ended_at": state.get("last_session_ended_at"),
-        "reengagement_sent_at": state.get("reengagement_sent_at"),
+        self.bot_had_last_word: bool = bool(raw.get("bot_had_last_word", False))
+        self.last_session_ended_at: str | None = raw.get("last_session_ended_at")
+        self.reengagement_sent_at: str | None = raw.get("reengagement_sent_at")
         # Escalation floor modifier (-1, 0, +1, +2)
-        "warmth_floor_modifier": int(state.get("warmth_floor_modifier", 0)),
+        self.warmth_floor_modifier: int = int(raw.get("warmth_floor_modifier") or 0)
         # Photo daily counter
-        "photos_sent_today": int(state.get("photos_sent_today", 0)),
-        "photos_sent_date": state.get("photos_sent_date"),
+        self.photos_sent_today: int = int(raw.get("photos_sent_today") or 0)
+        self.photos_sent_date: str | None = raw.get("photos_sent_date")
+        # Keys this class doesn't know about survive the round trip
+        self.extra: dict[str, Any] = {k: v for k, v in raw.items() if k not in self.FIELDS}
+        self.dirty = False
+
+    def update(self, **kwargs: Any) -> None:
+        for key, value in kwargs.items():
+            if key in self.FIELDS:
+                setattr(self, key, value)
+            else:
+                self.extra[key] = value
+        self.dirty = True
+
+    def as_dict(self) -> dict[str, Any]:
+        state = {name: getattr(self, name) for name in self.FIELDS}
+        state["used_excuses"] = list(self.used_excuses)
+        return {**state, **self.extra}
+
+
+# (data dir, user_id) -> state. Keyed by data dir so a relocated tree is reloaded.
+_heartbeat_states: dict[tuple[Path, int], HeartbeatState] = {}
+_heartbeat_lock = threading.Lock()
+
+
+def _heartbeat() -> HeartbeatState:
+    key = (_BASE_DATA_DIR, _current_user_id.get())
+    state = _heartbeat_states.get(key)
+    if state is None:
+        state = HeartbeatState(_load_heartbeat())
+        with _heartbeat_lock:
+            state = _heartbeat_states.setdefault(key, state)
+    return state
+
+
+def flush_heartbeat_states() -> int:
+    """Write every dirty user's heartbeat state to disk. Returns the number written.
+
+    A state whose save fails is marked dirty again so the next flush retries it;
+    the other users are still written and the first error is re-raised at the end.
+    """
+    with _heartbeat_lock:
+        pending = []
+        for (base, uid), state in _heartbeat_states.items():
+            if state.dirty and base == _BASE_DATA_DIR:
+                pending.append((uid, state, state.as_dict()))
+                state.dirty = False
+
+    written = 0
+    error: Exception | None = None
+    for uid, state, snapshot in pending:
+        token = _current_user_id.set(uid)
+        try:
+            _save_heartbeat(snapshot)
+            written += 1
+        except Exception as e:
+            with _heartbeat_lock:
+                state.dirty = True
+            error = error or e
+        finally:
+            _current_user_id.reset(token)
+    if error is not None:
+        raise error
+    return written
+
+
+def get_heartbeat_state() -> dict[str, Any]:
+    state = _heartbeat()
+    return {
+        "silence_until": state.silence_until,
+        "last_proactive_sent": state.last_proactive_sent,
+        "last_user_message": state.last_user_message,
+        "used_excuses": list(state.used_excuses),
+        "proactive_count": state.proactive_count,
+        "bot_had_last_word": state.bot_had_last_word,
+        "last_session_ended_at": state.last_session_ended_at,
+        "reengagement_sent_at": state.reengagement_sent_at,
+        "warmth_floor_modifier": state.warmth_floor_modifier,
+        "photos_sent_today": state.photos_sent_today,
+        "photos_sent_date": state.photos_sent_date,
     }
 
 
 def update_heartbeat_state(**kwargs: Any) -> None:
-    state = _read_heartbeat_yaml()
-    state.update(kwargs)
-    _write_heartbeat_yaml(state)
+    state = _heartbeat()
+    with _heartbeat_lock:
+        state.update(**kwargs)
 
 
 def set_silence(until: datetime | None) -> None:
@@ -538,24 +830,104 @@ def today_episode_path() -> Path:
 
 
 def read_today_episode() -> str:
+    if db := _db():
+        return db.read_episode(date.today())
     return read_file(today_episode_path())
 
 
+# Per-user manifest of episode files: episodes/manifest.json maps "YYYY-MM-DD" to
+# {"size", "has_carry_over", "carry_over", "summary"}. write_episode() and
+# prune_old_episodes() keep it current, so recency and carry-over lookups never
+# list the directory. A missing or unreadable manifest is rebuilt from the files once.
+_MANIFEST_NAME = "manifest.json"
+_SUMMARY_DIGEST_CHARS = 200
+
+# manifest path -> (mtime_ns, size, manifest)
+_manifest_cache: dict[Path, tuple[int, int, dict[str, dict[str, Any]]]] = {}
+
+
+def _manifest_path() -> Path:
+    return _episodes_dir() / _MANIFEST_NAME
+
+
+def _manifest_entry(content: str, size: int) -> dict[str, Any]:
+    sections = Sections(content)
+    carry_over = sections.body("carry_over")
+    summary = " ".join((sections.body("summary") or "").split())
+    return {
+        "size": size,
+        "has_carry_over": carry_over is not None,
+        "carry_over": carry_over.strip() if carry_over is not None else None,
+        "summary": summary[:_SUMMARY_DIGEST_CHARS],
+    }
+
+
+def _save_manifest(manifest: dict[str, dict[str, Any]]) -> None:
+    path = _manifest_path()
+    _write_file(path, json.dumps(manifest, indent=1, sort_keys=True) + "\n")
+    _manifest_cache.pop(path, None)
+
+
+def rebuild_episode_manifest() -> dict[str, dict[str, Any]]:
+    """Rebuild the current user's episode manifest from the files on disk."""
+    manifest: dict[str, dict[str, Any]] = {}
+    for path in sorted(_episodes_dir().glob("????-??-??.md")):
+        try:
+            date.fromisoformat(path.stem)
+        except ValueError:
+            continue
+        manifest[path.stem] = _manifest_entry(read_file(path), path.stat().st_size)
+    _save_manifest(manifest)
+    return manifest
+
+
+def episode_manifest() -> dict[str, dict[str, Any]]:
+    """Return the current user's episode manifest (date string -> entry). Do not mutate."""
+    path = _manifest_path()
+    b = _current_batch.get()
+    if b is not None and path in b.dirty:
+        return json.loads(b.files[path] or "{}")
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return rebuild_episode_manifest()
+
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    try:
+        manifest = json.loads(read_file(path) or "{}")
+    except json.JSONDecodeError:
+        return rebuild_episode_manifest()
+    _manifest_cache[path] = (st.st_mtime_ns, st.st_size, manifest)
+    return manifest
+
+
 def write_episode(content: str, episode_date: date | None = None) -> Path:
+    if db := _db():
+        return db.write_episode(content, episode_date)
     target_date = episode_date or date.today()
     path = _episodes_dir() / f"{target_date.isoformat()}.md"
-    path.write_text(content, encoding="utf-8")
+    manifest = dict(episode_manifest())
+    _write_file(path, content)
+    manifest[target_date.isoformat()] = _manifest_entry(content, len(content.encode("utf-8")))
+    _save_manifest(manifest)
     return path
 
 
 def list_recent_episodes(n: int = 3) -> list[Path]:
     """Return up to n most recent episode files, newest first."""
-    episodes = sorted(_episodes_dir().glob("????-??-??.md"), reverse=True)
-    return episodes[:n]
+    if db := _db():
+        return db.list_recent_episodes(n)
+    episodes_dir = _episodes_dir()
+    recent = sorted(episode_manifest(), reverse=True)[:n]
+    return [episodes_dir / f"{day}.md" for day in recent]
 
 
 def read_recent_episodes(n: int = 3) -> str:
     """Return concatenated content of n most recent episodes."""
+    if db := _db():
+        return db.read_recent_episodes(n)
     parts = []
     for path in list_recent_episodes(n):
         content = read_file(path)
@@ -565,29 +937,31 @@ def read_recent_episodes(n: int = 3) -> str:
 
 
 def read_last_episode_carry_over() -> str:
-    """Return the carry_over line from the most recent episode file, or empty string."""
-    episodes = sorted(_episodes_dir().glob("????-??-??.md"), reverse=True)
-    for path in episodes:
-        content = read_file(path)
-        m = re.search(r"## carry_over\n(.+?)(?:\n##|\Z)", content, re.DOTALL)
-        if m:
-            return m.group(1).strip()
+    """Return the carry_over note from the most recent episode that has one, or empty string."""
+    if db := _db():
+        return db.read_last_episode_carry_over()
+    manifest = episode_manifest()
+    for day in sorted(manifest, reverse=True):
+        if manifest[day]["has_carry_over"]:
+            return manifest[day]["carry_over"] or ""
     return ""
 
 
 def prune_old_episodes(retention_days: int) -> int:
     """Delete episode files older than retention_days. Returns count deleted."""
+    if db := _db():
+        return db.prune_old_episodes(retention_days)
     cutoff = date.today().toordinal() - retention_days
-    deleted = 0
-    for path in _episodes_dir().glob("????-??-??.md"):
-        try:
-            episode_date = date.fromisoformat(path.stem)
-            if episode_date.toordinal() < cutoff:
-                path.unlink()
-                deleted += 1
-        except ValueError:
-            pass
-    return deleted
+    manifest = dict(episode_manifest())
+    expired = [day for day in manifest if date.fromisoformat(day).toordinal() < cutoff]
+    if not expired:
+        return 0
+    episodes_dir = _episodes_dir()
+    for day in expired:
+        (episodes_dir / f"{day}.md").unlink(missing_ok=True)
+        del manifest[day]
+    _save_manifest(manifest)
+    return len(expired)
 
 
 # ---------------------------------------------------------------------------
@@ -601,19 +975,11 @@ def append_to_memory(section: str, fact: str) -> None:
     if not content:
         content = "# Long-Term Memory\n\n"
 
-    section_pattern = rf"(## {re.escape(section)}\n)(.*?)(?=\n##|\Z)"
-    m = re.search(section_pattern, content, re.DOTALL)
-    if m:
-        existing = m.group(2).strip()
-        if existing.lower() in ("none yet", "none"):
-            new_body = f"- {fact}\n"
-        else:
-            new_body = existing + f"\n- {fact}\n"
-        content = content[: m.start(2)] + new_body + content[m.end(2) :]
-    else:
-        content += f"\n## {section}\n- {fact}\n"
+    sections = Sections(content)
+    if not _append_list_item(sections, section, fact, empty=("none yet", "none"), end="\n"):
+        sections.append(section, f"- {fact}\n")
 
-    _memory_md().write_text(content, encoding="utf-8")
+    _write_file(_memory_md(), sections.text())
 
 
 # ---------------------------------------------------------------------------
@@ -626,7 +992,7 @@ def append_thought(thought: str) -> None:
     content = read_file(_thoughts_md())
     today = date.today().isoformat()
     entry = f"\n## {today}\n{thought}\n"
-    _thoughts_md().write_text((content or "") + entry, encoding="utf-8")
+    _write_file(_thoughts_md(), (content or "") + entry)
 
 
 # ---------------------------------------------------------------------------
@@ -643,22 +1009,18 @@ def write_self_preoccupation(thought: str) -> None:
     """Update the ## preoccupation section in SELF.md."""
     content = read_file(_self_md())
     if not content:
-        _self_md().write_text(
+        _write_file(
+            _self_md(),
             f"# Hikari's Self-Model\n\n## preoccupation\n{thought}\n\n"
             "## staged disclosures\nnone yet.\n\n"
             "## things she told the user\nnone yet.\n\n"
             "## established joke\nnone yet.\n",
-            encoding="utf-8",
         )
         return
 
-    new_content = re.sub(
-        r"(## preoccupation\n)(.*?)(?=\n##|\Z)",
-        rf"\g<1>{thought}\n",
-        content,
-        flags=re.DOTALL,
-    )
-    _self_md().write_text(new_content, encoding="utf-8")
+    sections = Sections(content)
+    sections.replace("preoccupation", f"{thought}\n")
+    _write_file(_self_md(), sections.text())
 
 
 def get_self_preoccupation() -> str:
@@ -666,11 +1028,8 @@ def get_self_preoccupation() -> str:
     content = read_file(_self_md())
     if not content:
         return ""
-    m = re.search(r"## preoccupation\n(.+?)(?=\n##|\Z)", content, re.DOTALL)
-    if m:
-        text = m.group(1).strip()
-        return "" if text.lower() in ("none yet.", "none yet", "none") else text
-    return ""
+    text = (Sections(content).body("preoccupation") or "").strip()
+    return "" if text.lower() in ("none yet.", "none yet", "none") else text
 
 
 def get_staged_disclosure(stage: int) -> str | None:
@@ -678,10 +1037,7 @@ def get_staged_disclosure(stage: int) -> str | None:
     content = read_file(_self_md())
     if not content:
         return None
-    m = re.search(r"## staged disclosures\n(.*?)(?=\n##|\Z)", content, re.DOTALL)
-    if not m:
-        return None
-    for line in m.group(1).splitlines():
+    for line in Sections(content).lines("staged disclosures"):
         line = line.strip().lstrip("- ")
         # Format: [stage N] used: false | disclosure text
         dm = re.match(r"\[stage (\d+)\] used: (true|false) \| (.+)", line, re.IGNORECASE)
@@ -695,43 +1051,47 @@ def mark_disclosure_used(disclosure_text: str) -> None:
     content = read_file(_self_md())
     if not content:
         return
-    new_content = re.sub(
-        rf"(\[stage \d+\] used: )false( \| {re.escape(disclosure_text)})",
-        r"\1true\2",
-        content,
-        flags=re.IGNORECASE,
+    sections = Sections(content)
+    pattern = re.compile(
+        rf"(\[stage \d+\] used: )false( \| {re.escape(disclosure_text)})", re.IGNORECASE
     )
-    _self_md().write_text(new_content, encoding="utf-8")
+    lines = [pattern.sub(r"\1true\2", line) for line in sections.lines("staged disclosures")]
+    if sections.replace("staged disclosures", "\n".join(lines)):
+        _write_file(_self_md(), sections.text())
 
 
 def add_self_disclosure(text: str) -> None:
     """Add something Hikari told the user to the competitive memory list."""
+    if db := _db():
+        db.add_self_disclosure(text)
+        return
     content = read_file(_self_md())
     if not content:
         return
     dated_entry = f"[{date.today().isoformat()}] {text}"
-    m = re.search(r"(## things she told the user\n)(.*?)(?=\n##|\Z)", content, re.DOTALL)
-    if not m:
-        return
-    existing = m.group(2).strip()
-    if existing.lower() in ("none yet.", "none yet", "none"):
-        new_body = f"- {dated_entry}\n"
-    else:
-        new_body = existing + f"\n- {dated_entry}\n"
-    new_content = content[: m.start(2)] + new_body + content[m.end(2) :]
-    _self_md().write_text(new_content, encoding="utf-8")
+    sections = Sections(content)
+    if _append_list_item(
+        sections,
+        "things she told the user",
+        dated_entry,
+        empty=("none yet.", "none yet", "none"),
+        end="\n",
+    ):
+        _write_file(_self_md(), sections.text())
 
 
 def get_self_disclosures() -> list[dict[str, str]]:
     """Return list of things Hikari told the user: [{date, text}]."""
-    content = read_file(_self_md())
+    if db := _db():
+        return db.get_self_disclosures()
+    return _parse_self_disclosures(read_file(_self_md()))
+
+
+def _parse_self_disclosures(content: str) -> list[dict[str, str]]:
     if not content:
         return []
-    m = re.search(r"## things she told the user\n(.*?)(?=\n##|\Z)", content, re.DOTALL)
-    if not m:
-        return []
     results = []
-    for line in m.group(1).splitlines():
+    for line in Sections(content).lines("things she told the user"):
         line = line.strip().lstrip("- ")
         dm = re.match(r"\[(\d{4}-\d{2}-\d{2})\] (.+)", line)
         if dm:
@@ -756,10 +1116,8 @@ recent_session_temperatures: []
 
 
 def _ensure_mood_md() -> None:
-    if not _mood_md().exists():
-        _mood_md().write_text(
-            _MOOD_MD_TEMPLATE.format(today=date.today().isoformat()), encoding="utf-8"
-        )
+    if not _file_exists(_mood_md()):
+        _write_file(_mood_md(), _MOOD_MD_TEMPLATE.format(today=date.today().isoformat()))
 
 
 def read_mood_arc() -> dict[str, Any]:
@@ -797,9 +1155,7 @@ def append_session_temperature(session_date: date, temperature: str) -> None:
         data = {}
     data["recent_session_temperatures"] = temps
     yaml_block = yaml.dump(data, default_flow_style=False, allow_unicode=True, sort_keys=False)
-    _mood_md().write_text(
-        "\n".join(comment_lines) + "\n" + yaml_block, encoding="utf-8"
-    )
+    _write_file(_mood_md(), "\n".join(comment_lines) + "\n" + yaml_block)
 
 
 def write_mood_arc(arc: str, arc_note: str) -> None:
@@ -816,9 +1172,7 @@ def write_mood_arc(arc: str, arc_note: str) -> None:
     data["arc_detected_at"] = date.today().isoformat()
     data["arc_note"] = arc_note
     yaml_block = yaml.dump(data, default_flow_style=False, allow_unicode=True, sort_keys=False)
-    _mood_md().write_text(
-        "\n".join(comment_lines) + "\n" + yaml_block, encoding="utf-8"
-    )
+    _write_file(_mood_md(), "\n".join(comment_lines) + "\n" + yaml_block)
 
 
 # ---------------------------------------------------------------------------
@@ -828,20 +1182,184 @@ def write_mood_arc(arc: str, arc_note: str) -> None:
 
 def record_photo_sent() -> None:
     """Increment the daily photo counter in HEARTBEAT.md."""
-    state = _read_heartbeat_yaml()
+    state = _heartbeat()
     today_str = date.today().isoformat()
     # Reset if it's a new day
-    if state.get("photos_sent_date") != today_str:
-        state["photos_sent_today"] = 0
-        state["photos_sent_date"] = today_str
-    state["photos_sent_today"] = int(state.get("photos_sent_today", 0)) + 1
-    _write_heartbeat_yaml(state)
+    if state.photos_sent_date != today_str:
+        update_heartbeat_state(photos_sent_today=1, photos_sent_date=today_str)
+    else:
+        update_heartbeat_state(photos_sent_today=state.photos_sent_today + 1)
 
 
 def get_photos_sent_today() -> int:
     """Return number of photos sent today."""
-    state = _read_heartbeat_yaml()
-    today_str = date.today().isoformat()
-    if state.get("photos_sent_date") != today_str:
+    state = _heartbeat()
+    if state.photos_sent_date != date.today().isoformat():
         return 0
-    return int(state.get("photos_sent_today", 0))
+    return state.photos_sent_today
+
+
+# ---------------------------------------------------------------------------
+# Session log — in-flight chat sessions, one JSON record per line, so a restart
+# doesn't lose them. Writes are queued on a single thread so they land in order;
+# paths are resolved when a write is queued, not when it runs.
+# ---------------------------------------------------------------------------
+
+_SESSION_LOG_NAME = "session.log.jsonl"
+_session_log_executor: ThreadPoolExecutor | None = None
+
+
+def _session_log_path(user_id: int) -> Path:
+    return _BASE_DATA_DIR / "users" / str(user_id) / _SESSION_LOG_NAME
+
+
+def _session_log_io() -> ThreadPoolExecutor:
+    global _session_log_executor
+    if _session_log_executor is None:
+        _session_log_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="session-log"
+        )
+    return _session_log_executor
+
+
+def _append_records(path: Path, records: list[dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+
+
+def _rewrite_records(path: Path, records: list[dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _atomic_write(path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+
+
+def append_session_log(user_id: int, record: dict[str, Any]) -> Future[None]:
+    """Queue one record onto a user's session log."""
+    return _session_log_io().submit(_append_records, _session_log_path(user_id), [record])
+
+
+def compact_session_log(user_id: int, records: list[dict[str, Any]]) -> Future[None]:
+    """Queue a replacement of a user's session log with records."""
+    return _session_log_io().submit(_rewrite_records, _session_log_path(user_id), records)
+
+
+def delete_session_log(user_id: int) -> Future[None]:
+    """Queue removal of a user's session log (the session ended or was cleared)."""
+    return _session_log_io().submit(_session_log_path(user_id).unlink, missing_ok=True)
+
+
+def read_session_log(user_id: int) -> list[dict[str, Any]]:
+    """Return a user's session log records; a torn or corrupt line is skipped."""
+    try:
+        text = _session_log_path(user_id).read_text(encoding="utf-8")
+    except OSError:
+        return []
+    records = []
+    for line in text.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records
+
+
+def list_session_logs() -> dict[int, float]:
+    """Return {user_id: last write time (epoch seconds)} for every saved session."""
+    logs = {}
+    for uid in list_all_user_ids():
+        try:
+            logs[uid] = _session_log_path(uid).stat().st_mtime
+        except OSError:
+            continue
+    return logs
+
+
+# ---------------------------------------------------------------------------
+# Async facade — keeps disk I/O off the event loop
+# ---------------------------------------------------------------------------
+
+_io_executor: ThreadPoolExecutor | None = None
+
+
+def _io_pool() -> ThreadPoolExecutor:
+    global _io_executor
+    if _io_executor is None:
+        workers = get_settings().memory.io_workers
+        _io_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memory-io")
+    return _io_executor
+
+
+def shutdown_io() -> None:
+    """Wait for pending memory I/O and stop the pools (recreated on next use)."""
+    global _io_executor, _session_log_executor
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=True)
+        _io_executor = None
+    if _session_log_executor is not None:
+        _session_log_executor.shutdown(wait=True)
+        _session_log_executor = None
+
+
+async def run_io(fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking memory call on the I/O pool.
+
+    The call runs in a copy of the caller's context, so the current user and any
+    open batch() carry over to the worker thread.
+    """
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_io_pool(), call)
+
+
+def _hot_user_state() -> dict[str, Any] | None:
+    """Return the cached USER.md state if it was validated recently, else None."""
+    if _current_batch.get() is not None or get_backend() != "markdown":
+        return None
+    cached = _user_md_cache.get(_current_user_id.get())
+    if (
+        cached
+        and cached[0] == _user_md()
+        and time.monotonic() - cached[4] < _USER_MD_RECHECK_SECONDS
+    ):
+        return _copy_user_state(cached[3])
+    return None
+
+
+def _warm_user(user_id: int) -> None:
+    init_user_data(user_id)
+    token = _current_user_id.set(user_id)
+    try:
+        get_user_state()
+        _heartbeat()
+    finally:
+        _current_user_id.reset(token)
+
+
+async def ainit_user_data(user_id: int) -> None:
+    """init_user_data() plus loading the user's state into the in-process caches."""
+    await run_io(_warm_user, user_id)
+
+
+async def aget_user_state() -> dict[str, Any]:
+    state = _hot_user_state()
+    return state if state is not None else await run_io(get_user_state)
+
+
+async def aget_trust_stage() -> int:
+    return (await aget_user_state())["relationship_stage"]
+
+
+async def aget_meaningful_exchanges() -> int:
+    return (await aget_user_state())["meaningful_exchanges"]
+
+
+async def aget_open_loops() -> list[str]:
+    return (await aget_user_state())["open_loops"]
+
+
+async def aget_heartbeat_state() -> dict[str, Any]:
+    if (_BASE_DATA_DIR, _current_user_id.get()) in _heartbeat_states:
+        return get_heartbeat_state()
+    return await run_io(get_heartbeat_state)
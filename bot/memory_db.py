@@ -0,0 +1,469 @@
+"""SQLite storage backend for per-user memory (selected with memory.backend in settings.yaml).
+
+Mirrors the memory.py functions for USER.md state (basics, open loops, known facts),
+HEARTBEAT.md state, episodes and the "things she told the user" list. memory.py
+dispatches to this module when the backend is "sqlite"; everything else (MEMORY.md,
+THOUGHTS.md, the rest of SELF.md, MOOD.md) stays in markdown.
+
+The markdown files become an optional export view:
+
+    uv run python -m bot.memory_db import      # one-shot: data/users/<id>/ -> data/memory.db
+    uv run python -m bot.memory_db export      # data/memory.db -> data/users/<id>/*.md
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import re
+import sqlite3
+import threading
+from collections.abc import Iterator
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+from . import memory as _md
+from .mdsections import Sections
+
+_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS user_fields (
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+CREATE TABLE IF NOT EXISTS facts (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    fact_date TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS facts_by_user ON facts (user_id, id);
+CREATE TABLE IF NOT EXISTS open_loops (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS open_loops_by_user ON open_loops (user_id, id);
+CREATE TABLE IF NOT EXISTS disclosures (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    disclosure_date TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS disclosures_by_user ON disclosures (user_id, id);
+CREATE TABLE IF NOT EXISTS heartbeat (
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    user_id INTEGER NOT NULL,
+    episode_date TEXT NOT NULL,
+    content TEXT NOT NULL,
+    carry_over TEXT,
+    PRIMARY KEY (user_id, episode_date)
+);
+CREATE INDEX IF NOT EXISTS episodes_with_carry_over
+    ON episodes (user_id, episode_date) WHERE carry_over IS NOT NULL;
+"""
+
+_DEFAULT_FIELDS = {
+    "name": "unknown",
+    "relationship_stage": "0",
+    "meaningful_exchanges": "0",
+}
+
+# One connection per database file, shared across threads and serialized by _lock.
+_connections: dict[Path, sqlite3.Connection] = {}
+_lock = threading.RLock()
+_tx_depth = 0
+
+
+def db_path() -> Path:
+    return _md._BASE_DATA_DIR / "memory.db"
+
+
+def _conn() -> sqlite3.Connection:
+    path = db_path()
+    conn = _connections.get(path)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _connections[path] = conn
+    return conn
+
+
+def close() -> None:
+    """Close all open database connections."""
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+@contextlib.contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Run the enclosed statements in one transaction. Nested calls join the outer one."""
+    global _tx_depth
+    with _lock:
+        conn = _conn()
+        if _tx_depth:
+            _tx_depth += 1
+            try:
+                yield conn
+            finally:
+                _tx_depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        _tx_depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            _tx_depth = 0
+
+
+def _query(sql: str, params: tuple[Any, ...] = ()) -> list[tuple[Any, ...]]:
+    with _lock:
+        return _conn().execute(sql, params).fetchall()
+
+
+def _uid() -> int:
+    return _md.get_current_user()
+
+
+@contextlib.contextmanager
+def _as_user(user_id: int) -> Iterator[None]:
+    token = _md._current_user_id.set(user_id)
+    try:
+        yield
+    finally:
+        _md._current_user_id.reset(token)
+
+
+def _split_dated(line: str) -> tuple[str | None, str]:
+    """Split "[YYYY-MM-DD] text" into (date, text); undated lines give (None, line)."""
+    m = re.match(r"^\[(\d{4}-\d{2}-\d{2})\]\s+(.*)", line)
+    if m:
+        return m.group(1), m.group(2).strip()
+    return None, line
+
+
+# ---------------------------------------------------------------------------
+# USER.md state
+# ---------------------------------------------------------------------------
+
+
+def _user_fields() -> dict[str, str]:
+    rows = _query("SELECT key, value FROM user_fields WHERE user_id = ?", (_uid(),))
+    return {**_DEFAULT_FIELDS, **dict(rows)}
+
+
+def get_user_state() -> dict[str, Any]:
+    uid = _uid()
+    fields = _user_fields()
+    facts = _query(
+        "SELECT fact_date, text FROM facts WHERE user_id = ? ORDER BY id", (uid,)
+    )
+    loops = _query("SELECT text FROM open_loops WHERE user_id = ? ORDER BY id", (uid,))
+    return {
+        "name": fields["name"],
+        "relationship_stage": int(fields["relationship_stage"]),
+        "meaningful_exchanges": int(fields["meaningful_exchanges"]),
+        "open_loops": [text for (text,) in loops],
+        "known_facts": [f"[{d}] {text}" if d else text for d, text in facts],
+    }
+
+
+def update_user_field(key: str, value: Any) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO user_fields (user_id, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value",
+            (_uid(), key, str(value)),
+        )
+
+
+def increment_meaningful_exchanges() -> int:
+    with transaction():
+        new_count = int(_user_fields()["meaningful_exchanges"]) + 1
+        update_user_field("meaningful_exchanges", new_count)
+    return new_count
+
+
+def add_open_loop(loop: str) -> None:
+    with transaction() as conn:
+        conn.execute("INSERT INTO open_loops (user_id, text) VALUES (?, ?)", (_uid(), loop))
+
+
+def clear_open_loops() -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM open_loops WHERE user_id = ?", (_uid(),))
+
+
+def add_known_fact(fact: str) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO facts (user_id, fact_date, text) VALUES (?, ?, ?)",
+            (_uid(), date.today().isoformat(), fact),
+        )
+
+
+def forget_topic(topic: str) -> None:
+    """Delete known facts and open loops mentioning topic (case-insensitive)."""
+    needle = topic.lower()
+    with transaction() as conn:
+        conn.execute(
+            "DELETE FROM facts WHERE user_id = ? "
+            "AND instr(lower(coalesce('[' || fact_date || '] ', '') || text), ?) > 0",
+            (_uid(), needle),
+        )
+        conn.execute(
+            "DELETE FROM open_loops WHERE user_id = ? AND instr(lower(text), ?) > 0",
+            (_uid(), needle),
+        )
+
+
+# ---------------------------------------------------------------------------
+# HEARTBEAT.md state
+# ---------------------------------------------------------------------------
+
+
+def read_heartbeat() -> dict[str, Any]:
+    rows = _query("SELECT key, value FROM heartbeat WHERE user_id = ?", (_uid(),))
+    return {key: json.loads(value) for key, value in rows}
+
+
+def write_heartbeat(state: dict[str, Any]) -> None:
+    uid = _uid()
+    with transaction() as conn:
+        conn.execute("DELETE FROM heartbeat WHERE user_id = ?", (uid,))
+        conn.executemany(
+            "INSERT INTO heartbeat (user_id, key, value) VALUES (?, ?, ?)",
+            [(uid, k, json.dumps(v, default=str)) for k, v in state.items()],
+        )
+
+
+# ---------------------------------------------------------------------------
+# Episodes
+# ---------------------------------------------------------------------------
+
+
+def _carry_over(content: str) -> str | None:
+    body = Sections(content).body("carry_over")
+    return body.strip() if body is not None else None
+
+
+def _export_path(episode_date: str) -> Path:
+    """Where the episode lives in the markdown export view (may not exist on disk)."""
+    return _md._episodes_dir() / f"{episode_date}.md"
+
+
+def write_episode(content: str, episode_date: date | None = None) -> Path:
+    target = (episode_date or date.today()).isoformat()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO episodes (user_id, episode_date, content, carry_over) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (user_id, episode_date) DO UPDATE SET "
+            "content = excluded.content, carry_over = excluded.carry_over",
+            (_uid(), target, content, _carry_over(content)),
+        )
+    return _export_path(target)
+
+
+def read_episode(episode_date: date) -> str:
+    rows = _query(
+        "SELECT content FROM episodes WHERE user_id = ? AND episode_date = ?",
+        (_uid(), episode_date.isoformat()),
+    )
+    return rows[0][0].strip() if rows else ""
+
+
+def list_recent_episodes(n: int = 3) -> list[Path]:
+    rows = _query(
+        "SELECT episode_date FROM episodes WHERE user_id = ? "
+        "ORDER BY episode_date DESC LIMIT ?",
+        (_uid(), n),
+    )
+    return [_export_path(d) for (d,) in rows]
+
+
+def read_recent_episodes(n: int = 3) -> str:
+    rows = _query(
+        "SELECT content FROM episodes WHERE user_id = ? ORDER BY episode_date DESC LIMIT ?",
+        (_uid(), n),
+    )
+    parts = [content.strip() for (content,) in rows if content.strip()]
+    return "\n\n---\n\n".join(parts)
+
+
+def read_last_episode_carry_over() -> str:
+    rows = _query(
+        "SELECT carry_over FROM episodes WHERE user_id = ? AND carry_over IS NOT NULL "
+        "ORDER BY episode_date DESC LIMIT 1",
+        (_uid(),),
+    )
+    return rows[0][0] if rows else ""
+
+
+def prune_old_episodes(retention_days: int) -> int:
+    cutoff = date.fromordinal(date.today().toordinal() - retention_days).isoformat()
+    with transaction() as conn:
+        cur = conn.execute(
+            "DELETE FROM episodes WHERE user_id = ? AND episode_date < ?", (_uid(), cutoff)
+        )
+        return cur.rowcount
+
+
+# ---------------------------------------------------------------------------
+# SELF.md — things she told the user
+# ---------------------------------------------------------------------------
+
+
+def add_self_disclosure(text: str) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO disclosures (user_id, disclosure_date, text) VALUES (?, ?, ?)",
+            (_uid(), date.today().isoformat(), text),
+        )
+
+
+def get_self_disclosures() -> list[dict[str, str]]:
+    rows = _query(
+        "SELECT disclosure_date, text FROM disclosures WHERE user_id = ? ORDER BY id",
+        (_uid(),),
+    )
+    return [{"date": d, "text": text} for d, text in rows]
+
+
+# ---------------------------------------------------------------------------
+# Markdown import / export
+# ---------------------------------------------------------------------------
+
+
+def import_user(user_id: int) -> dict[str, int]:
+    """Load one data/users/<id>/ tree into the database, replacing that user's rows.
+
+    Returns row counts per table. Safe to re-run: the user's rows are rebuilt from
+    the markdown files each time.
+    """
+    with _as_user(user_id), transaction() as conn:
+        for table in ("user_fields", "facts", "open_loops", "disclosures", "heartbeat"):
+            conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM episodes WHERE user_id = ?", (user_id,))
+
+        user_content = _md.read_file(_md._user_md())
+        state = _md._parse_user_md_content(user_content)
+        basics = _md._parse_basics(user_content)
+        basics.setdefault("relationship_stage", str(state["relationship_stage"]))
+        basics.setdefault("meaningful_exchanges", str(state["meaningful_exchanges"]))
+        for key, value in basics.items():
+            update_user_field(key, value)
+
+        for fact in state["known_facts"]:
+            fact_date, text = _split_dated(fact)
+            conn.execute(
+                "INSERT INTO facts (user_id, fact_date, text) VALUES (?, ?, ?)",
+                (user_id, fact_date, text),
+            )
+        for loop in state["open_loops"]:
+            add_open_loop(loop)
+
+        disclosures = _md._parse_self_disclosures(_md.read_file(_md._self_md()))
+        conn.executemany(
+            "INSERT INTO disclosures (user_id, disclosure_date, text) VALUES (?, ?, ?)",
+            [(user_id, d["date"], d["text"]) for d in disclosures],
+        )
+
+        heartbeat = _md._read_heartbeat_yaml()
+        write_heartbeat(heartbeat)
+
+        episodes = sorted(_md._episodes_dir().glob("????-??-??.md"))
+        for path in episodes:
+            try:
+                episode_date = date.fromisoformat(path.stem)
+            except ValueError:
+                continue
+            write_episode(_md.read_file(path), episode_date)
+
+    return {
+        "facts": len(state["known_facts"]),
+        "open_loops": len(state["open_loops"]),
+        "disclosures": len(disclosures),
+        "heartbeat": len(heartbeat),
+        "episodes": len(episodes),
+    }
+
+
+def _render_user_md() -> str:
+    fields = _user_fields()
+    state = get_user_state()
+    last_updated = fields.pop("last_updated", "never")
+    ordered = ["name", "known preferences", "relationship_stage", "meaningful_exchanges"]
+    keys = [k for k in ordered if k in fields] + [k for k in fields if k not in ordered]
+    basics = "\n".join(f"- {k}: {fields[k]}" for k in keys)
+    loops = "\n".join(f"- {loop}" for loop in state["open_loops"]) or "none"
+    facts = "\n".join(f"- {fact}" for fact in state["known_facts"]) or "none yet"
+    return (
+        "# User Profile\n"
+        "<!-- Exported from data/memory.db. Edits here are not read back. -->\n\n"
+        f"## basics\n{basics}\n\n"
+        f"## open_loops\n{loops}\n\n"
+        f"## known_facts\n{facts}\n\n"
+        f"## last_updated: {last_updated}\n"
+    )
+
+
+def export_user(user_id: int) -> None:
+    """Write the database state for one user back out as markdown files."""
+    with _as_user(user_id):
+        _md._write_user_md(_render_user_md())
+        _md._write_heartbeat_yaml(read_heartbeat())
+
+        rows = _query(
+            "SELECT episode_date, content FROM episodes WHERE user_id = ?", (user_id,)
+        )
+        for episode_date, content in rows:
+            _export_path(episode_date).write_text(content, encoding="utf-8")
+        _md.rebuild_episode_manifest()
+
+        disclosures = get_self_disclosures()
+        if disclosures:
+            body = "\n".join(f"- [{d['date']}] {d['text']}" for d in disclosures) + "\n"
+            sections = Sections(_md.read_file(_md._self_md()))
+            if not sections.replace("things she told the user", body):
+                sections.append("things she told the user", body)
+            _md._self_md().write_text(sections.text().lstrip("\n"), encoding="utf-8")
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m bot.memory_db")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("user_ids", nargs="*", type=int, help="default: all users")
+    args = parser.parse_args(argv)
+
+    for uid in args.user_ids or _md.list_all_user_ids():
+        if args.command == "import":
+            counts = import_user(uid)
+            print(f"user {uid}: imported {counts}")
+        else:
+            export_user(uid)
+            print(f"user {uid}: exported to {_md._BASE_DATA_DIR / 'users' / str(uid)}")
+    close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""In-process LLM metrics: latency, tokens and cost per task, model and user.
+
+llm.py records every OpenRouter call here. snapshot() feeds /stats and
+render_prometheus() produces the Prometheus text format, written periodically
+to settings.metrics.file for a node_exporter textfile collector (or anything
+else that tails it). Counters are process-lifetime; they reset on restart.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+# Histogram bucket upper bounds
+_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 120.0)
+_TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+# Recent latencies per task kept for /stats percentiles
+_WINDOW = 500
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_counters: dict[str, dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+_histograms: dict[str, dict[Labels, Histogram]] = defaultdict(dict)
+_recent: dict[str, deque[float]] = {}
+_collectors: list[Callable[[], Iterable[tuple[str, dict[str, str], float]]]] = []
+
+_HELP = {
+    "llm_requests_total": "OpenRouter calls by task, model and outcome.",
+    "llm_request_seconds": "OpenRouter call latency (after scheduling), by task.",
+    "llm_first_token_seconds": "Time to first streamed token, by task.",
+    "llm_prompt_tokens": "Prompt size per call, by task.",
+    "llm_prompt_tokens_total": "Prompt tokens by task and model.",
+    "llm_completion_tokens_total": "Completion tokens by task and model.",
+    "llm_cost_usd_total": "OpenRouter-reported cost by task and model.",
+    "llm_user_tokens_total": "Prompt plus completion tokens by user.",
+    "llm_user_cost_usd_total": "OpenRouter-reported cost by user.",
+}
+
+
+def _labels(**labels: object) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _observe(name: str, bounds: tuple[float, ...], labels: Labels, value: float) -> None:
+    hist = _histograms[name].get(labels)
+    if hist is None:
+        hist = _histograms[name][labels] = Histogram(bounds)
+    hist.observe(value)
+
+
+def record_llm_call(
+    task: str,
+    model: str,
+    user_id: int,
+    seconds: float,
+    outcome: str = "ok",
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cost: float = 0.0,
+    first_token_seconds: float | None = None,
+) -> None:
+    """Record one OpenRouter call (one HTTP attempt, so retries count separately)."""
+    by_task = _labels(task=task)
+    by_model = _labels(task=task, model=model)
+    by_user = _labels(user=user_id)
+    with _lock:
+        _counters["llm_requests_total"][_labels(task=task, model=model, outcome=outcome)] += 1
+        _observe("llm_request_seconds", _LATENCY_BUCKETS, by_task, seconds)
+        if first_token_seconds is not None:
+            _observe("llm_first_token_seconds", _LATENCY_BUCKETS, by_task, first_token_seconds)
+        if outcome != "ok":
+            return
+        _recent.setdefault(task, deque(maxlen=_WINDOW)).append(seconds)
+        if prompt_tokens:
+            _observe("llm_prompt_tokens", _TOKEN_BUCKETS, by_task, prompt_tokens)
+        _counters["llm_prompt_tokens_total"][by_model] += prompt_tokens
+        _counters["llm_completion_tokens_total"][by_model] += completion_tokens
+        _counters["llm_cost_usd_total"][by_model] += cost
+        _counters["llm_user_tokens_total"][by_user] += prompt_tokens + completion_tokens
+        _counters["llm_user_cost_usd_total"][by_user] += cost
+
+
+def add_collector(collect: Callable[[], Iterable[tuple[str, dict[str, str], float]]]) -> None:
+    """Register a callback yielding (name, labels, value) gauges at render time."""
+    _collectors.append(collect)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _recent.clear()
+
+
+# ---------------------------------------------------------------------------
+# Views
+# ---------------------------------------------------------------------------
+
+
+def _quantile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def _sum_by(name: str, key: str) -> dict[str, float]:
+    totals: dict[str, float] = defaultdict(float)
+    for labels, value in _counters.get(name, {}).items():
+        totals[dict(labels)[key]] += value
+    return totals
+
+
+def snapshot() -> dict[str, dict[str, float]]:
+    """Per task: calls, errors, p50/p95 latency (recent calls), tokens in/out and cost."""
+    with _lock:
+        calls: dict[str, float] = defaultdict(float)
+        errors: dict[str, float] = defaultdict(float)
+        for labels, value in _counters.get("llm_requests_total", {}).items():
+            fields = dict(labels)
+            calls[fields["task"]] += value
+            if fields["outcome"] not in ("ok", "cancelled"):  # hedge losers aren't failures
+                errors[fields["task"]] += value
+        prompt = _sum_by("llm_prompt_tokens_total", "task")
+        completion = _sum_by("llm_completion_tokens_total", "task")
+        cost = _sum_by("llm_cost_usd_total", "task")
+        recent = {task: list(samples) for task, samples in _recent.items()}
+    return {
+        task: {
+            "calls": calls[task],
+            "errors": errors[task],
+            "p50": _quantile(recent.get(task, []), 0.5),
+            "p95": _quantile(recent.get(task, []), 0.95),
+            "prompt_tokens": prompt.get(task, 0.0),
+            "completion_tokens": completion.get(task, 0.0),
+            "cost": cost.get(task, 0.0),
+        }
+        for task in sorted(calls)
+    }
+
+
+def user_totals(user_id: int) -> tuple[float, float]:
+    """(tokens, cost) spent on one user since start."""
+    key = _labels(user=user_id)
+    with _lock:
+        return (
+            _counters.get("llm_user_tokens_total", {}).get(key, 0.0),
+            _counters.get("llm_user_cost_usd_total", {}).get(key, 0.0),
+        )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    with _lock:
+        for name in sorted(_counters):
+            lines += [f"# HELP {name} {_HELP.get(name, name)}", f"# TYPE {name} counter"]
+            for labels, value in sorted(_counters[name].items()):
+                lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+        for name in sorted(_histograms):
+            lines += [f"# HELP {name} {_HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            for labels, hist in sorted(_histograms[name].items()):
+                cumulative = 0
+                bounds = [*(_number(b) for b in hist.bounds), "+Inf"]
+                for bound, count in zip(bounds, hist.counts, strict=True):
+                    cumulative += count
+                    bucket = _format_labels((*labels, ("le", bound)))
+                    lines.append(f"{name}_bucket{bucket} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_number(hist.total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+    gauges: dict[str, list[str]] = defaultdict(list)
+    for collect in _collectors:
+        for name, labels, value in collect():
+            gauges[name].append(f"{name}{_format_labels(sorted(labels.items()))} {_number(value)}")
+    for name in sorted(gauges):
+        lines += [f"# TYPE {name} gauge", *gauges[name]]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path: Path, text: str) -> None:
+    """Write rendered metrics to path atomically (textfile collectors read it any time)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
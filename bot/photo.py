@@ -5,41 +5,21 @@ from __future__ import annotations
 import base64
 import os
 import random
-import re
-from pathlib import Path
-from typing import Any
+import time
 
-import httpx
-import yaml
 from dotenv import load_dotenv
 
-load_dotenv()
-
-_ROOT = Path(__file__).parent.parent
-_SETTINGS_PATH = _ROOT / "settings.yaml"
-_APPEARANCE_MD = _ROOT / "character" / "APPEARANCE.md"
-
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/images/generations"
+from . import metrics
+from .character import get_assets
+from .llm import Priority, api_url, auth_headers, get_client, get_scheduler, timeout_for
+from .settings import Settings, get_settings
 
-
-def _load_settings() -> dict[str, Any]:
-    with open(_SETTINGS_PATH) as f:
-        return yaml.safe_load(f)
+load_dotenv()
 
 
 def _read_appearance_base() -> str:
     """Return the base appearance prompt from APPEARANCE.md."""
-    try:
-        content = _APPEARANCE_MD.read_text(encoding="utf-8")
-        m = re.search(r"## base prompt\n\n(.+?)(?=\n##|\Z)", content, re.DOTALL)
-        if m:
-            return m.group(1).strip()
-    except FileNotFoundError:
-        pass
-    return (
-        "young japanese woman, 21, dark hair, urban style, realistic, "
-        "natural lighting, authentic candid expression"
-    )
+    return get_assets().appearance_base
 
 
 # Scene suffixes keyed by (mood, stage) — returns a scene type key
@@ -105,89 +85,88 @@ def get_photo_scene(mood: str, stage: int) -> str:
     return _SCENE_SUFFIXES.get(scene_key, _SCENE_SUFFIXES["casual_desk"])
 
 
-def _is_photo_enabled(settings: dict[str, Any]) -> bool:
-    return bool(settings.get("photo", {}).get("enabled", False))
-
-
-def _get_photo_model(settings: dict[str, Any]) -> str:
-    return settings.get("photo", {}).get("model", "black-forest-labs/flux.2-klein")
-
-
-def _get_max_per_day(settings: dict[str, Any]) -> int:
-    return int(settings.get("photo", {}).get("max_per_day", 2))
-
-
-def _get_stage_threshold(settings: dict[str, Any]) -> int:
-    return int(settings.get("photo", {}).get("stage_threshold", 2))
-
-
-def _get_heartbeat_probability(settings: dict[str, Any]) -> float:
-    return float(settings.get("photo", {}).get("heartbeat_probability", 0.15))
-
-
-def should_send_proactive_photo(stage: int, mood: str, settings: dict[str, Any]) -> bool:
+def should_send_proactive_photo(stage: int, mood: str, settings: Settings) -> bool:
     """True if a proactive photo should be sent in a heartbeat context."""
-    if not _is_photo_enabled(settings):
+    if not settings.photo.enabled:
         return False
     if stage < 3:
         return False
     if mood == "irritable":
         return False
-    if random.random() >= _get_heartbeat_probability(settings):
+    if random.random() >= settings.photo.heartbeat_probability:
         return False
     from .memory import get_photos_sent_today
-    if get_photos_sent_today() >= _get_max_per_day(settings):
+    if get_photos_sent_today() >= settings.photo.max_per_day:
         return False
     return True
 
 
-def can_send_photo(stage: int, mood: str, settings: dict[str, Any]) -> bool:
+def can_send_photo(stage: int, mood: str, settings: Settings) -> bool:
     """True if she can send a photo at all (user-requested or reactive)."""
-    if not _is_photo_enabled(settings):
+    if not settings.photo.enabled:
         return False
-    if stage < _get_stage_threshold(settings):
+    if stage < settings.photo.stage_threshold:
         return False
     if mood == "irritable":
         return False
     from .memory import get_photos_sent_today
-    if get_photos_sent_today() >= _get_max_per_day(settings):
+    if get_photos_sent_today() >= settings.photo.max_per_day:
         return False
     return True
 
 
-async def _generate_photo_openrouter(prompt: str, model: str) -> bytes | None:
+async def _generate_photo_openrouter(
+    prompt: str, model: str, priority: Priority = Priority.INTERACTIVE
+) -> bytes | None:
     """Generate a photo via OpenRouter images API."""
     api_key = os.getenv("OPENROUTER_API_KEY", "")
     if not api_key:
         return None
+    client = get_client()
+    timeout = timeout_for("photo")
+    from .memory import get_current_user
+    outcome = "error"
+    started = time.monotonic()
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with get_scheduler().slot(priority, model):
+            started = time.monotonic()
             resp = await client.post(
-                OPENROUTER_API_URL,
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
+                api_url("/images/generations"),
+                headers=auth_headers(api_key),
                 json={"model": model, "prompt": prompt, "n": 1},
+                timeout=timeout,
             )
-            resp.raise_for_status()
-            data = resp.json()
-            item = data.get("data", [{}])[0]
-            if "b64_json" in item:
-                return base64.b64decode(item["b64_json"])
-            if "url" in item:
-                img_resp = await client.get(item["url"])
-                img_resp.raise_for_status()
-                return img_resp.content
+        outcome = str(resp.status_code) if resp.is_error else "ok"
+        resp.raise_for_status()
+        data = resp.json()
+        usage = data.get("usage") or {}
+        metrics.record_llm_call(
+            "photo",
+            model,
+            get_current_user(),
+            time.monotonic() - started,
+            cost=float(usage.get("cost") or 0.0),
+        )
+        item = data.get("data", [{}])[0]
+        if "b64_json" in item:
+            return base64.b64decode(item["b64_json"])
+        if "url" in item:
+            img_resp = await client.get(item["url"], timeout=timeout)
+            img_resp.raise_for_status()
+            return img_resp.content
     except Exception:
+        if outcome != "ok":
+            metrics.record_llm_call(
+                "photo", model, get_current_user(), time.monotonic() - started, outcome
+            )
         return None
 
 
-async def generate_photo(mood: str, stage: int) -> bytes | None:
+async def generate_photo(
+    mood: str, stage: int, priority: Priority = Priority.INTERACTIVE
+) -> bytes | None:
     """Generate a photo via OpenRouter. Returns raw bytes or None."""
-    settings = _load_settings()
     appearance_base = _read_appearance_base()
     scene = get_photo_scene(mood, stage)
     prompt = f"{appearance_base}, {scene}"
-    model = _get_photo_model(settings)
-    return await _generate_photo_openrouter(prompt, model)
+    return await _generate_photo_openrouter(prompt, get_settings().photo.model, priority)
@@ -0,0 +1,237 @@
+"""Relevance-ranked recall of known facts (ROADMAP 4.1, after Park et al.).
+
+Each user's known facts live in an in-memory inverted index (term -> fact ids)
+kept current by memory.add_known_fact() and memory.forget_topic(). A turn asks
+for the top-k facts scored, as in the generative-agents retrieval function, by
+
+    recency + importance + 2 × relevance
+
+where recency (0-1) decays exponentially with the fact's age, importance comes
+from an optional "[n]" tag (1-10, default 5, scaled to 0-1) and relevance (0-1)
+is IDF-weighted keyword overlap with the current message and recent history.
+Summing rather than multiplying keeps a months-old fact that matches the
+conversation ahead of a fresh one that doesn't.
+
+Scoring is bounded: each query term contributes at most its _MAX_POSTINGS newest
+facts, plus the best k by recency + importance, so a turn scores a few hundred
+facts at most however long the list gets. The recency + importance order is
+re-sorted once a day (O(n log n)) and kept up to date by add() in between.
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import math
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+_FACT_RE = re.compile(r"^\[(\d{4}-\d{2}-\d{2})\]\s+(?:\[(\d{1,2})\]\s+)?(.*)$")
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "the and for are but not you your with have has had was were that this they them "
+    "their what when where who how about from into just like really very some any all "
+    "can could would should will she her his him its it's i'm don't didn't".split()
+)
+
+DEFAULT_IMPORTANCE = 5
+# Query terms matching more than this share of facts carry no signal and are skipped.
+_MAX_TERM_SHARE = 0.2
+# Facts scored per query term: its newest ones (facts are appended as they're learned).
+_MAX_POSTINGS = 64
+# Relevance outweighs recency and importance; they break ties and rank the no-match case.
+_RELEVANCE_WEIGHT = 2.0
+
+
+def terms(text: str) -> set[str]:
+    """Lowercased content words of text (stopwords and very short words removed)."""
+    return {w for w in _WORD_RE.findall(text.lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+@dataclass(frozen=True, slots=True)
+class Fact:
+    raw: str
+    text: str
+    learned: date | None
+    importance: int
+    terms: frozenset[str]
+
+
+def parse_fact(raw: str) -> Fact:
+    """Parse a known_facts entry: "[YYYY-MM-DD] [importance] text" (both tags optional)."""
+    m = _FACT_RE.match(raw)
+    learned: date | None = None
+    importance = DEFAULT_IMPORTANCE
+    text = raw
+    if m:
+        try:
+            learned = date.fromisoformat(m.group(1))
+        except ValueError:
+            learned = None
+        if m.group(2):
+            importance = max(1, min(10, int(m.group(2))))
+        text = m.group(3).strip()
+    return Fact(raw, text, learned, importance, frozenset(terms(text)))
+
+
+class FactIndex:
+    """Inverted index over one user's known facts."""
+
+    __slots__ = (
+        "facts",
+        "postings",
+        "half_life_days",
+        "_next_id",
+        "_prior",
+        "_prior_keys",
+        "_prior_day",
+    )
+
+    def __init__(self, raw_facts: list[str] = (), half_life_days: float = 30.0) -> None:
+        self.facts: dict[int, Fact] = {}
+        # term -> fact ids in insertion order (a dict used as an ordered set)
+        self.postings: dict[str, dict[int, None]] = {}
+        self.half_life_days = half_life_days
+        self._next_id = 0
+        self._prior: list[int] | None = None  # ids by recency + importance, best first
+        self._prior_keys: list[float] = []  # their negated scores, ascending, for bisect
+        self._prior_day: date | None = None
+        for raw in raw_facts:
+            self.add(raw)
+
+    def __len__(self) -> int:
+        return len(self.facts)
+
+    def last_raw(self) -> str | None:
+        return next(reversed(self.facts.values())).raw if self.facts else None
+
+    def add(self, raw: str) -> None:
+        fact = parse_fact(raw)
+        fid = self._next_id
+        self._next_id += 1
+        self.facts[fid] = fact
+        for term in fact.terms:
+            self.postings.setdefault(term, {})[fid] = None
+        if self._prior is not None and self._prior_day is not None:
+            key = -self._prior_score(fact, self._prior_day)
+            pos = bisect.bisect_right(self._prior_keys, key)
+            self._prior_keys.insert(pos, key)
+            self._prior.insert(pos, fid)
+
+    def forget(self, topic: str) -> int:
+        """Drop facts whose line mentions topic (case-insensitive). Returns the count removed."""
+        needle = topic.lower()
+        topic_terms = terms(topic)
+        if topic_terms:
+            candidates = set.intersection(*(set(self.postings.get(t, ())) for t in topic_terms))
+        else:
+            candidates = set(self.facts)
+        doomed = [fid for fid in candidates if needle in self.facts[fid].raw.lower()]
+        for fid in doomed:
+            fact = self.facts.pop(fid)
+            for term in fact.terms:
+                ids = self.postings.get(term)
+                if ids is not None:
+                    ids.pop(fid, None)
+                    if not ids:
+                        del self.postings[term]
+        if doomed:
+            self._prior = None
+        return len(doomed)
+
+    def _recency(self, fact: Fact, today: date) -> float:
+        if fact.learned is None:
+            return 0.5 ** (365 / self.half_life_days)  # undated = treat as old
+        age = max(0, (today - fact.learned).days)
+        return 0.5 ** (age / self.half_life_days)
+
+    def _prior_score(self, fact: Fact, today: date) -> float:
+        return self._recency(fact, today) + fact.importance / 10
+
+    def _prior_ids(self, today: date) -> list[int]:
+        if self._prior is None or self._prior_day != today:
+            keyed = sorted((-self._prior_score(f, today), fid) for fid, f in self.facts.items())
+            self._prior_keys = [key for key, _ in keyed]
+            self._prior = [fid for _, fid in keyed]
+            self._prior_day = today
+        return self._prior
+
+    def top_k(self, query: str, k: int, today: date | None = None) -> list[str]:
+        """Return the raw text of the k best facts for query, best first."""
+        if not self.facts or k <= 0:
+            return []
+        today = today or date.today()
+        n = len(self.facts)
+        max_df = max(k, int(n * _MAX_TERM_SHARE))
+
+        weights: dict[str, float] = {}
+        for term in terms(query):
+            ids = self.postings.get(term)
+            if ids and len(ids) <= max_df:
+                weights[term] = math.log(1 + n / len(ids))
+        total_weight = sum(weights.values()) or 1.0
+
+        overlap: dict[int, float] = {}
+        for term, weight in weights.items():
+            for fid in itertools.islice(reversed(self.postings[term]), _MAX_POSTINGS):
+                overlap[fid] = overlap.get(fid, 0.0) + weight
+        candidates = set(overlap) | set(self._prior_ids(today)[:k])
+
+        def score(fid: int) -> float:
+            fact = self.facts[fid]
+            relevance = overlap.get(fid, 0.0) / total_weight
+            return (
+                self._recency(fact, today)
+                + fact.importance / 10
+                + _RELEVANCE_WEIGHT * relevance
+            )
+
+        best = heapq.nlargest(k, candidates, key=score)
+        return [self.facts[fid].raw for fid in best]
+
+
+# ---------------------------------------------------------------------------
+# Per-user indexes
+# ---------------------------------------------------------------------------
+
+# user data dir -> index
+_indexes: dict[Path, FactIndex] = {}
+_lock = threading.Lock()
+
+
+def _index_for(key: Path, known_facts: list[str]) -> FactIndex:
+    """Return the user's index, rebuilding it if it no longer matches known_facts."""
+    index = _indexes.get(key)
+    last = known_facts[-1] if known_facts else None
+    if index is None or len(index) != len(known_facts) or index.last_raw() != last:
+        index = FactIndex(known_facts)
+        _indexes[key] = index
+    return index
+
+
+def top_facts(
+    key: Path, known_facts: list[str], query: str, k: int, today: date | None = None
+) -> list[str]:
+    """Top-k of a user's known_facts for query (all of them if there are k or fewer)."""
+    if len(known_facts) <= k:
+        return list(known_facts)
+    with _lock:
+        return _index_for(key, known_facts).top_k(query, k, today)
+
+
+def fact_added(key: Path, raw: str) -> None:
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            index.add(raw)
+
+
+def topic_forgotten(key: Path, topic: str) -> None:
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            index.forget(topic)
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Any
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable
 
 import yaml
 
@@ -16,18 +18,14 @@ from .memory import (
     read_memory,
     read_mood_arc,
     read_recent_episodes,
+    run_io,
     set_current_user,
     write_mood_arc,
     write_self_preoccupation,
 )
+from .settings import get_settings
 
-_ROOT = Path(__file__).parent.parent
-_SETTINGS_PATH = _ROOT / "settings.yaml"
-
-
-def _load_settings() -> dict[str, Any]:
-    with open(_SETTINGS_PATH) as f:
-        return yaml.safe_load(f)
+logger = logging.getLogger(__name__)
 
 
 def _build_reflection_prompt(
@@ -113,77 +111,114 @@ Rules:
     ]
 
 
+def _strip_fences(raw: str) -> str:
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = "\n".join(raw.splitlines()[1:])
+    if raw.endswith("```"):
+        raw = "\n".join(raw.splitlines()[:-1])
+    return raw
+
+
+# ---------------------------------------------------------------------------
+# Stages — each needs only what was read up front, so they run concurrently
+# ---------------------------------------------------------------------------
+
+
+async def _reflect(episodes: str, existing_memory: str, stage: int) -> None:
+    """Main reflection: promote stable facts to MEMORY.md, write a thought to THOUGHTS.md."""
+    messages = _build_reflection_prompt(episodes, existing_memory, stage)
+    raw_yaml = await chat_completion(messages, task="memory", temperature=0.5)
+    data = yaml.safe_load(_strip_fences(raw_yaml))
+
+    new_facts: list[str] = data.get("new_memory_facts", []) or []
+    thought: str = (data.get("thought") or "").strip()
+
+    def write() -> None:
+        for fact in new_facts:
+            if fact and fact.strip():
+                append_to_memory("about the user", fact.strip())
+        if thought and stage >= 2:
+            append_thought(thought)
+
+    await run_io(write)
+
+
+async def _preoccupation(episodes: str) -> None:
+    """What Hikari is currently thinking about (not the user), for SELF.md."""
+    messages = _build_preoccupation_prompt(episodes)
+    preoccupation = await chat_completion(messages, task="memory", temperature=0.8)
+    preoccupation = preoccupation.strip().strip('"').strip("'")
+    if preoccupation:
+        await run_io(write_self_preoccupation, preoccupation)
+
+
+async def _mood_arc() -> None:
+    """Synthesize the emotional trajectory into MOOD.md from recent session temperatures."""
+    mood_data = await run_io(read_mood_arc)
+    temperatures: list[str] = mood_data.get("recent_session_temperatures", [])
+    if not temperatures:
+        return
+    messages = _build_mood_arc_prompt(temperatures)
+    arc_data = yaml.safe_load(
+        _strip_fences(await chat_completion(messages, task="memory", temperature=0.3))
+    )
+    arc = str(arc_data.get("arc", "stable")).strip()
+    arc_note = str(arc_data.get("note", "")).strip()
+    if arc in ("stable", "brightening", "darkening", "guarded") and arc_note:
+        await run_io(write_mood_arc, arc, arc_note)
+
+
+async def _timed(name: str, stage: Awaitable[None]) -> float | None:
+    """Run one stage; its wall time, or None if it failed (failures stay in the stage)."""
+    start = time.monotonic()
+    try:
+        await stage
+    except Exception as e:
+        logger.warning("Reflection stage %s failed: %s", name, e)
+        return None
+    return time.monotonic() - start
+
+
 async def run_reflection(user_id: int = 0) -> bool:
     """
     Run daily reflection. Promotes facts to MEMORY.md, writes THOUGHTS.md,
     generates SELF.md preoccupation, and updates MOOD.md arc.
-    Returns True if reflection ran.
+    Returns True if the main reflection ran.
+
+    The three LLM stages run concurrently — none reads what another writes — and a
+    failed stage doesn't stop the others. Old episodes are pruned once all are done.
     """
     set_current_user(user_id)
-    settings = _load_settings()
-    retention_days = settings.get("memory", {}).get("episode_retention_days", 30)
-
-    episodes = read_recent_episodes(n=3)
-    existing_memory = read_memory()
-    stage = get_trust_stage()
+    retention_days = get_settings().memory.episode_retention_days
 
+    episodes, existing_memory, stage = await asyncio.gather(
+        run_io(read_recent_episodes, n=3),
+        run_io(read_memory),
+        run_io(get_trust_stage),
+    )
     if not episodes:
         return False
 
-    # --- Main reflection: facts + thought ---
-    try:
-        messages = _build_reflection_prompt(episodes, existing_memory, stage)
-        raw_yaml = await chat_completion(messages, task="memory", temperature=0.5)
-
-        raw_yaml = raw_yaml.strip()
-        if raw_yaml.startswith("```"):
-            raw_yaml = "\n".join(raw_yaml.splitlines()[1:])
-        if raw_yaml.endswith("```"):
-            raw_yaml = "\n".join(raw_yaml.splitlines()[:-1])
+    stages = {
+        "reflect": _reflect(episodes, existing_memory, stage),
+        "preoccupation": _preoccupation(episodes),
+        "mood_arc": _mood_arc(),
+    }
+    start = time.monotonic()
+    timings = dict(
+        zip(stages, await asyncio.gather(*(_timed(n, s) for n, s in stages.items())), strict=True)
+    )
+    logger.info(
+        "Reflection for user %d took %.1fs (%s).",
+        user_id,
+        time.monotonic() - start,
+        ", ".join(
+            f"{name} {'failed' if t is None else f'{t:.1f}s'}" for name, t in timings.items()
+        ),
+    )
 
-        data = yaml.safe_load(raw_yaml)
-    except Exception:
+    if timings["reflect"] is None:
         return False
-
-    new_facts: list[str] = data.get("new_memory_facts", []) or []
-    thought: str = (data.get("thought") or "").strip()
-
-    for fact in new_facts:
-        if fact and fact.strip():
-            append_to_memory("about the user", fact.strip())
-
-    if thought and stage >= 2:
-        append_thought(thought)
-
-    # --- Preoccupation: what Hikari is currently thinking about (not the user) ---
-    try:
-        preoc_messages = _build_preoccupation_prompt(episodes)
-        preoccupation = await chat_completion(preoc_messages, task="memory", temperature=0.8)
-        preoccupation = preoccupation.strip().strip('"').strip("'")
-        if preoccupation:
-            write_self_preoccupation(preoccupation)
-    except Exception:
-        pass  # non-critical
-
-    # --- Mood arc: synthesize emotional trajectory ---
-    try:
-        mood_data = read_mood_arc()
-        temperatures: list[str] = mood_data.get("recent_session_temperatures", [])
-        if temperatures:
-            arc_messages = _build_mood_arc_prompt(temperatures)
-            arc_raw = await chat_completion(arc_messages, task="memory", temperature=0.3)
-            arc_raw = arc_raw.strip()
-            if arc_raw.startswith("```"):
-                arc_raw = "\n".join(arc_raw.splitlines()[1:])
-            if arc_raw.endswith("```"):
-                arc_raw = "\n".join(arc_raw.splitlines()[:-1])
-            arc_data = yaml.safe_load(arc_raw)
-            arc = str(arc_data.get("arc", "stable")).strip()
-            arc_note = str(arc_data.get("note", "")).strip()
-            if arc in ("stable", "brightening", "darkening", "guarded") and arc_note:
-                write_mood_arc(arc, arc_note)
-    except Exception:
-        pass  # non-critical
-
-    prune_old_episodes(retention_days)
+    await run_io(prune_old_episodes, retention_days)
     return True
@@ -0,0 +1,241 @@
+"""In-process chat sessions: bounded per-user history with idle eviction.
+
+Each user's live conversation (history, ignore/false-start counters, rolling
+summary) is a Session held in a SessionStore. History is a bounded deque, and
+sessions idle past a TTL — or the least recently used ones once the store is
+over capacity — are spilled to disk and dropped from memory. The next message
+from that user restores the spilled session, so per-process memory follows the
+number of active users rather than everyone who has ever messaged the bot.
+
+On disk a session is a log of records (see Session.from_log): "msg" per message,
+"summary" per rolling-summary fold, and "snapshot" for a compacted full state.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import sys
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+# Rough per-message overhead on top of the content string (dict + role), for the gauge.
+_MESSAGE_OVERHEAD_BYTES = sys.getsizeof({"role": "", "content": ""})
+
+
+class Session:
+    """One user's live conversation state."""
+
+    __slots__ = (
+        "history",
+        "total_messages",
+        "session_turn_count",
+        "false_start_used",
+        "ignore_streak",
+        "ignore_cooldown",
+        "summary",
+        "summarized_upto",
+        "summary_task",
+        "last_active",
+    )
+
+    def __init__(self, max_history: int) -> None:
+        self.history: deque[dict[str, str]] = deque(maxlen=max_history)
+        self.total_messages = 0  # ever appended; history holds the newest of them
+        self.session_turn_count = 0
+        self.false_start_used = False
+        self.ignore_streak = 0
+        self.ignore_cooldown = 0
+        # Rolling summary of the first summarized_upto messages (counted like total_messages)
+        self.summary = ""
+        self.summarized_upto = 0
+        self.summary_task: asyncio.Task | None = None
+        self.last_active = time.monotonic()
+
+    def append(self, role: str, content: str) -> None:
+        self.history.append({"role": role, "content": content})
+        self.total_messages += 1
+        self.last_active = time.monotonic()
+
+    def messages(self, start: int = 0, stop: int | None = None) -> list[dict[str, str]]:
+        """Held history from message number start up to stop (counted like total_messages).
+
+        stop defaults to the newest. Messages already trimmed from history are skipped.
+        """
+        offset = self.total_messages - len(self.history)
+        end = None if stop is None else max(0, stop - offset)
+        return list(itertools.islice(self.history, max(0, start - offset), end))
+
+    def reset(self) -> None:
+        if self.summary_task is not None and not self.summary_task.done():
+            self.summary_task.cancel()
+        self.summary_task = None
+        self.summary = ""
+        self.summarized_upto = 0
+        self.history.clear()
+        self.total_messages = 0
+        self.session_turn_count = 0
+        self.false_start_used = False
+        self.ignore_streak = 0
+        self.ignore_cooldown = 0
+
+    def is_empty(self) -> bool:
+        return not self.history and not self.summary and not self.ignore_cooldown
+
+    def busy(self) -> bool:
+        return self.summary_task is not None and not self.summary_task.done()
+
+    def approx_bytes(self) -> int:
+        return sys.getsizeof(self) + sum(
+            _MESSAGE_OVERHEAD_BYTES + sys.getsizeof(m["content"]) for m in self.history
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "history": list(self.history),
+            "total_messages": self.total_messages,
+            "session_turn_count": self.session_turn_count,
+            "false_start_used": self.false_start_used,
+            "ignore_streak": self.ignore_streak,
+            "ignore_cooldown": self.ignore_cooldown,
+            "summary": self.summary,
+            "summarized_upto": self.summarized_upto,
+        }
+
+    @classmethod
+    def from_log(cls, records: list[dict[str, Any]], max_history: int) -> Session:
+        """Replay a session log: the last snapshot, then the records after it."""
+        sess = cls(max_history)
+        for record in records:
+            kind = record.get("k")
+            if kind == "snapshot":
+                sess = cls.from_dict(record, max_history)
+            elif kind == "msg":
+                sess.history.append({"role": record["role"], "content": record["content"]})
+                sess.total_messages += 1
+                sess.session_turn_count = int(record.get("turn", sess.session_turn_count))
+            elif kind == "summary":
+                sess.summary = str(record.get("text", ""))
+                sess.summarized_upto = int(record.get("upto", 0))
+        return sess
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any], max_history: int) -> Session:
+        sess = cls(max_history)
+        sess.history.extend(data.get("history", []))
+        sess.total_messages = max(int(data.get("total_messages", 0)), len(sess.history))
+        sess.session_turn_count = int(data.get("session_turn_count", 0))
+        sess.false_start_used = bool(data.get("false_start_used", False))
+        sess.ignore_streak = int(data.get("ignore_streak", 0))
+        sess.ignore_cooldown = int(data.get("ignore_cooldown", 0))
+        sess.summary = str(data.get("summary", ""))
+        sess.summarized_upto = int(data.get("summarized_upto", 0))
+        return sess
+
+
+class SessionStore:
+    """LRU map of user_id -> Session with TTL/capacity eviction through a spill hook.
+
+    restore(user_id) returns a saved session's log records (empty if there are none)
+    and spill(user_id, data) persists a session's to_dict(). Both are awaited, so
+    they can run off the loop; get() itself never touches the disk.
+    """
+
+    def __init__(
+        self,
+        max_history: int = 200,
+        max_sessions: int = 1000,
+        idle_seconds: float = 7200,
+        restore: Callable[[int], Awaitable[list[dict[str, Any]]]] | None = None,
+        spill: Callable[[int, dict[str, Any]], Awaitable[None]] | None = None,
+    ) -> None:
+        self.max_history = max_history
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._restore = restore
+        self._spill = spill
+        self._active: OrderedDict[int, Session] = OrderedDict()
+        self._spilling: dict[int, dict[str, Any]] = {}  # written out, write not finished yet
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._active
+
+    async def load(self, user_id: int) -> Session:
+        """Return the user's session, first restoring a saved one if it isn't in memory."""
+        if user_id not in self._active and user_id not in self._spilling and self._restore:
+            records = await self._restore(user_id)
+            if user_id not in self._active:  # nobody loaded it while we were reading
+                self._active[user_id] = Session.from_log(records, self.max_history)
+        return self.get(user_id)
+
+    def get(self, user_id: int) -> Session:
+        """Return the user's session from memory, or a fresh one.
+
+        A session saved to disk (after a restart or eviction) must be brought back
+        with load() first; get() won't read it.
+        """
+        sess = self._active.get(user_id)
+        if sess is not None:
+            self._active.move_to_end(user_id)
+            return sess
+        data = self._spilling.pop(user_id, None)
+        if data is not None:
+            sess = Session.from_dict(data, self.max_history)
+        else:
+            sess = Session(self.max_history)
+        self._active[user_id] = sess
+        return sess
+
+    def peek(self, user_id: int) -> Session | None:
+        return self._active.get(user_id)
+
+    def _victims(self, now: float) -> list[tuple[int, Session, float]]:
+        idle = [
+            uid
+            for uid, sess in self._active.items()
+            if now - sess.last_active >= self.idle_seconds and not sess.busy()
+        ]
+        overflow = len(self._active) - len(idle) - self.max_sessions
+        if overflow > 0:
+            skip = set(idle)
+            lru = (uid for uid, s in self._active.items() if uid not in skip and not s.busy())
+            idle.extend(itertools.islice(lru, overflow))
+        return [(uid, self._active[uid], self._active[uid].last_active) for uid in idle]
+
+    async def evict(self, now: float | None = None) -> int:
+        """Spill and drop idle and over-capacity sessions. Returns how many were dropped."""
+        dropped = 0
+        for uid, sess, seen_active in self._victims(time.monotonic() if now is None else now):
+            if self._active.get(uid) is not sess or sess.last_active != seen_active:
+                continue  # used again while an earlier spill was being written
+            del self._active[uid]
+            dropped += 1
+            if sess.is_empty() or self._spill is None:
+                continue
+            data = sess.to_dict()
+            self._spilling[uid] = data
+            try:
+                await self._spill(uid, data)
+            except Exception:
+                # Couldn't persist it: keep it in memory rather than lose the conversation
+                if self._spilling.pop(uid, None) is data:
+                    self._active[uid] = Session.from_dict(data, self.max_history)
+                    self._active.move_to_end(uid, last=False)
+                    dropped -= 1
+                continue
+            if self._spilling.get(uid) is data:
+                del self._spilling[uid]
+        return dropped
+
+    def stats(self) -> dict[str, int]:
+        """Memory gauge: active sessions, messages held and their approximate size."""
+        return {
+            "sessions": len(self._active),
+            "messages": sum(len(s.history) for s in self._active.values()),
+            "approx_bytes": sum(s.approx_bytes() for s in self._active.values()),
+        }
@@ -0,0 +1,356 @@
+"""Typed access to settings.yaml, parsed once and hot-reloaded when the file changes.
+
+get_settings() returns a frozen Settings snapshot. The file's mtime is checked
+at most once per second, so a hand edit (or /model) is picked up without a
+restart while a message only costs a clock read. Callers that need a change
+visible immediately call reload_settings().
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+_ROOT = Path(__file__).parent.parent
+SETTINGS_PATH = _ROOT / "settings.yaml"
+
+_RECHECK_SECONDS = 1.0
+
+
+# ---------------------------------------------------------------------------
+# Sections
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class PromptCacheSettings:
+    cache_control_models: tuple[str, ...] = ("anthropic/", "google/gemini")
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    base_url: str = "https://openrouter.ai/api/v1"
+    http2: bool = True
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60
+    connect_timeout: float = 10
+    # Read timeout (seconds) per LLM task; "default" covers tasks not listed
+    timeouts: dict = field(
+        default_factory=lambda: {"default": 60.0, "chat": 60.0, "memory": 120.0, "photo": 90.0}
+    )
+
+    def timeout_for(self, task: str) -> float:
+        return float(self.timeouts.get(task, self.timeouts.get("default", 60.0)))
+
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    max_concurrent: int = 8
+    per_model_concurrent: int = 4
+    background_concurrent: int = 2
+    requests_per_second: float = 2.0
+    burst: int = 6
+    # Background calls wait until no interactive call has started for this long...
+    background_idle_seconds: float = 30
+    # ...but never longer than this, so a busy chat can't starve consolidation
+    background_max_wait_seconds: float = 120
+
+
+@dataclass(frozen=True)
+class RetrySettings:
+    attempts_per_model: int = 2
+    backoff_base_seconds: float = 0.5
+    backoff_max_seconds: float = 8.0
+    # Overall deadline (seconds) per LLM task, across every retry and fallback model
+    deadlines: dict = field(
+        default_factory=lambda: {"default": 60.0, "chat": 45.0, "memory": 300.0}
+    )
+
+    def deadline_for(self, task: str) -> float:
+        return float(self.deadlines.get(task, self.deadlines.get("default", 60.0)))
+
+
+@dataclass(frozen=True)
+class HedgeSettings:
+    enabled: bool = False
+    tasks: tuple[str, ...] = ("chat",)
+    # Hedge once the primary has run longer than this percentile of recent latencies...
+    percentile: float = 90
+    window: int = 200
+    min_samples: int = 20
+    # ...or this many seconds until enough samples are in; never sooner than the floor
+    delay_seconds: float = 8.0
+    min_delay_seconds: float = 2.0
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    # Prometheus text file, relative to the repo root; empty disables writing it
+    file: str = "data/metrics.prom"
+    write_interval_seconds: float = 60
+
+
+@dataclass(frozen=True)
+class HeartbeatSettings:
+    min_interval_hours: float = 4
+    max_interval_hours: float = 8
+    quiet_start: str = "23:00"
+    quiet_end: str = "08:00"
+    skip_if_user_active_minutes: float = 60
+
+
+@dataclass(frozen=True)
+class SessionSettings:
+    timeout_minutes: float = 30
+    context_window_turns: int = 20
+    summarize_after_turns: int = 20
+    summary_keep_turns: int = 10
+    max_history_messages: int = 200
+    max_active_sessions: int = 1000
+    idle_evict_minutes: float = 120
+
+
+@dataclass(frozen=True)
+class TrustSettings:
+    progression_speed: str = "normal"
+    starting_stage: int = 0
+
+
+@dataclass(frozen=True)
+class MemorySettings:
+    backend: str = "markdown"
+    episode_retention_days: int = 30
+    reflection_hour: int = 9
+    heartbeat_flush_seconds: float = 30
+    io_workers: int = 4
+    facts_top_k: int = 5
+    recall_history_turns: int = 3
+
+
+@dataclass(frozen=True)
+class ResponseDelaySettings:
+    enabled: bool = False
+    base_seconds: float = 1.0
+    ms_per_char: float = 35
+    cap_seconds: float = 10.0
+    pre_indicator_pause: float = 0.5
+    mood_irritable_factor: float = 0.7
+    mood_tired_factor: float = 1.3
+    false_start_enabled: bool = True
+
+
+@dataclass(frozen=True)
+class StreamingSettings:
+    enabled: bool = True
+    edit_interval_seconds: float = 1.0
+
+
+@dataclass(frozen=True)
+class HeartbeatV2Settings:
+    reengagement_min_hours: float = 2
+    reengagement_max_hours: float = 6
+    followup_loop_after_hours: float = 24
+    context_aware_stage_threshold: int = 2
+
+
+@dataclass(frozen=True)
+class CharacterSettings:
+    japanese_words_enabled: bool = True
+    mood_enabled: bool = True
+
+
+@dataclass(frozen=True)
+class IgnoreSettings:
+    enabled: bool = True
+    max_streak: int = 3
+
+
+@dataclass(frozen=True)
+class TelegramSettings:
+    allowed_user_ids: tuple[int, ...] = ()
+
+
+@dataclass(frozen=True)
+class PhotoSettings:
+    enabled: bool = False
+    model: str = "black-forest-labs/flux.2-klein"
+    stage_threshold: int = 2
+    heartbeat_probability: float = 0.15
+    max_per_day: int = 2
+
+
+@dataclass(frozen=True)
+class StageSettings:
+    max_stage: int = 5
+
+
+_TRUE = frozenset({"true", "yes", "1"})
+_FALSE = frozenset({"false", "no", "0"})
+
+
+def _bool(raw: Any) -> bool:
+    """A YAML flag; quoted strings are parsed, so ``"false"`` stays False."""
+    if isinstance(raw, bool):
+        return raw
+    text = str(raw).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"invalid boolean: {raw!r}")
+
+
+# Annotation (as a string, thanks to postponed evaluation) -> converter for YAML values
+_COERCE: dict[str, Any] = {
+    "bool": _bool,
+    "int": int,
+    "float": float,
+    "str": str,
+    "tuple": tuple,
+    "dict": dict,
+}
+
+
+def _chain(raw: Any) -> tuple[str, ...]:
+    """A models: entry — one id or a list of them — as a fallback chain."""
+    if isinstance(raw, (list, tuple)):
+        return tuple(str(m) for m in raw if m)
+    return (str(raw),) if raw else ()
+
+
+def _section(cls: type, raw: Any) -> Any:
+    """Build a section dataclass from its YAML mapping, coercing scalars to the declared types.
+
+    Unknown keys are ignored and missing ones keep their defaults.
+    """
+    if not isinstance(raw, dict):
+        return cls()
+    kwargs: dict[str, Any] = {}
+    for f in fields(cls):
+        if f.name not in raw or raw[f.name] is None:
+            continue
+        convert = _COERCE.get(str(f.type).split("[")[0], lambda v: v)
+        kwargs[f.name] = convert(raw[f.name])
+    return cls(**kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Settings:
+    """One parsed snapshot of settings.yaml."""
+
+    models: dict[str, tuple[str, ...]] = field(default_factory=dict)  # task -> fallback chain
+    prompt_cache: PromptCacheSettings = field(default_factory=PromptCacheSettings)
+    budget: dict[str, Any] = field(default_factory=dict)  # parsed per model by budget.budget_for
+    http: HttpSettings = field(default_factory=HttpSettings)
+    scheduler: SchedulerSettings = field(default_factory=SchedulerSettings)
+    retry: RetrySettings = field(default_factory=RetrySettings)
+    hedge: HedgeSettings = field(default_factory=HedgeSettings)
+    metrics: MetricsSettings = field(default_factory=MetricsSettings)
+    heartbeat: HeartbeatSettings = field(default_factory=HeartbeatSettings)
+    session: SessionSettings = field(default_factory=SessionSettings)
+    trust: TrustSettings = field(default_factory=TrustSettings)
+    memory: MemorySettings = field(default_factory=MemorySettings)
+    response_delay: ResponseDelaySettings = field(default_factory=ResponseDelaySettings)
+    streaming: StreamingSettings = field(default_factory=StreamingSettings)
+    heartbeat_v2: HeartbeatV2Settings = field(default_factory=HeartbeatV2Settings)
+    character: CharacterSettings = field(default_factory=CharacterSettings)
+    ignore: IgnoreSettings = field(default_factory=IgnoreSettings)
+    telegram: TelegramSettings = field(default_factory=TelegramSettings)
+    photo: PhotoSettings = field(default_factory=PhotoSettings)
+    stages: StageSettings = field(default_factory=StageSettings)
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any] | None) -> Settings:
+        raw = raw or {}
+        return cls(
+            models={str(k): _chain(v) for k, v in (raw.get("models") or {}).items()},
+            prompt_cache=_section(PromptCacheSettings, raw.get("prompt_cache")),
+            budget=dict(raw.get("budget") or {}),
+            http=_section(HttpSettings, raw.get("http")),
+            scheduler=_section(SchedulerSettings, raw.get("scheduler")),
+            retry=_section(RetrySettings, raw.get("retry")),
+            hedge=_section(HedgeSettings, raw.get("hedge")),
+            metrics=_section(MetricsSettings, raw.get("metrics")),
+            heartbeat=_section(HeartbeatSettings, raw.get("heartbeat")),
+            session=_section(SessionSettings, raw.get("session")),
+            trust=_section(TrustSettings, raw.get("trust")),
+            memory=_section(MemorySettings, raw.get("memory")),
+            response_delay=_section(ResponseDelaySettings, raw.get("response_delay")),
+            streaming=_section(StreamingSettings, raw.get("streaming")),
+            heartbeat_v2=_section(HeartbeatV2Settings, raw.get("heartbeat_v2")),
+            character=_section(CharacterSettings, raw.get("character")),
+            ignore=_section(IgnoreSettings, raw.get("ignore")),
+            telegram=_section(TelegramSettings, raw.get("telegram")),
+            photo=_section(PhotoSettings, raw.get("photo")),
+            stages=_section(StageSettings, raw.get("stages")),
+        )
+
+    def model_for(self, task: str) -> str:
+        """Primary model id for a task, falling back to the chat model."""
+        return self.models_for(task)[0]
+
+    def models_for(self, task: str) -> tuple[str, ...]:
+        """The task's model followed by its fallbacks, in the order they're tried."""
+        return self.models.get(task) or self.models.get("chat") or ("openai/gpt-4o-mini",)
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_cached: Settings | None = None
+_cached_mtime_ns: int | None = None
+_checked_at = 0.0
+
+
+def _mtime_ns() -> int | None:
+    try:
+        return SETTINGS_PATH.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _parse() -> Settings:
+    try:
+        with open(SETTINGS_PATH) as f:
+            return Settings.from_dict(yaml.safe_load(f))
+    except OSError:
+        return Settings()
+
+
+def get_settings() -> Settings:
+    """Current settings; re-parsed only when settings.yaml's mtime has changed."""
+    global _cached, _cached_mtime_ns, _checked_at
+    now = time.monotonic()
+    cached = _cached
+    if cached is not None and now - _checked_at < _RECHECK_SECONDS:
+        return cached
+    with _lock:
+        mtime = _mtime_ns()
+        if _cached is None or mtime != _cached_mtime_ns:
+            _cached = _parse()
+            _cached_mtime_ns = mtime
+        _checked_at = now
+        return _cached
+
+
+def reload_settings() -> Settings:
+    """Re-parse settings.yaml now, regardless of mtime."""
+    global _cached, _cached_mtime_ns, _checked_at
+    with _lock:
+        _cached = _parse()
+        _cached_mtime_ns = _mtime_ns()
+        _checked_at = time.monotonic()
+        return _cached
@@ -0,0 +1 @@
+"""Test-support code shared by tests and benchmarks (not collected as tests)."""
@@ -0,0 +1,432 @@
+"""A local stand-in for OpenRouter, for offline end-to-end and load tests.
+
+FakeOpenRouter is an ASGI app serving POST /api/v1/chat/completions (plain and
+SSE-streamed) and POST /api/v1/images/generations. It has a lognormal latency
+model, injected faults (429 with Retry-After, 5xx, requests that never answer)
+and scripted replies from openrouter_script.yaml, so consolidation and reflection
+get YAML they can parse. serve() runs it on a small stdlib HTTP/1.1 server, so
+no ASGI server is needed:
+
+    python -m tests.support.fake_openrouter --port 8090 --median-ms 800 --error-rate 0.05
+
+then start the bot with OPENROUTER_BASE_URL=http://127.0.0.1:8090/api/v1.
+In-process, httpx.ASGITransport(app=FakeOpenRouter()) works too, but it buffers
+responses, so streamed text arrives all at once.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import re
+import struct
+import time
+import zlib
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+_SCRIPT_PATH = Path(__file__).with_name("openrouter_script.yaml")
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+# ---------------------------------------------------------------------------
+# Behaviour
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Latency:
+    """Time to first token, lognormal around median_ms (sigma 0 makes it fixed)."""
+
+    median_ms: float = 0.0
+    sigma: float = 0.0
+    token_ms: float = 0.0  # gap between streamed chunks
+
+    def first_token(self, rng: random.Random) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * math.exp(rng.gauss(0, self.sigma) if self.sigma else 0) / 1000
+
+
+@dataclass
+class Faults:
+    """Probability per request of each injected failure."""
+
+    rate_limited: float = 0.0  # 429 with Retry-After
+    server_error: float = 0.0  # 502 or 503
+    timeout: float = 0.0  # never answers (for hang_seconds)
+    retry_after: float = 1.0
+    hang_seconds: float = 120.0
+    broken_models: tuple[str, ...] = ()  # always 503, to exercise fallback chains
+
+    def pick(self, model: str, rng: random.Random) -> str | None:
+        if model in self.broken_models:
+            return "server_error"
+        roll = rng.random()
+        for kind in ("rate_limited", "server_error", "timeout"):
+            roll -= getattr(self, kind)
+            if roll < 0:
+                return kind
+        return None
+
+
+@dataclass
+class Script:
+    """Canned replies: the first rule matching the system prompt, else a chat line."""
+
+    rules: list[tuple[str, str]] = field(default_factory=list)
+    chat: list[str] = field(default_factory=lambda: ["whatever."])
+
+    @classmethod
+    def load(cls, path: Path = _SCRIPT_PATH) -> Script:
+        raw = yaml.safe_load(path.read_text()) or {}
+        rules = [(r["match"], str(r["response"])) for r in raw.get("rules", [])]
+        return cls(rules=rules, chat=[str(line) for line in raw.get("chat", [])] or ["..."])
+
+    def reply(self, messages: list[dict[str, Any]], rng: random.Random) -> str:
+        system = "\n".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+        for match, response in self.rules:
+            if match in system:
+                return response
+        return rng.choice(self.chat)
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+
+def _tiny_png() -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(b"\x00\xff\xb6\xc1")
+    return (
+        b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+    )
+
+
+_PNG_B64 = base64.b64encode(_tiny_png()).decode()
+
+
+# ---------------------------------------------------------------------------
+# ASGI app
+# ---------------------------------------------------------------------------
+
+
+class FakeOpenRouter:
+    """ASGI app imitating the parts of OpenRouter the bot uses."""
+
+    def __init__(
+        self,
+        latency: Latency | None = None,
+        faults: Faults | None = None,
+        script: Script | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self.latency = latency or Latency()
+        self.faults = faults or Faults()
+        self.script = script or Script.load()
+        self.rng = random.Random(seed)
+        self.outcomes: Counter[str] = Counter()  # "ok", "stream", "images", "429", ...
+        self.models: Counter[str] = Counter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            while (message := await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        route = (scope["method"], scope["path"])
+        if route == ("POST", "/api/v1/chat/completions"):
+            await self._completions(json.loads(body or b"{}"), send)
+        elif route == ("POST", "/api/v1/images/generations"):
+            await self._images(json.loads(body or b"{}"), send)
+        else:
+            await _json(send, 404, {"error": {"code": 404, "message": "not found"}})
+
+    async def _fault(self, model: str, send: Send) -> bool:
+        """Play an injected failure, if this request drew one."""
+        kind = self.faults.pick(model, self.rng)
+        if kind is None:
+            return False
+        if kind == "timeout":
+            self.outcomes["timeout"] += 1
+            await asyncio.sleep(self.faults.hang_seconds)
+            await _json(send, 504, {"error": {"code": 504, "message": "upstream timed out"}})
+        elif kind == "rate_limited":
+            self.outcomes["429"] += 1
+            headers = [(b"retry-after", str(self.faults.retry_after).encode())]
+            await _json(send, 429, {"error": {"code": 429, "message": "rate limited"}}, headers)
+        else:
+            status = self.rng.choice((502, 503))
+            self.outcomes[str(status)] += 1
+            await _json(send, status, {"error": {"code": status, "message": "provider down"}})
+        return True
+
+    async def _completions(self, request: dict[str, Any], send: Send) -> None:
+        model = str(request.get("model", ""))
+        self.models[model] += 1
+        if await self._fault(model, send):
+            return
+        messages = request.get("messages", [])
+        text = self.script.reply(messages, self.rng)
+        usage = _usage(messages, text)
+        if request.get("stream"):
+            await self._stream(model, text, usage, send)
+            return
+        await asyncio.sleep(self.latency.first_token(self.rng) + self._stream_time(text))
+        self.outcomes["ok"] += 1
+        await _json(send, 200, _completion(model, text, usage))
+
+    async def _stream(self, model: str, text: str, usage: dict[str, Any], send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            }
+        )
+        # OpenRouter sends comment lines while the model is still thinking
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b": OPENROUTER PROCESSING\n\n",
+                "more_body": True,
+            }
+        )
+        await asyncio.sleep(self.latency.first_token(self.rng))
+        for i, piece in enumerate(re.findall(r"\s*\S+", text)):
+            if i and self.latency.token_ms:
+                await asyncio.sleep(self.latency.token_ms / 1000)
+            chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}
+            await send({"type": "http.response.body", "body": _sse(chunk), "more_body": True})
+        # With usage accounting on, the last chunk carries usage and no choices
+        chunk = {"model": model, "choices": [], "usage": usage}
+        await send({"type": "http.response.body", "body": _sse(chunk), "more_body": True})
+        self.outcomes["stream"] += 1
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+    def _stream_time(self, text: str) -> float:
+        return len(re.findall(r"\S+", text)) * self.latency.token_ms / 1000
+
+    async def _images(self, request: dict[str, Any], send: Send) -> None:
+        model = str(request.get("model", ""))
+        self.models[model] += 1
+        if await self._fault(model, send):
+            return
+        await asyncio.sleep(self.latency.first_token(self.rng))
+        self.outcomes["images"] += 1
+        await _json(send, 200, {"created": int(time.time()), "data": [{"b64_json": _PNG_B64}]})
+
+
+def _usage(messages: list[dict[str, Any]], text: str) -> dict[str, Any]:
+    """Rough token counts (about 4 characters a token) and a made-up price."""
+    prompt = sum(len(json.dumps(m.get("content", ""))) for m in messages) // 4
+    completion = max(1, len(text) // 4)
+    cost = (prompt * 0.25 + completion * 1.0) / 1_000_000
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "cost": cost}
+
+
+def _completion(model: str, text: str, usage: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": f"gen-{time.time_ns()}",
+        "object": "chat.completion",
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": usage,
+    }
+
+
+def _sse(data: dict[str, Any]) -> bytes:
+    return f"data: {json.dumps(data)}\n\n".encode()
+
+
+async def _json(
+    send: Send, status: int, data: dict[str, Any], headers: list[tuple[bytes, bytes]] = ()
+) -> None:
+    body = json.dumps(data).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+# ---------------------------------------------------------------------------
+# Minimal HTTP/1.1 server
+# ---------------------------------------------------------------------------
+
+
+async def serve(app: Callable[..., Awaitable[None]], host: str = "127.0.0.1", port: int = 0):
+    """Serve an ASGI app over HTTP/1.1 with keep-alive (chunked when no Content-Length).
+
+    Returns the started asyncio.Server; see base_url().
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while await _serve_one(app, reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def base_url(server: asyncio.Server) -> str:
+    host, port = server.sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}/api/v1"
+
+
+async def _serve_one(app, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+    """Handle one request on the connection; False once the connection should close."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return False
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers: list[tuple[bytes, bytes]] = []
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers.append((name.strip().lower().encode(), value.strip().encode()))
+    header_map = dict(headers)
+    length = int(header_map.get(b"content-length", b"0"))
+    body = await reader.readexactly(length) if length else b""
+    path, _, query = target.partition("?")
+
+    delivered = False
+    disconnected = asyncio.Event()
+
+    async def receive() -> dict[str, Any]:
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    chunked = False
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal chunked
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            out = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}".encode()]
+            response_headers = list(message.get("headers", []))
+            chunked = not any(k.lower() == b"content-length" for k, _ in response_headers)
+            if chunked:
+                response_headers.append((b"transfer-encoding", b"chunked"))
+            out += [k + b": " + v for k, v in response_headers]
+            writer.write(b"\r\n".join(out) + b"\r\n\r\n")
+        elif message["type"] == "http.response.body":
+            data = message.get("body", b"")
+            if chunked:
+                if data:
+                    writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                if not message.get("more_body"):
+                    writer.write(b"0\r\n\r\n")
+            else:
+                writer.write(data)
+            await writer.drain()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "server": writer.get_extra_info("sockname")[:2],
+        "client": writer.get_extra_info("peername")[:2],
+    }
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnected.set()
+    return header_map.get(b"connection", b"").lower() != b"close"
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local OpenRouter stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--median-ms", type=float, default=800, help="median time to first token")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal spread")
+    parser.add_argument("--token-ms", type=float, default=20, help="gap between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 429/5xx replies")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share never answered")
+    parser.add_argument("--script", type=Path, default=_SCRIPT_PATH)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    app = FakeOpenRouter(
+        latency=Latency(args.median_ms, args.sigma, args.token_ms),
+        faults=Faults(
+            rate_limited=args.error_rate / 2,
+            server_error=args.error_rate / 2,
+            timeout=args.timeout_rate,
+        ),
+        script=Script.load(args.script),
+        seed=args.seed,
+    )
+
+    async def run() -> None:
+        server = await serve(app, args.host, args.port)
+        print(f"fake OpenRouter at {base_url(server)}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
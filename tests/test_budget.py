@@ -0,0 +1,90 @@
+"""Token budget tests."""
+
+from __future__ import annotations
+
+from bot.budget import (
+    REQUIRED,
+    Budget,
+    PromptSection,
+    budget_for,
+    estimate_tokens,
+    fit_history,
+    message_tokens,
+    pack,
+    trim_to_tokens,
+)
+from bot.settings import Settings
+
+
+def test_estimate_tokens_is_cached():
+    estimate_tokens.cache_clear()
+    text = "she checked the citation twice. " * 20
+    assert estimate_tokens(text) == estimate_tokens(text) > 0
+    assert estimate_tokens.cache_info().hits >= 1
+
+
+def test_trim_to_tokens_keeps_leading_lines():
+    text = "\n".join(f"line {i:03d} of memory" for i in range(100))
+    trimmed = trim_to_tokens(text, 20)
+    assert text.startswith(trimmed)
+    assert estimate_tokens(trimmed) <= 20
+
+
+def test_pack_drops_lowest_priority_first():
+    sections = [
+        PromptSection("soul", "S" * 400, REQUIRED),
+        PromptSection("facts", "F" * 200, 60),
+        PromptSection("lore", "L" * 200, 10),
+    ]
+    out = pack(sections, max_tokens=160)
+    assert "F" * 200 in out and "L" not in out
+    # REQUIRED sections survive even when they alone exceed the budget
+    assert pack(sections, max_tokens=10) == "S" * 400
+
+
+def test_pack_trims_trimmable_sections_and_applies_allowances():
+    memory = "\n".join(f"memory line {i}" for i in range(50))
+    sections = [
+        PromptSection("head", "H" * 40, REQUIRED),
+        PromptSection("long_term_memory", memory, 50, trimmable=True),
+    ]
+    out = pack(sections, max_tokens=60)
+    assert out.startswith("H" * 40 + "\nmemory line 0")
+    assert estimate_tokens(out) <= 61
+
+    capped = pack(sections, 10_000, Budget(allowances={"long_term_memory": 12}))
+    assert "memory line 49" not in capped
+
+
+def test_fit_history_keeps_newest():
+    history = [{"role": "user", "content": f"message {i} " * 10} for i in range(20)]
+    kept = fit_history(history, max_tokens=100)
+    assert kept and kept[-1] is history[-1]
+    assert len(kept) < len(history)
+
+
+def test_fit_history_trims_an_oversized_newest_message():
+    history = [
+        {"role": "assistant", "content": "hm."},
+        {"role": "user", "content": "a" * 100000},
+    ]
+    kept = fit_history(history, max_tokens=4000)
+    assert [m["role"] for m in kept] == ["user"]
+    assert 0 < len(kept[0]["content"]) < 100000
+    assert sum(message_tokens(m) for m in kept) <= 4000
+
+
+def test_budget_for_model_overrides():
+    settings = Settings.from_dict(
+        {
+            "budget": {
+                "default": {"prefix_tokens": 5000, "history_tokens": 3000},
+                "models": {"big/model": {"history_tokens": 20000, "allowances": {"lore": 50}}},
+                "allowances": {"known_facts": 800},
+            }
+        }
+    )
+    budget = budget_for("big/model", settings)
+    assert budget.prefix_tokens == 5000 and budget.history_tokens == 20000
+    assert budget.allowances == {"known_facts": 800, "lore": 50}
+    assert budget_for("other/model", settings).history_tokens == 3000
@@ -116,6 +116,32 @@ def test_identity_mentions_competence():
     ), "IDENTITY.md should mention her competence area"
 
 
+def test_character_assets_cached_and_reloaded(monkeypatch, tmp_path):
+    import bot.character as character
+
+    soul = tmp_path / "SOUL.md"
+    soul.write_text("first soul", encoding="utf-8")
+    monkeypatch.setattr(character, "SOUL_MD", soul)
+    monkeypatch.setattr(character, "_assets", None)
+    assert character.get_assets().soul == "first soul"
+
+    soul.write_text("second soul, longer", encoding="utf-8")
+    assert character.get_assets().soul == "first soul"  # within the poll interval
+    monkeypatch.setattr(character, "_checked_at", 0.0)
+    assert character.get_assets().soul == "second soul, longer"  # mtime/size changed
+
+    soul.write_text("third soul, longest", encoding="utf-8")
+    character.request_reload()
+    assert character.get_assets().soul == "third soul, longest"
+
+
+def test_lore_items_pre_split():
+    from bot.character import get_assets
+
+    items = get_assets().lore_items
+    assert items and all(not item.startswith("- ") for item in items)
+
+
 # ---------------------------------------------------------------------------
 # Response quality checks (utility functions only, no LLM)
 # ---------------------------------------------------------------------------
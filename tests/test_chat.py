@@ -0,0 +1,218 @@
+"""Prompt assembly tests — PromptContext loading and system prompt layout."""
+
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(monkeypatch, tmp_path):
+    """Fresh per-user data tree for user 0 under tmp_path."""
+    import bot.memory as mem
+
+    monkeypatch.setattr(mem, "_BASE_DATA_DIR", tmp_path)
+    mem.set_current_user(0)
+    mem.init_user_data(0)
+    yield tmp_path
+
+
+async def test_prompt_context_loads_user_state():
+    import bot.memory as mem
+    from bot.chat import load_prompt_context
+
+    mem.set_trust_stage(2)
+    mem.add_known_fact("has a cat named miso")
+    mem.add_open_loop("exam on friday")
+    mem.write_episode("# s\n\n## carry_over\nthey were tired.\n")
+
+    ctx = await load_prompt_context(0)
+    assert ctx.stage == 2
+    assert "exam on friday" in ctx.open_loops
+    assert "has a cat named miso" in [f["text"] for f in ctx.facts_with_age]
+    assert ctx.carry_over == "they were tired."
+
+
+async def test_build_system_prompt_reads_only_the_context(monkeypatch):
+    import bot.memory as mem
+    from bot.chat import build_system_prompt, load_prompt_context
+
+    mem.add_known_fact("plays the bass")
+    ctx = await load_prompt_context(0)
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError("prompt assembly touched a memory file")
+
+    monkeypatch.setattr(mem, "read_file", no_reads)
+    prompt = build_system_prompt(ctx)
+    assert "plays the bass" in prompt
+    assert "## current trust stage" in prompt
+
+
+async def test_stable_prefix_identical_across_turns(monkeypatch):
+    import random
+
+    import bot.chat as chat
+    import bot.memory as mem
+
+    mem.set_trust_stage(3)
+    mem.add_known_fact("likes rainy days")
+    mem.write_self_preoccupation("a paper that cites the wrong thing")
+    mem.write_episode("# s\n\n## carry_over\nshe was softer.\n")
+
+    prefixes, suffixes = set(), set()
+    for turn, seed in enumerate((1, 2, 3, 4)):
+        random.seed(seed)  # different lore samples and dice rolls each turn
+        chat._session(0).session_turn_count = turn
+        stable, volatile = chat.build_prompt_blocks(await chat.load_prompt_context(0))
+        prefixes.add(stable.encode("utf-8"))
+        suffixes.add(volatile)
+    assert len(prefixes) == 1
+    assert len(suffixes) > 1
+    chat.clear_history(0)
+
+
+def test_cache_hints_only_for_supporting_models():
+    from bot.llm import prepare_messages, system_message
+
+    messages = [system_message("STABLE", "VOLATILE"), {"role": "user", "content": "hi"}]
+    hinted = prepare_messages(messages, "anthropic/claude-sonnet-4")
+    assert hinted[0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+
+    plain = prepare_messages(messages, "deepseek/deepseek-v3.2")
+    assert plain[0]["content"] == "STABLE\nVOLATILE"
+    assert plain[1] == {"role": "user", "content": "hi"}
+
+
+async def test_old_turns_fold_into_running_summary(monkeypatch):
+    import bot.chat as chat
+
+    seen = []
+
+    async def fake_completion(messages, task="chat", temperature=0.85):
+        seen.append(messages[-1]["content"])
+        return "they talked about the exam."
+
+    monkeypatch.setattr(chat, "chat_completion", fake_completion)
+    monkeypatch.setattr(chat, "_summary_settings", lambda: (3, 1))
+    for i in range(4):
+        chat.add_to_history(0, "user", f"question {i}")
+        chat.add_to_history(0, "assistant", f"answer {i}")
+
+    await chat.schedule_summary(0)
+    assert "question 0" in seen[0] and "question 3" not in seen[0]
+    assert chat.get_session_summary(0) == "they talked about the exam."
+    assert [m["content"] for m in chat.get_history(0)] == ["question 3", "answer 3"]
+
+    ctx = await chat.load_prompt_context(0)
+    _, volatile = chat.build_prompt_blocks(ctx)
+    assert "## earlier in this conversation\nthey talked about the exam." in volatile
+
+    chat.clear_history(0)
+    assert chat.get_session_summary(0) == "" and chat.get_unsummarized_history(0) == []
+
+
+async def test_summary_fold_after_history_was_trimmed(monkeypatch):
+    import bot.chat as chat
+
+    seen = []
+
+    async def fake_completion(messages, task="chat", temperature=0.85):
+        seen.append(messages[-1]["content"])
+        return "they talked about the exam."
+
+    monkeypatch.setattr(chat, "chat_completion", fake_completion)
+    monkeypatch.setattr(chat, "_summary_settings", lambda: (3, 1))
+    monkeypatch.setattr(chat._sessions, "max_history", 6)
+    for i in range(4):  # 8 messages; the first two fall out of history
+        chat.add_to_history(42, "user", f"question {i}")
+        chat.add_to_history(42, "assistant", f"answer {i}")
+
+    await chat.schedule_summary(42)
+    assert "question 1" in seen[0] and "answer 2" in seen[0]
+    assert "question 3" not in seen[0]  # kept verbatim, so not summarized too
+    assert [m["content"] for m in chat.get_unsummarized_history(42)] == ["question 3", "answer 3"]
+
+
+def test_known_facts_allowance_keeps_the_hedging_line():
+    import bot.chat as chat
+    from bot.budget import Budget, estimate_tokens
+    from bot.memory import get_facts_with_age
+
+    facts = [f"[2025-01-{d:02d}] mentioned a thing about topic number {d}" for d in range(1, 29)]
+    ctx = chat.PromptContext(
+        user_id=0,
+        stage=1,
+        mood="focused",
+        user_state={"name": "unknown", "open_loops": []},
+        facts_with_age=get_facts_with_age(facts),
+        heartbeat={},
+    )
+    budget = Budget(prefix_tokens=10**6, suffix_tokens=10**6, allowances={"known_facts": 80})
+    _, volatile = chat.build_prompt_blocks(ctx, budget)
+    section = volatile[volatile.index("## known facts about the user") :]
+    section = section[: section.index("not 'you said...')") + len("not 'you said...')")]
+    assert "topic number 1" in section and "topic number 28" not in section
+    assert estimate_tokens(section) <= 80
+
+
+def test_consolidation_prompt_starts_from_summary():
+    from bot.consolidate import _build_consolidation_prompt
+
+    prompt = _build_consolidation_prompt(
+        [{"role": "user", "content": "ok bye"}], earlier="they argued about tea."
+    )
+    text = prompt[-1]["content"]
+    assert text.index("they argued about tea.") < text.index("USER: ok bye")
+
+
+async def test_sessions_survive_a_restart(monkeypatch):
+    import bot.chat as chat
+    import bot.memory as mem
+
+    chat.add_to_history(0, "user", "did you read it?")
+    chat.add_to_history(0, "assistant", "obviously.")
+    mem.shutdown_io()  # wait for the queued log writes
+
+    monkeypatch.setattr(chat, "_sessions", chat._new_store())  # a fresh process
+    await chat.load_session(0)
+    assert [m["content"] for m in chat.get_history(0)] == ["did you read it?", "obviously."]
+    assert list(mem.list_session_logs()) == [0]
+
+    chat.clear_history(0)
+    mem.shutdown_io()
+    assert mem.list_session_logs() == {}
+
+
+async def test_broken_stream_keeps_what_was_shown(monkeypatch):
+    import bot.chat as chat
+
+    async def fake_stream(messages, task="chat", temperature=0.85):
+        yield "wait. "
+        raise RuntimeError("connection dropped")
+
+    monkeypatch.setattr(chat, "chat_completion_stream", fake_stream)
+    chat.clear_history(0)
+    seen = []
+    with pytest.raises(RuntimeError):
+        async for delta in chat.respond_stream("you there?", user_id=0):
+            seen.append(delta)
+    assert seen == ["wait. "]
+    assert [m["content"] for m in chat.get_history(0)] == ["you there?", "wait."]
+
+
+async def test_failed_consolidation_keeps_the_session(monkeypatch):
+    import bot.chat as chat
+    import bot.consolidate as consolidate
+
+    async def down(messages, task="chat", temperature=0.85):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(consolidate, "chat_completion", down)
+    chat.clear_history(0)
+    for i in range(2):
+        chat._session(0).session_turn_count += 1
+        chat.add_to_history(0, "user", f"question {i}")
+        chat.add_to_history(0, "assistant", f"answer {i}")
+
+    assert await consolidate.run_consolidation(0) is False
+    assert len(chat.get_history(0)) == 4
@@ -0,0 +1,92 @@
+"""End-to-end tests against the local OpenRouter stand-in (tests/support)."""
+
+from __future__ import annotations
+
+import pytest
+
+from bot import llm
+from tests.support.fake_openrouter import FakeOpenRouter, Faults, base_url, serve
+
+
+@pytest.fixture
+async def fake_openrouter(monkeypatch, tmp_path):
+    import bot.memory as mem
+
+    monkeypatch.setattr(mem, "_BASE_DATA_DIR", tmp_path)
+    mem.set_current_user(0)
+    mem.init_user_data(0)
+
+    app = FakeOpenRouter(seed=0)
+    server = await serve(app)
+    monkeypatch.setenv("OPENROUTER_BASE_URL", base_url(server))
+    monkeypatch.setenv("OPENROUTER_API_KEY", "offline")
+    yield app
+    await llm.aclose_client()
+    server.close()
+    await server.wait_closed()
+
+
+async def test_streamed_turn_falls_back_past_a_broken_model(fake_openrouter):
+    import bot.chat as chat
+
+    primary, fallback = llm.get_settings().models_for("chat")[:2]
+    fake_openrouter.faults = Faults(broken_models=(primary,))
+    chat.clear_history(0)
+
+    reply = "".join([d async for d in chat.respond_stream("hey", user_id=0)])
+    assert reply.strip() in {line.strip() for line in fake_openrouter.script.chat}
+    assert fake_openrouter.models[fallback] == 1 and fake_openrouter.outcomes["stream"] == 1
+    assert chat.get_history(0)[-1] == {"role": "assistant", "content": reply.strip()}
+
+
+async def test_consolidation_writes_the_scripted_session(fake_openrouter):
+    import bot.chat as chat
+    from bot.consolidate import run_consolidation
+    from bot.memory import get_user_state
+
+    chat.clear_history(0)
+    for text in ("my chemistry exam is tomorrow", "and my cat knocked my coffee over"):
+        chat._session(0).session_turn_count += 1
+        chat.add_to_history(0, "user", text)
+        chat.add_to_history(0, "assistant", "hm.")
+
+    assert await run_consolidation(0) is True
+    facts = get_user_state()["known_facts"]
+    assert any(fact.endswith("has a chemistry exam coming up") for fact in facts)
+    assert chat.get_history(0) == []
+
+
+def _seed_reflection_inputs() -> None:
+    from datetime import date
+
+    import bot.memory as mem
+
+    mem.write_episode("they were stressed about a chemistry exam. the cat knocked coffee over.")
+    for temperature in ("neutral", "warm", "warm"):
+        mem.append_session_temperature(date.today(), temperature)
+
+
+async def test_reflection_runs_every_stage(fake_openrouter):
+    import bot.memory as mem
+    from bot.reflect import run_reflection
+
+    _seed_reflection_inputs()
+    assert await run_reflection(0) is True
+    assert "studies chemistry" in mem.read_memory()
+    assert mem.get_self_preoccupation().startswith("the build keeps failing")
+    assert mem.read_mood_arc()["current_arc"] == "brightening"
+    assert fake_openrouter.outcomes["ok"] == 3
+
+
+async def test_a_failed_reflection_stage_leaves_the_others(fake_openrouter, monkeypatch):
+    import bot.memory as mem
+    import bot.reflect as reflect
+
+    def broken(thought: str) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(reflect, "write_self_preoccupation", broken)
+    _seed_reflection_inputs()
+    assert await reflect.run_reflection(0) is True
+    assert "studies chemistry" in mem.read_memory()
+    assert mem.read_mood_arc()["current_arc"] == "brightening"
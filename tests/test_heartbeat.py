@@ -7,22 +7,25 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from bot.character import parse_heartbeat_templates
 from bot.heartbeat import (
-    _extract_templates,
     _is_quiet_hours,
     pick_excuse,
     should_send_heartbeat,
 )
-
-SAMPLE_SETTINGS = {
-    "heartbeat": {
-        "min_interval_hours": 4,
-        "max_interval_hours": 8,
-        "quiet_start": "23:00",
-        "quiet_end": "08:00",
-        "skip_if_user_active_minutes": 60,
+from bot.settings import Settings
+
+SAMPLE_SETTINGS = Settings.from_dict(
+    {
+        "heartbeat": {
+            "min_interval_hours": 4,
+            "max_interval_hours": 8,
+            "quiet_start": "23:00",
+            "quiet_end": "08:00",
+            "skip_if_user_active_minutes": 60,
+        }
     }
-}
+)
 
 
 # ---------------------------------------------------------------------------
@@ -162,15 +165,15 @@ SAMPLE_TEMPLATES = """## templates
 """
 
 
-def test_extract_templates():
-    templates = _extract_templates(SAMPLE_TEMPLATES)
+def test_parse_heartbeat_templates():
+    templates = parse_heartbeat_templates(SAMPLE_TEMPLATES)
     assert len(templates) == 5
     assert templates[0] == (1, "testing notifications. yours worked. congrats.")
     assert templates[1] == (2, "you went quiet. suspicious.")
 
 
 def test_extract_templates_empty():
-    assert _extract_templates("no templates here") == []
+    assert parse_heartbeat_templates("no templates here") == []
 
 
 # ---------------------------------------------------------------------------
@@ -213,8 +216,8 @@ async def test_run_heartbeat_sends_when_conditions_met():
     with (
         patch("bot.heartbeat.should_send_heartbeat", return_value=True),
         patch(
-            "bot.heartbeat.read_heartbeat_templates",
-            return_value=SAMPLE_TEMPLATES,
+            "bot.heartbeat.heartbeat_templates",
+            return_value=parse_heartbeat_templates(SAMPLE_TEMPLATES),
         ),
         patch("bot.heartbeat.get_heartbeat_state", return_value=_make_state()),
         patch("bot.heartbeat.get_trust_stage", return_value=0),
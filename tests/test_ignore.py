@@ -11,6 +11,7 @@ from bot.chat import (
     reset_ignore_streak,
     tick_ignore_cooldown,
 )
+from bot.settings import Settings
 
 
 def setup_function():
@@ -63,7 +64,7 @@ def test_tick_ignore_cooldown_no_underflow():
     assert not is_ignore_cooldown()
     tick_ignore_cooldown()
     assert not is_ignore_cooldown()
-    assert chat_module._sessions.get(0, {}).get("ignore_cooldown", 0) == 0
+    assert chat_module._session(0).ignore_cooldown == 0
 
 
 def test_clear_history_resets_ignore_state():
@@ -83,14 +84,14 @@ def test_clear_history_resets_ignore_state():
 def test_should_ignore_disabled_by_settings():
     from bot.handlers import _should_ignore
 
-    settings = {"ignore": {"enabled": False, "max_streak": 3}}
+    settings = Settings.from_dict({"ignore": {"enabled": False, "max_streak": 3}})
     assert not _should_ignore("irritable", 0, settings)
 
 
 def test_should_ignore_respects_cooldown():
     from bot.handlers import _should_ignore
 
-    settings = {"ignore": {"enabled": True, "max_streak": 3}}
+    settings = Settings.from_dict({"ignore": {"enabled": True, "max_streak": 3}})
     increment_ignore_streak()
     reset_ignore_streak()  # sets cooldown = 3
     # Cooldown is active — should never ignore
@@ -101,7 +102,7 @@ def test_should_ignore_respects_cooldown():
 def test_should_ignore_respects_max_streak():
     from bot.handlers import _should_ignore
 
-    settings = {"ignore": {"enabled": True, "max_streak": 2}}
+    settings = Settings.from_dict({"ignore": {"enabled": True, "max_streak": 2}})
     increment_ignore_streak()
     increment_ignore_streak()  # streak = 2 = max
     # Must not ignore again (force-break)
@@ -113,7 +114,7 @@ def test_should_ignore_zero_prob_at_stage_3_focused():
     """Focused mood at Stage 3 has 0% ignore probability."""
     from bot.handlers import _should_ignore
 
-    settings = {"ignore": {"enabled": True, "max_streak": 3}}
+    settings = Settings.from_dict({"ignore": {"enabled": True, "max_streak": 3}})
     for _ in range(50):
         assert not _should_ignore("focused", 3, settings)
 
@@ -122,7 +123,7 @@ def test_should_ignore_zero_prob_good_mood_high_stage():
     """Weirdly good mood at Stage 2+ has 0% ignore probability."""
     from bot.handlers import _should_ignore
 
-    settings = {"ignore": {"enabled": True, "max_streak": 3}}
+    settings = Settings.from_dict({"ignore": {"enabled": True, "max_streak": 3}})
     for _ in range(50):
         assert not _should_ignore("weirdly good", 2, settings)
         assert not _should_ignore("weirdly good", 3, settings)
@@ -132,7 +133,7 @@ def test_should_ignore_can_fire_irritable_stage0():
     """Irritable + Stage 0 (30%) should fire within many tries."""
     from bot.handlers import _should_ignore
 
-    settings = {"ignore": {"enabled": True, "max_streak": 100}}
+    settings = Settings.from_dict({"ignore": {"enabled": True, "max_streak": 100}})
     fired = sum(_should_ignore("irritable", 0, settings) for _ in range(200))
     # At 30% probability over 200 tries, we expect ~60 fires; floor at 10 for flakiness margin
     assert fired > 10
@@ -0,0 +1,241 @@
+"""Tests for the shared OpenRouter client in llm.py."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from bot import llm
+from bot.settings import Settings
+
+
+async def test_client_is_shared_and_closed():
+    client = llm.get_client()
+    assert llm.get_client() is client
+    await llm.aclose_client()
+    assert client.is_closed
+    fresh = llm.get_client()
+    assert fresh is not client
+    await llm.aclose_client()
+
+
+async def test_chat_completion_uses_task_timeout(monkeypatch):
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": " hi "}}]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "get_client", lambda: client)
+
+    assert await llm.chat_completion([{"role": "user", "content": "yo"}], task="memory") == "hi"
+    assert seen[0].headers["Authorization"] == "Bearer test-key"
+    assert seen[0].extensions["timeout"]["read"] == llm.timeout_for("memory").read
+    await client.aclose()
+
+
+def test_timeout_profiles_fall_back_to_default():
+    http = Settings.from_dict({"http": {"timeouts": {"default": 30, "memory": 120}}}).http
+    assert http.timeout_for("memory") == 120.0
+    assert http.timeout_for("chat") == 30.0
+
+
+def _chain_settings(**retry):
+    return Settings.from_dict(
+        {
+            "models": {"chat": ["a/primary", "b/fallback"]},
+            "retry": {"attempts_per_model": 2, "backoff_base_seconds": 0.001, **retry},
+        }
+    )
+
+
+def _mock_client(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "get_client", lambda: client)
+    return client
+
+
+def _ok(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+async def test_transient_errors_retry_then_fall_back(monkeypatch):
+    monkeypatch.setattr(llm, "get_settings", _chain_settings)
+    tried = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        tried.append(model)
+        if model == "a/primary":
+            return httpx.Response(429, headers={"Retry-After": "0.01"})
+        return _ok("fine.")
+
+    client = _mock_client(monkeypatch, handler)
+    assert await llm.chat_completion([{"role": "user", "content": "yo"}]) == "fine."
+    assert tried == ["a/primary", "a/primary", "b/fallback"]
+    await client.aclose()
+
+
+async def test_model_errors_skip_ahead_and_fatal_errors_stop(monkeypatch):
+    monkeypatch.setattr(llm, "get_settings", _chain_settings)
+    tried = []
+    statuses = {"a/primary": 404, "b/fallback": 401}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        tried.append(model)
+        return httpx.Response(statuses[model])
+
+    client = _mock_client(monkeypatch, handler)
+    with pytest.raises(httpx.HTTPStatusError) as err:
+        await llm.chat_completion([{"role": "user", "content": "yo"}])
+    # 404 moves straight to the next model; 401 ends it without retrying
+    assert tried == ["a/primary", "b/fallback"]
+    assert err.value.response.status_code == 401
+    await client.aclose()
+
+
+async def test_deadline_bounds_the_whole_chain(monkeypatch):
+    monkeypatch.setattr(llm, "get_settings", lambda: _chain_settings(deadlines={"chat": 0.05}))
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return _ok("too late")
+
+    client = _mock_client(monkeypatch, slow)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    with pytest.raises(TimeoutError):
+        await llm.chat_completion([{"role": "user", "content": "yo"}])
+    assert loop.time() - start < 0.5
+    await client.aclose()
+
+
+async def test_slow_primary_is_hedged_and_loser_cancelled(monkeypatch):
+    settings = Settings.from_dict(
+        {
+            "models": {"chat": ["a/slow", "b/fast"]},
+            "hedge": {"enabled": True, "delay_seconds": 0.02, "min_delay_seconds": 0},
+        }
+    )
+    monkeypatch.setattr(llm, "get_settings", lambda: settings)
+    monkeypatch.setattr(llm, "_hedge_counts", {})
+    monkeypatch.setattr(llm, "_latencies", {})
+    cancelled = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        if model == "a/slow":
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+        return _ok(model)
+
+    client = _mock_client(monkeypatch, handler)
+    assert await llm.chat_completion([{"role": "user", "content": "yo"}]) == "b/fast"
+    assert cancelled == ["a/slow"]
+    stats = llm.hedge_stats()["chat"]
+    assert stats["calls"] == 1 and stats["hedged"] == 1 and stats["win_rate"] == 1.0
+    await client.aclose()
+
+
+async def test_heartbeat_uses_chat_chain_but_not_chat_hedging(monkeypatch):
+    settings = Settings.from_dict(
+        {
+            "models": {"chat": ["a/slow", "b/fast"]},
+            "hedge": {"enabled": True, "delay_seconds": 0.01, "min_delay_seconds": 0},
+        }
+    )
+    monkeypatch.setattr(llm, "get_settings", lambda: settings)
+    monkeypatch.setattr(llm, "_hedge_counts", {})
+    monkeypatch.setattr(llm, "_latencies", {})
+    tried = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        model = json.loads(request.content)["model"]
+        tried.append(model)
+        await asyncio.sleep(0.03)
+        return _ok(model)
+
+    client = _mock_client(monkeypatch, handler)
+    messages = [{"role": "user", "content": "yo"}]
+    assert await llm.chat_completion(messages, task="heartbeat") == "a/slow"
+    assert tried == ["a/slow"]  # no hedge fired
+    assert llm._latencies == {} and llm.hedge_stats() == {}
+    await client.aclose()
+
+
+def test_hedge_delay_follows_recent_latencies(monkeypatch):
+    settings = Settings.from_dict(
+        {"hedge": {"min_samples": 10, "percentile": 90, "delay_seconds": 8, "min_delay_seconds": 1}}
+    )
+    monkeypatch.setattr(llm, "get_settings", lambda: settings)
+    monkeypatch.setattr(llm, "_latencies", {})
+    assert llm.hedge_delay("chat") == 8
+    for seconds in range(1, 21):
+        llm._record_latency("chat", float(seconds))
+    assert llm.hedge_delay("chat") == 19.0
+
+
+def _scheduler_settings(**cfg):
+    base = {"max_concurrent": 1, "requests_per_second": 0, "background_idle_seconds": 0}
+    return Settings.from_dict({"scheduler": {**base, **cfg}})
+
+
+async def _take(scheduler, priority, order, name, hold=0.0):
+    async with scheduler.slot(priority, "m"):
+        order.append(name)
+        await asyncio.sleep(hold)
+
+
+async def test_scheduler_serves_interactive_before_background(monkeypatch):
+    monkeypatch.setattr(llm, "get_settings", _scheduler_settings)
+    scheduler = llm.RequestScheduler()
+    order: list[str] = []
+    first = asyncio.create_task(_take(scheduler, llm.Priority.PROACTIVE, order, "first", 0.02))
+    await asyncio.sleep(0)
+    queued = [
+        asyncio.create_task(_take(scheduler, llm.Priority.BACKGROUND, order, "background")),
+        asyncio.create_task(_take(scheduler, llm.Priority.INTERACTIVE, order, "chat")),
+    ]
+    await asyncio.gather(first, *queued)
+    assert order == ["first", "chat", "background"]
+    assert scheduler.stats()["running"] == 0
+
+
+async def test_background_backs_off_while_chat_is_active(monkeypatch):
+    monkeypatch.setattr(
+        llm,
+        "get_settings",
+        lambda: _scheduler_settings(max_concurrent=4, background_idle_seconds=0.1),
+    )
+    scheduler = llm.RequestScheduler()
+    loop = asyncio.get_running_loop()
+    order: list[str] = []
+    await _take(scheduler, llm.Priority.INTERACTIVE, order, "chat")
+    start = loop.time()
+    await _take(scheduler, llm.Priority.BACKGROUND, order, "background")
+    assert loop.time() - start >= 0.09
+
+
+async def test_token_bucket_spaces_out_calls(monkeypatch):
+    monkeypatch.setattr(
+        llm,
+        "get_settings",
+        lambda: _scheduler_settings(max_concurrent=4, requests_per_second=20, burst=1),
+    )
+    scheduler = llm.RequestScheduler()
+    loop = asyncio.get_running_loop()
+    order: list[str] = []
+    start = loop.time()
+    for i in range(3):
+        await _take(scheduler, llm.Priority.INTERACTIVE, order, str(i))
+    assert loop.time() - start >= 0.09
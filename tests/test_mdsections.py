@@ -0,0 +1,34 @@
+"""Tests for the markdown section index."""
+
+from __future__ import annotations
+
+from bot.mdsections import Sections
+
+DOC = "# Title\n\n## a\n- one\n- two\n\n## b\nnone yet.\n\n## c\nlast"
+
+
+def test_body_matches_section_span():
+    s = Sections(DOC)
+    assert s.names() == ["a", "b", "c"]
+    assert s.body("a") == "- one\n- two\n"
+    assert s.body("c") == "last"
+    assert s.body("missing") is None
+    assert s.lines("missing") == []
+
+
+def test_replace_shifts_later_sections():
+    s = Sections(DOC)
+    assert s.replace("a", "- only")
+    assert s.body("b") == "none yet.\n"
+    assert s.replace("b", "- x\n- y\n- z\n")
+    assert s.body("c") == "last"
+    assert s.text() == "# Title\n\n## a\n- only\n## b\n- x\n- y\n- z\n\n## c\nlast"
+    assert not s.replace("missing", "x")
+
+
+def test_append_adds_section_at_end():
+    s = Sections(DOC)
+    s.append("d", "- new\n")
+    assert s.body("c") == "last\n"
+    assert s.body("d") == "- new\n"
+    assert s.text().endswith("## c\nlast\n\n## d\n- new\n")
@@ -117,6 +117,78 @@ def test_forget_topic_removes_from_facts(isolated_data_dir):
     assert any("startup" in f.lower() for f in facts)
 
 
+def test_user_state_cached_between_reads(monkeypatch):
+    import bot.memory as mem
+
+    mem.get_trust_stage()
+    reads = []
+    orig_read_file = mem.read_file
+    monkeypatch.setattr(mem, "read_file", lambda path: reads.append(path) or orig_read_file(path))
+    mem.get_trust_stage()
+    mem.get_open_loops()
+    mem.get_facts_with_age()
+    assert reads == []
+
+
+def test_user_state_cache_sees_writes_and_external_edits(isolated_data_dir):
+    import bot.memory as mem
+
+    assert mem.get_open_loops() == []
+    mem.add_open_loop("dentist on monday")
+    assert mem.get_open_loops() == ["dentist on monday"]
+
+    user_md = isolated_data_dir / "users" / "0" / "USER.md"
+    content = user_md.read_text(encoding="utf-8")
+    user_md.write_text(content.replace("relationship_stage: 0", "relationship_stage: 12"))
+    assert mem.get_trust_stage() == 12
+
+
+def test_user_state_copies_are_independent():
+    from bot.memory import add_open_loop, get_open_loops
+    add_open_loop("thing")
+    get_open_loops().append("mutated")
+    assert get_open_loops() == ["thing"]
+
+
+def test_batch_flushes_each_file_once(monkeypatch):
+    import bot.memory as mem
+
+    writes = []
+    orig_atomic_write = mem._atomic_write
+
+    def counting_write(path, content):
+        writes.append(path.name)
+        orig_atomic_write(path, content)
+
+    monkeypatch.setattr(mem, "_atomic_write", counting_write)
+    with mem.batch():
+        mem.add_known_fact("likes tea")
+        mem.add_known_fact("has a dog")
+        mem.add_open_loop("vet visit")
+        mem.increment_meaningful_exchanges()
+        mem.update_heartbeat_state(warmth_floor_modifier=1)
+        mem.set_session_ended(bot_had_last_word=True)
+        # Reads inside the batch see the buffered writes
+        assert mem.get_open_loops() == ["vet visit"]
+        assert writes == []
+
+    # Heartbeat state lives in memory until flush_heartbeat_states()
+    assert writes == ["USER.md"]
+    state = mem.get_user_state()
+    assert len(state["known_facts"]) == 2
+    assert state["meaningful_exchanges"] == 1
+    assert mem.get_heartbeat_state()["bot_had_last_word"] is True
+
+
+def test_batch_discards_writes_on_error():
+    import bot.memory as mem
+
+    with pytest.raises(RuntimeError), mem.batch():
+        mem.add_known_fact("never saved")
+        raise RuntimeError("boom")
+    assert mem.get_user_state()["known_facts"] == []
+
+
 # ---------------------------------------------------------------------------
 # Episode tests
 # ---------------------------------------------------------------------------
@@ -149,6 +221,35 @@ def test_prune_old_episodes():
     assert all("2025-01-01" not in str(p) for p in remaining)
 
 
+def test_episode_lookups_use_manifest(isolated_data_dir, monkeypatch):
+    import bot.memory as mem
+
+    mem.write_episode("# a\n\n## carry_over\nshe was warmer.\n", episode_date=date(2026, 2, 20))
+    mem.write_episode("# b\n\n## summary\nquiet one.\n", episode_date=date(2026, 2, 21))
+    entry = mem.episode_manifest()["2026-02-21"]
+    assert entry["summary"] == "quiet one." and not entry["has_carry_over"]
+
+    def no_listing(*args, **kwargs):
+        raise AssertionError("episodes directory was listed")
+
+    with monkeypatch.context() as m:
+        m.setattr(Path, "glob", no_listing)
+        m.setattr(mem, "read_file", no_listing)
+        assert mem.read_last_episode_carry_over() == "she was warmer."
+        assert [p.stem for p in mem.list_recent_episodes(n=1)] == ["2026-02-21"]
+
+
+def test_episode_manifest_rebuilt_when_missing(isolated_data_dir):
+    import bot.memory as mem
+
+    episodes = isolated_data_dir / "users" / "0" / "episodes"
+    (episodes / "2026-01-02.md").write_text("x\n\n## carry_over\nold note.\n", encoding="utf-8")
+    assert mem.read_last_episode_carry_over() == "old note."
+    assert (episodes / "manifest.json").exists()
+    assert mem.prune_old_episodes(retention_days=1) == 1
+    assert mem.episode_manifest() == {}
+
+
 # ---------------------------------------------------------------------------
 # MEMORY.md tests
 # ---------------------------------------------------------------------------
@@ -202,6 +303,89 @@ def test_used_excuses_capped_at_5():
     assert len(state["used_excuses"]) <= 5
 
 
+def test_heartbeat_updates_stay_in_memory_until_flush(isolated_data_dir, monkeypatch):
+    import bot.memory as mem
+
+    mem.get_heartbeat_state()  # load once
+    hb_path = isolated_data_dir / "users" / "0" / "HEARTBEAT.md"
+    before = hb_path.read_text(encoding="utf-8")
+
+    def no_yaml(*args, **kwargs):
+        raise AssertionError("heartbeat hot path touched YAML")
+
+    with monkeypatch.context() as m:
+        m.setattr(mem, "_read_heartbeat_yaml", no_yaml)
+        m.setattr(mem, "_write_heartbeat_yaml", no_yaml)
+        mem.record_user_message_time()
+        mem.record_proactive_sent(2)
+        assert mem.get_heartbeat_state()["proactive_count"] == 1
+    assert hb_path.read_text(encoding="utf-8") == before
+
+    assert mem.flush_heartbeat_states() == 1
+    assert mem.flush_heartbeat_states() == 0  # nothing dirty any more
+    assert "proactive_count: 1" in hb_path.read_text(encoding="utf-8")
+    assert "last_user_message: '" in hb_path.read_text(encoding="utf-8")
+
+
+def test_failed_heartbeat_flush_is_retried(isolated_data_dir, monkeypatch):
+    import bot.memory as mem
+
+    def disk_full(snapshot):
+        raise OSError("disk full")
+
+    mem.record_proactive_sent(2)
+    with monkeypatch.context() as m:
+        m.setattr(mem, "_save_heartbeat", disk_full)
+        with pytest.raises(OSError):
+            mem.flush_heartbeat_states()
+    assert mem.flush_heartbeat_states() == 1
+    hb_path = isolated_data_dir / "users" / "0" / "HEARTBEAT.md"
+    assert "proactive_count: 1" in hb_path.read_text(encoding="utf-8")
+
+
+def test_heartbeat_preserves_unknown_keys(isolated_data_dir):
+    import bot.memory as mem
+
+    hb_path = isolated_data_dir / "users" / "0" / "HEARTBEAT.md"
+    hb_path.write_text(hb_path.read_text(encoding="utf-8") + "custom_flag: true\n")
+    mem.set_silence(None)
+    mem.flush_heartbeat_states()
+    assert "custom_flag: true" in hb_path.read_text(encoding="utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Async facade tests
+# ---------------------------------------------------------------------------
+
+
+async def test_run_io_carries_current_user(isolated_data_dir):
+    import threading
+
+    import bot.memory as mem
+
+    def where() -> tuple[int, str]:
+        return mem.get_current_user(), threading.current_thread().name
+
+    mem.set_current_user(7)
+    uid, thread = await mem.run_io(where)
+    assert uid == 7
+    assert thread.startswith("memory-io")
+    mem.set_current_user(0)
+
+
+async def test_async_getters_serve_hot_state_without_pool(isolated_data_dir, monkeypatch):
+    import bot.memory as mem
+
+    await mem.ainit_user_data(0)  # loads USER.md and HEARTBEAT.md on the pool
+
+    async def no_hop(*args, **kwargs):
+        raise AssertionError("hot read went to the I/O pool")
+
+    monkeypatch.setattr(mem, "run_io", no_hop)
+    assert await mem.aget_trust_stage() == 0
+    assert (await mem.aget_heartbeat_state())["proactive_count"] == 0
+
+
 # ---------------------------------------------------------------------------
 # THOUGHTS.md tests
 # ---------------------------------------------------------------------------
@@ -0,0 +1,175 @@
+"""SQLite memory backend tests — same memory.py API, backend switched to sqlite."""
+
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def sqlite_backend(monkeypatch, tmp_path):
+    """Point the memory module at a temp dir and select the sqlite backend."""
+    import bot.memory as mem
+    import bot.memory_db as mdb
+
+    monkeypatch.setattr(mem, "_BASE_DATA_DIR", tmp_path)
+    mem.set_backend("sqlite")
+    mem.set_current_user(0)
+    yield tmp_path
+    mdb.close()
+    mem.set_backend(None)
+
+
+def test_user_fields_roundtrip():
+    from bot.memory import (
+        get_trust_stage,
+        get_user_state,
+        increment_meaningful_exchanges,
+        set_trust_stage,
+    )
+
+    assert get_trust_stage() == 0
+    set_trust_stage(3)
+    assert increment_meaningful_exchanges() == 1
+    assert increment_meaningful_exchanges() == 2
+    state = get_user_state()
+    assert state["relationship_stage"] == 3
+    assert state["meaningful_exchanges"] == 2
+
+
+def test_facts_and_loops():
+    from bot.memory import (
+        add_known_fact,
+        add_open_loop,
+        clear_open_loops,
+        forget_topic,
+        get_facts_with_age,
+        get_open_loops,
+    )
+
+    add_known_fact("loves sushi")
+    add_known_fact("works at a startup")
+    add_open_loop("sushi place on friday")
+    add_open_loop("interview monday")
+
+    facts = get_facts_with_age()
+    assert [f["text"] for f in facts] == ["loves sushi", "works at a startup"]
+    assert all(f["confidence"] == "high" for f in facts)
+
+    forget_topic("SUSHI")
+    assert [f["text"] for f in get_facts_with_age()] == ["works at a startup"]
+    assert get_open_loops() == ["interview monday"]
+
+    clear_open_loops()
+    assert get_open_loops() == []
+
+
+def test_users_are_isolated():
+    from bot.memory import add_known_fact, get_user_state, set_current_user
+
+    add_known_fact("user zero fact")
+    set_current_user(42)
+    assert get_user_state()["known_facts"] == []
+    set_current_user(0)
+    assert len(get_user_state()["known_facts"]) == 1
+
+
+def test_heartbeat_state():
+    from bot.memory import (
+        get_heartbeat_state,
+        get_photos_sent_today,
+        record_photo_sent,
+        record_proactive_sent,
+        set_silence,
+    )
+
+    assert get_heartbeat_state()["proactive_count"] == 0
+    record_proactive_sent(3)
+    record_photo_sent()
+    set_silence(None)
+    state = get_heartbeat_state()
+    assert state["proactive_count"] == 1
+    assert state["used_excuses"] == [3]
+    assert state["silence_until"] is None
+    assert get_photos_sent_today() == 1
+
+
+def test_episodes():
+    from bot.memory import (
+        list_recent_episodes,
+        prune_old_episodes,
+        read_last_episode_carry_over,
+        read_recent_episodes,
+        read_today_episode,
+        write_episode,
+    )
+
+    write_episode("old ep", episode_date=date(2025, 1, 1))
+    write_episode("ep with carry\n\n## carry_over\ngood session.", episode_date=date(2026, 2, 1))
+    write_episode("today ep")
+
+    assert read_today_episode() == "today ep"
+    assert [p.stem for p in list_recent_episodes(n=2)] == [
+        date.today().isoformat(),
+        "2026-02-01",
+    ]
+    assert read_recent_episodes(n=1) == "today ep"
+    assert read_last_episode_carry_over() == "good session."
+    assert prune_old_episodes(retention_days=30) >= 1
+    assert "old ep" not in read_recent_episodes(n=10)
+
+
+def test_self_disclosures():
+    from bot.memory import add_self_disclosure, get_self_disclosures
+
+    add_self_disclosure("she used to draw")
+    assert get_self_disclosures() == [
+        {"date": date.today().isoformat(), "text": "she used to draw"}
+    ]
+
+
+def test_import_and_export_markdown_tree(sqlite_backend):
+    import bot.memory as mem
+    from bot.memory_db import export_user, import_user
+
+    user_dir = sqlite_backend / "users" / "7"
+    (user_dir / "episodes").mkdir(parents=True)
+    (user_dir / "USER.md").write_text(
+        "# User Profile\n\n## basics\n- name: Ren\n- relationship_stage: 2\n"
+        "- meaningful_exchanges: 11\n\n## open_loops\n- exam on friday\n\n"
+        "## known_facts\n- [2026-01-05] has a cat\n- likes rain\n\n## last_updated: never\n",
+        encoding="utf-8",
+    )
+    (user_dir / "HEARTBEAT.md").write_text(
+        "# Heartbeat State\n\nproactive_count: 4\nused_excuses: [1, 2]\n", encoding="utf-8"
+    )
+    (user_dir / "SELF.md").write_text(
+        "## things she told the user\n- [2026-01-06] she hates cilantro\n", encoding="utf-8"
+    )
+    (user_dir / "episodes" / "2026-01-06.md").write_text(
+        "# Session\n\n## carry_over\nuser opened up a bit.\n", encoding="utf-8"
+    )
+
+    counts = import_user(7)
+    assert counts["facts"] == 2 and counts["episodes"] == 1
+
+    mem.set_current_user(7)
+    state = mem.get_user_state()
+    assert state["name"] == "Ren"
+    assert state["relationship_stage"] == 2
+    assert state["known_facts"] == ["[2026-01-05] has a cat", "likes rain"]
+    assert state["open_loops"] == ["exam on friday"]
+    assert mem.get_heartbeat_state()["proactive_count"] == 4
+    assert mem.get_self_disclosures()[0]["text"] == "she hates cilantro"
+    assert mem.read_last_episode_carry_over() == "user opened up a bit."
+
+    # Re-import replaces rather than duplicates
+    import_user(7)
+    assert len(mem.get_user_state()["known_facts"]) == 2
+
+    mem.add_known_fact("plays guitar")
+    export_user(7)
+    exported = mem._parse_user_md()
+    assert exported["name"] == "Ren"
+    assert any("plays guitar" in f for f in exported["known_facts"])
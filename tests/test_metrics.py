@@ -0,0 +1,129 @@
+"""Tests for LLM metrics (metrics.py) and how llm.py feeds them."""
+
+from __future__ import annotations
+
+import json
+
+import httpx
+import pytest
+
+from bot import llm, metrics
+from bot.settings import Settings
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_snapshot_sums_per_task_and_user():
+    metrics.record_llm_call(
+        "chat", "a/m", 1, 0.5, prompt_tokens=100, completion_tokens=20, cost=0.001
+    )
+    metrics.record_llm_call(
+        "chat", "b/m", 2, 1.5, prompt_tokens=300, completion_tokens=40, cost=0.003
+    )
+    metrics.record_llm_call("chat", "a/m", 1, 9.0, outcome="429")
+    metrics.record_llm_call("chat", "a/m", 1, 2.0, outcome="cancelled")
+
+    chat = metrics.snapshot()["chat"]
+    assert chat["calls"] == 4 and chat["errors"] == 1
+    assert chat["prompt_tokens"] == 400 and chat["completion_tokens"] == 60
+    assert chat["cost"] == pytest.approx(0.004)
+    assert chat["p50"] == 1.5  # failed calls stay out of the latency window
+    assert metrics.user_totals(1) == (120, pytest.approx(0.001))
+    assert metrics.user_totals(99) == (0, 0)
+
+
+def test_prometheus_text_format():
+    metrics.record_llm_call("memory", 'we"ird', 1, 0.3, prompt_tokens=600, completion_tokens=5)
+    metrics.record_llm_call("memory", 'we"ird', 1, 3.0)
+    metrics.add_collector(lambda: [("llm_test_gauge", {"task": "memory"}, 2)])
+    try:
+        text = metrics.render_prometheus()
+    finally:
+        metrics._collectors.pop()
+
+    lines = text.splitlines()
+    assert "# TYPE llm_requests_total counter" in lines
+    assert 'llm_requests_total{model="we\\"ird",outcome="ok",task="memory"} 2' in lines
+    assert 'llm_request_seconds_bucket{task="memory",le="0.5"} 1' in lines
+    assert 'llm_request_seconds_bucket{task="memory",le="5"} 2' in lines
+    assert 'llm_request_seconds_bucket{task="memory",le="+Inf"} 2' in lines
+    assert 'llm_request_seconds_count{task="memory"} 2' in lines
+    assert 'llm_prompt_tokens_total{model="we\\"ird",task="memory"} 600' in lines
+    assert 'llm_test_gauge{task="memory"} 2' in lines
+
+
+def test_metrics_file_is_replaced_whole(tmp_path):
+    path = tmp_path / "sub" / "metrics.prom"
+    metrics.write_metrics_file(path, "a 1\n")
+    metrics.write_metrics_file(path, "a 2\n")
+    assert path.read_text() == "a 2\n"
+    assert [p.name for p in path.parent.iterdir()] == ["metrics.prom"]
+
+
+def _mock_client(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "get_client", lambda: client)
+    monkeypatch.setattr(
+        llm,
+        "get_settings",
+        lambda: Settings.from_dict(
+            {
+                "models": {"memory": ["a/primary", "b/fallback"]},
+                "retry": {"attempts_per_model": 1, "backoff_base_seconds": 0.001},
+            }
+        ),
+    )
+    return client
+
+
+async def test_completions_record_usage_and_failures(monkeypatch):
+    usage = {"prompt_tokens": 50, "completion_tokens": 7, "cost": 0.0002}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        assert payload["usage"] == {"include": True}
+        if payload["model"] == "a/primary":
+            return httpx.Response(503)
+        return httpx.Response(
+            200, json={"choices": [{"message": {"content": "ok"}}], "usage": usage}
+        )
+
+    client = _mock_client(monkeypatch, handler)
+    await llm.chat_completion([{"role": "user", "content": "yo"}], task="memory")
+    await client.aclose()
+
+    memory = metrics.snapshot()["memory"]
+    assert memory["calls"] == 2 and memory["errors"] == 1
+    assert (memory["prompt_tokens"], memory["completion_tokens"]) == (50, 7)
+    assert 'outcome="503"' in metrics.render_prometheus()
+
+
+async def test_stream_records_first_token_and_usage_chunk(monkeypatch):
+    chunks = [
+        {"choices": [{"delta": {"content": "hm."}}]},
+        {"choices": [], "usage": {"prompt_tokens": 80, "completion_tokens": 2, "cost": 0.0001}},
+    ]
+    body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    client = _mock_client(monkeypatch, handler)
+    reply = [
+        d
+        async for d in llm.chat_completion_stream(
+            [{"role": "user", "content": "yo"}], task="memory"
+        )
+    ]
+    await client.aclose()
+
+    assert reply == ["hm."]
+    memory = metrics.snapshot()["memory"]
+    assert (memory["calls"], memory["prompt_tokens"], memory["cost"]) == (1, 80, 0.0001)
+    assert 'llm_first_token_seconds_count{task="memory"} 1' in metrics.render_prometheus()
@@ -0,0 +1,94 @@
+"""Known-fact recall tests — parsing, ranking and index upkeep."""
+
+from __future__ import annotations
+
+from datetime import date
+
+from bot.recall import FactIndex, parse_fact
+
+TODAY = date(2025, 11, 20)
+
+
+def test_parse_fact_reads_date_and_importance():
+    fact = parse_fact("[2025-11-03] [8] user prefers dark mode")
+    assert fact.learned == date(2025, 11, 3)
+    assert fact.importance == 8
+    assert fact.text == "user prefers dark mode"
+    assert "dark" in fact.terms
+
+    legacy = parse_fact("[2025-11-03] has a cat")
+    assert legacy.importance == 5 and legacy.text == "has a cat"
+    assert parse_fact("undated fact").learned is None
+
+
+def test_top_k_prefers_keyword_overlap():
+    facts = [f"[2025-11-{d:02d}] likes filler topic {d}" for d in range(1, 19)]
+    facts.append("[2025-06-01] has a cat named miso")
+    index = FactIndex(facts)
+    top = index.top_k("how is miso doing? is the cat ok", 3, TODAY)
+    assert top[0] == "[2025-06-01] has a cat named miso"
+
+
+def test_top_k_without_overlap_ranks_by_recency_and_importance():
+    index = FactIndex(
+        [
+            "[2025-01-01] [9] old but important",
+            "[2025-11-19] [2] new but trivial",
+            "[2025-11-18] [9] new and important",
+        ]
+    )
+    assert index.top_k("unrelated words", 1, TODAY) == ["[2025-11-18] [9] new and important"]
+
+
+def test_common_terms_score_only_their_newest_facts(monkeypatch):
+    from bot import recall
+
+    monkeypatch.setattr(recall, "_MAX_POSTINGS", 3)
+    facts = [f"[2025-10-{d:02d}] filler {d}" for d in range(1, 29)]
+    facts += [f"[2025-11-{d:02d}] [10] fed the cat {d}" for d in (1, 2)]
+    facts += [f"[2025-11-{d:02d}] fed the cat {d}" for d in (3, 4, 5)]
+    index = FactIndex(facts)
+    # The older, more important matches would win if scored; past the cap they only
+    # count by recency + importance
+    top = index.top_k("the cat", 3, TODAY)
+    assert top == [f"[2025-11-{d:02d}] fed the cat {d}" for d in (5, 4, 3)]
+
+
+def test_added_fact_joins_the_ranking_without_a_resort():
+    index = FactIndex(["[2025-01-01] [2] old", "[2025-11-18] [5] recent"])
+    index.top_k("unrelated", 1, TODAY)  # sorts the day's ranking
+    index.add("[2025-11-19] [9] newest and important")
+    assert index.top_k("unrelated", 2, TODAY) == [
+        "[2025-11-19] [9] newest and important",
+        "[2025-11-18] [5] recent",
+    ]
+
+
+def test_forget_removes_from_postings():
+    index = FactIndex(["[2025-11-01] works at the bakery", "[2025-11-02] plays the bass"])
+    assert index.forget("bakery") == 1
+    assert "bakery" not in index.postings
+    assert index.top_k("bakery", 5, TODAY) == ["[2025-11-02] plays the bass"]
+
+
+def test_memory_hooks_keep_index_in_sync(monkeypatch, tmp_path):
+    import bot.memory as mem
+    from bot import recall
+
+    monkeypatch.setattr(mem, "_BASE_DATA_DIR", tmp_path)
+    monkeypatch.setattr(recall, "_indexes", {})
+    mem.set_current_user(0)
+    mem.init_user_data(0)
+
+    for i in range(10):
+        mem.add_known_fact(f"filler fact number {i}")
+    mem.add_known_fact("is learning the violin")
+    assert mem.relevant_facts("violin practice", 1)[0].endswith("is learning the violin")
+
+    index = recall._indexes[mem._data_dir()]
+    mem.add_known_fact("owns a bicycle")
+    mem.forget_topic("violin")
+    known = mem.get_user_state()["known_facts"]
+    assert recall._indexes[mem._data_dir()] is index  # updated in place, not rebuilt
+    assert len(index) == len(known)
+    assert not any("violin" in f for f in mem.relevant_facts("violin", 3))
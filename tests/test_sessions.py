@@ -0,0 +1,80 @@
+"""Session store tests — bounded history, eviction, spill and restore."""
+
+from __future__ import annotations
+
+from bot.sessions import Session, SessionStore
+
+
+def test_history_is_bounded_and_indexed_by_message_number():
+    sess = Session(max_history=4)
+    for i in range(6):
+        sess.append("user", f"m{i}")
+    assert [m["content"] for m in sess.history] == ["m2", "m3", "m4", "m5"]
+    assert sess.total_messages == 6
+    assert [m["content"] for m in sess.messages(4)] == ["m4", "m5"]
+    assert len(sess.messages(0)) == 4  # older ones are gone, not an error
+
+
+async def test_idle_sessions_spill_and_restore():
+    disk: dict[int, dict] = {}
+
+    async def spill(uid, data):
+        disk[uid] = data
+
+    async def restore(uid):
+        return [{"k": "snapshot", **disk.pop(uid)}] if uid in disk else []
+
+    store = SessionStore(max_history=10, idle_seconds=60, restore=restore, spill=spill)
+    store.get(1).append("user", "remember this")
+    store.get(1).session_turn_count = 1
+    store.get(2)  # empty: dropped without a spill
+
+    assert await store.evict(now=store.get(1).last_active + 61) == 2
+    assert len(store) == 0 and list(disk) == [1]
+
+    restored = await store.load(1)
+    assert restored.messages() == [{"role": "user", "content": "remember this"}]
+    assert restored.session_turn_count == 1 and not disk
+
+
+async def test_only_load_reads_the_disk():
+    reads = []
+
+    async def restore(uid):
+        reads.append(uid)
+        return [{"k": "msg", "role": "user", "content": "from the log", "turn": 1}]
+
+    store = SessionStore(restore=restore)
+    assert (await store.load(1)).messages()[0]["content"] == "from the log"
+    store.get(1).append("assistant", "hm.")
+    assert len((await store.load(1)).messages()) == 2  # in memory: not read again
+    assert store.get(2).messages() == [] and reads == [1]
+
+
+async def test_capacity_evicts_least_recently_used():
+    async def spill(uid, data):
+        pass
+
+    store = SessionStore(max_sessions=2, spill=spill)
+    for uid in (1, 2, 3):
+        store.get(uid).append("user", "hi")
+    store.get(1)  # touch: 2 is now the least recently used
+    assert await store.evict() == 1
+    assert 2 not in store and 1 in store and 3 in store
+    stats = store.stats()
+    assert stats["sessions"] == 2 and stats["messages"] == 2 and stats["approx_bytes"] > 0
+
+
+def test_session_log_replays_after_snapshot():
+    records = [
+        {"k": "msg", "role": "user", "content": "lost to compaction", "turn": 1},
+        {"k": "snapshot", "history": [{"role": "user", "content": "a"}], "total_messages": 1},
+        {"k": "msg", "role": "assistant", "content": "b", "turn": 1},
+        {"k": "msg", "role": "user", "content": "c", "turn": 2},
+        {"k": "summary", "text": "they said a.", "upto": 1},
+    ]
+    sess = Session.from_log(records, max_history=10)
+    assert [m["content"] for m in sess.history] == ["a", "b", "c"]
+    assert sess.total_messages == 3 and sess.session_turn_count == 2
+    assert sess.summary == "they said a."
+    assert sess.messages(sess.summarized_upto)[0]["content"] == "b"
@@ -0,0 +1,55 @@
+"""Typed settings tests — parsing, defaults and mtime-based reload."""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import bot.settings as settings_module
+from bot.settings import Settings, get_settings, reload_settings
+
+
+def test_from_dict_coerces_types_and_keeps_defaults():
+    s = Settings.from_dict(
+        {
+            "models": {"chat": "a/b", "memory": ["c/d", "e/f"]},
+            "heartbeat": {"min_interval_hours": 2, "quiet_start": "22:00", "unknown": 1},
+            "telegram": {"allowed_user_ids": [1, 2]},
+            "photo": {"enabled": 1},
+        }
+    )
+    assert s.heartbeat.min_interval_hours == 2.0 and s.heartbeat.quiet_end == "08:00"
+    assert s.telegram.allowed_user_ids == (1, 2)
+    assert s.photo.enabled is True and s.photo.max_per_day == 2
+    assert s.model_for("vision") == "a/b"
+    assert s.model_for("memory") == "c/d" and s.models_for("memory") == ("c/d", "e/f")
+    assert Settings.from_dict(None) == Settings()
+
+
+def test_quoted_booleans_are_parsed_not_truthy():
+    assert Settings.from_dict({"photo": {"enabled": "false"}}).photo.enabled is False
+    assert Settings.from_dict({"photo": {"enabled": "0"}}).photo.enabled is False
+    assert Settings.from_dict({"photo": {"enabled": " Yes "}}).photo.enabled is True
+    with pytest.raises(ValueError):
+        Settings.from_dict({"photo": {"enabled": "maybe"}})
+
+
+def test_get_settings_reparses_only_on_mtime_change(monkeypatch, tmp_path):
+    path = tmp_path / "settings.yaml"
+    path.write_text("session:\n  timeout_minutes: 10\n")
+    monkeypatch.setattr(settings_module, "SETTINGS_PATH", path)
+    first = reload_settings()
+    assert first.session.timeout_minutes == 10
+
+    monkeypatch.setattr(settings_module, "_checked_at", 0.0)  # let the next call re-stat
+    assert get_settings() is first
+
+    path.write_text("session:\n  timeout_minutes: 45\n")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    monkeypatch.setattr(settings_module, "_checked_at", 0.0)
+    assert get_settings().session.timeout_minutes == 45
+
+    monkeypatch.setattr(settings_module, "SETTINGS_PATH", settings_module._ROOT / "settings.yaml")
+    reload_settings()
@@ -0,0 +1,121 @@
+"""Tests for reply delivery: SSE parsing, progressive messages and send timing."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import bot.handlers as handlers
+from bot.handlers import _send_with_delay, _stream_reply, _typing
+from bot.llm import _sse_deltas
+from bot.settings import Settings
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class _Sent:
+    def __init__(self, log: list, text: str) -> None:
+        self.log = log
+        self.text = text
+        log.append(["send", text])
+
+    async def edit_text(self, text: str) -> None:
+        self.text = text
+        self.log.append(["edit", text])
+
+
+def _update(log: list):
+    async def reply_text(text: str) -> _Sent:
+        return _Sent(log, text)
+
+    async def send_action(action) -> None:
+        log.append(["typing"])
+
+    chat = SimpleNamespace(send_action=send_action)
+    return SimpleNamespace(message=SimpleNamespace(reply_text=reply_text, chat=chat))
+
+
+async def test_sse_deltas_skip_comments_and_stop_at_done():
+    lines = [
+        ": OPENROUTER PROCESSING",
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        'data: {"choices": [{"delta": {"content": "wait."}}]}',
+        "",
+        'data: {"choices": [{"delta": {"content": " what"}}]}',
+        "data: [DONE]",
+        'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+    ]
+    assert [d async for d in _sse_deltas(_aiter(lines))] == ["wait.", " what"]
+
+
+async def test_first_sentence_goes_out_before_the_rest():
+    log: list = []
+    settings = Settings.from_dict({"streaming": {"edit_interval_seconds": 0}})
+    deltas = ["hm", ". you", " again", "?\nfine", ". what", " is it."]
+    await _stream_reply(_update(log), _aiter(deltas), settings)
+    assert log[0] == ["send", "hm."]
+    # Each line is its own bubble, and each bubble ends up with its full text
+    sends = [entry for entry in log if entry[0] == "send"]
+    assert len(sends) == 2
+    assert log[-1] == ["edit", "fine. what is it."]
+    assert ["edit", "hm. you again?"] in log
+
+
+async def test_edits_are_throttled():
+    log: list = []
+    settings = Settings.from_dict({"streaming": {"edit_interval_seconds": 60}})
+    await _stream_reply(_update(log), _aiter(["ok. ", "a", "b", "c", " done."]), settings)
+    # Sent once, then only the final edit — intermediate ones fell inside the interval
+    assert log == [["send", "ok."], ["edit", "ok. abc done."]]
+
+
+async def test_typing_is_kept_alive_until_the_block_exits(monkeypatch):
+    monkeypatch.setattr(handlers, "_TYPING_REFRESH_SECONDS", 0.01)
+    log: list = []
+    async with _typing(_update(log)):
+        await asyncio.sleep(0.05)
+    count = len(log)
+    await asyncio.sleep(0.03)
+    assert count >= 3 and len(log) == count
+
+
+async def test_typing_stops_once_the_first_bubble_is_out(monkeypatch):
+    monkeypatch.setattr(handlers, "_TYPING_REFRESH_SECONDS", 0.01)
+    settings = Settings.from_dict({"streaming": {"edit_interval_seconds": 0}})
+
+    async def slow_deltas():
+        await asyncio.sleep(0.03)
+        yield "hm. "
+        await asyncio.sleep(0.05)
+        yield "what is it."
+
+    log: list = []
+    async with _typing(_update(log)) as stop_typing:
+        await _stream_reply(_update(log), slow_deltas(), settings, on_first_send=stop_typing)
+    first_send = log.index(["send", "hm."])
+    assert ["typing"] in log[:first_send]
+    assert ["typing"] not in log[first_send:]
+
+
+async def test_delay_overlaps_generation_time(monkeypatch):
+    settings = Settings.from_dict(
+        {"response_delay": {"enabled": True, "base_seconds": 0.2, "ms_per_char": 0,
+                            "pre_indicator_pause": 0.05, "false_start_enabled": False}}
+    )
+    monkeypatch.setattr(handlers, "get_settings", lambda: settings)
+    loop = asyncio.get_running_loop()
+
+    # Generation already took longer than the delay: send straight away
+    log: list = []
+    start = loop.time()
+    await _send_with_delay(_update(log), "ok", stage=0, started=start - 5.0)
+    assert loop.time() - start < 0.05 and log == [["send", "ok"]]
+
+    # Fresh message: the full delay still applies
+    log = []
+    start = loop.time()
+    await _send_with_delay(_update(log), "ok", stage=0, started=start)
+    assert loop.time() - start >= 0.19 and log[-1] == ["send", "ok"]